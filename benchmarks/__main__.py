@@ -0,0 +1,94 @@
+"""Runs the benchmark suite against the simulated LSF and compares results.
+
+Usage (from the repository root):
+    python -m benchmarks run [--filter status.] [--repeat 5] [--output results.json]
+    python -m benchmarks compare before.json after.json [--threshold 0.25]
+    python -m benchmarks list
+
+run writes its results to .benchmarks/<commit>.json unless --output is given.
+compare prints the change of the median wall time per operation (job, submission,
+lookup) of every benchmark and exits with 1 if any got slower by more than
+--threshold (0.25 is 25 %).
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from benchmarks import suite  # noqa: F401 registers the benchmarks
+from benchmarks.harness import (
+    REGISTRY,
+    compare_results,
+    default_results_path,
+    format_comparison,
+    param_combinations,
+    read_results,
+    result_key,
+    run_benchmarks,
+    write_results,
+)
+
+RESULTS_DIR = Path(".benchmarks")
+
+
+def run(args: argparse.Namespace) -> int:
+    results = run_benchmarks(args.filter, args.repeat)
+    if not results:
+        print("No benchmark matches {}".format(args.filter), file=sys.stderr)
+        return 1
+    output = args.output or default_results_path(RESULTS_DIR)
+    write_results(output, results)
+    print("Results written to {}".format(output))
+    return 0
+
+
+def commit_of(results: dict) -> str:
+    commit = (results["environment"]["commit"] or "unknown")[:10]
+    return commit + "*" if results["environment"]["dirty"] else commit
+
+
+def compare(args: argparse.Namespace) -> int:
+    before = read_results(args.before)
+    after = read_results(args.after)
+    print("{:<56} {:>12} {:>12}".format("", commit_of(before), commit_of(after)))
+    comparisons = compare_results(before, after, args.threshold)
+    for comparison in comparisons:
+        print(format_comparison(comparison))
+    return int(any(comparison.verdict == "slower" for comparison in comparisons))
+
+
+def list_benchmarks(args: argparse.Namespace) -> int:
+    for bench in REGISTRY.values():
+        for params in param_combinations(bench.params):
+            print(result_key(bench.name, params))
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument(
+        "--filter", help="only run the benchmarks whose name contains this"
+    )
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--output", type=Path)
+    run_parser.set_defaults(function=run)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two results")
+    compare_parser.add_argument("before", type=Path)
+    compare_parser.add_argument("after", type=Path)
+    compare_parser.add_argument("--threshold", type=float, default=0.25)
+    compare_parser.set_defaults(function=compare)
+
+    list_parser = subparsers.add_parser("list", help="list the benchmarks")
+    list_parser.set_defaults(function=list_benchmarks)
+
+    args = parser.parse_args()
+    return args.function(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Measures how long the submit script takes to notice a jobscript that appears while
+it waits for it.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_jobscript_wait [--waits 50] [--delay 0.05]
+
+For each wait a thread creates the file after delay seconds. The latency is the time
+from its creation until the waiting call returns, reported for the former 100 ms
+polling loop, for wait_for_file with inotify and for wait_for_file falling back to
+exponential-backoff polling. The number of existence checks each made is reported
+too.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from tests.src import file_watch
+from tests.src.file_watch import InotifyUnavailable, wait_for_file
+
+
+def fixed_polling(path: Path, timeout: float) -> bool:
+    """The loop the submit script used before wait_for_file."""
+    start_time = time.time()
+    while not os.path.exists(str(path)):
+        if time.time() - start_time >= timeout:
+            return False
+        time.sleep(0.1)
+    return True
+
+
+def measure(wait, waits: int, delay: float):
+    latencies = []
+    checks = 0
+    real_exists = Path.exists
+    real_os_exists = os.path.exists
+
+    def counting_exists(*args):
+        nonlocal checks
+        checks += 1
+        return real_exists(*args)
+
+    def counting_os_exists(*args):
+        nonlocal checks
+        checks += 1
+        return real_os_exists(*args)
+
+    with tempfile.TemporaryDirectory() as directory, patch.object(
+        Path, "exists", counting_exists
+    ), patch.object(os.path, "exists", counting_os_exists):
+        for i in range(waits):
+            path = Path(directory) / "jobscript.{}.sh".format(i)
+            created = []
+
+            def create():
+                path.write_text("#!/bin/sh\n")
+                created.append(time.perf_counter())
+
+            threading.Timer(delay, create).start()
+            assert wait(path, 10.0)
+            latencies.append(time.perf_counter() - created[0])
+    return latencies, checks / waits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--waits", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    def without_inotify(path: Path, timeout: float) -> bool:
+        with patch.object(file_watch, "DirectoryWatch", side_effect=InotifyUnavailable):
+            return wait_for_file(path, timeout)
+
+    print("{:>16} {:>14} {:>14} {:>8}".format("", "median (ms)", "max (ms)", "checks"))
+    for name, wait in (
+        ("100 ms polling", fixed_polling),
+        ("inotify", wait_for_file),
+        ("backoff polling", without_inotify),
+    ):
+        latencies, checks = measure(wait, args.waits, args.delay)
+        print(
+            "{:>16} {:>14.2f} {:>14.2f} {:>8.1f}".format(
+                name,
+                statistics.median(latencies) * 1e3,
+                max(latencies) * 1e3,
+                checks,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
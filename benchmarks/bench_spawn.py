@@ -0,0 +1,82 @@
+"""Measures what it costs to run an LSF command from the profile.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_spawn [--calls 200] [--heap-mb 0 200]
+
+Every bsub, bjobs and bkill is a new process. The time per call of a trivial
+external command (uname) is reported for
+- a command line run through /bin/sh, as the profile used to,
+- an argument list run with close_fds by a plain fork, as python < 3.10 does,
+- the same with vfork where this python has it (3.10+),
+- OSLayer.run_process, which lets python use posix_spawn.
+The parent is grown by each --heap-mb first, as the cost of a plain fork grows with
+the memory of the process that forks, e.g. the status daemon or the submit broker.
+"""
+
+import argparse
+import statistics
+import subprocess
+import time
+
+from tests.src.OSLayer import OSLayer
+
+
+def shell_string():
+    subprocess.run("uname", shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def argv_close_fds():
+    subprocess.run(["uname"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def argv_close_fds_fork():
+    # the private switch only exists on python 3.10+, which otherwise uses vfork
+    use_vfork = getattr(subprocess, "_USE_VFORK", False)
+    subprocess._USE_VFORK = False
+    try:
+        argv_close_fds()
+    finally:
+        subprocess._USE_VFORK = use_vfork
+
+
+def argv_run_process():
+    OSLayer.run_process(["uname"])
+
+
+def median_call_ms(call, calls: int) -> float:
+    durations = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--heap-mb", type=int, nargs="+", default=[0, 200])
+    args = parser.parse_args()
+
+    heap = []
+    heap_mb = 0
+    columns = ("heap (MB)", "sh -c", "fork", "vfork", "run_process")
+    print("{:>10} {:>12} {:>12} {:>12} {:>12}".format(*columns))
+    for target_mb in sorted(args.heap_mb):
+        # touched pages, so they are mapped and a fork has to copy their tables
+        heap.extend(bytearray(b"x" * 2**20) for _ in range(target_mb - heap_mb))
+        heap_mb = target_mb
+        print(
+            "{:>10} {:>12.2f} {:>12.2f} {:>12.2f} {:>12.2f}".format(
+                heap_mb,
+                median_call_ms(shell_string, args.calls),
+                median_call_ms(argv_close_fds_fork, args.calls),
+                median_call_ms(argv_close_fds, args.calls),
+                median_call_ms(argv_run_process, args.calls),
+            )
+        )
+    print("median time per call in ms")
+
+
+if __name__ == "__main__":
+    main()
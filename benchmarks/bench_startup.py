@@ -0,0 +1,53 @@
+"""Measures how long the profile scripts take to import.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_startup [--repeats 20]
+
+Every submission, status check and cancellation starts a new interpreter, so import
+time is paid once per call. Import times are read from python -X importtime and
+reported as the median over all repeats, next to the cost of the modules the
+submit script no longer imports at start up.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent.parent / "tests" / "src"
+SCRIPTS = ("lsf_submit", "lsf_status", "lsf_cancel")
+DEFERRED_MODULES = ("snakemake.utils", "yaml")
+
+
+def cumulative_import_us(module: str) -> int:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import {}".format(module)],
+        cwd=str(SCRIPT_DIR),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+    # the module itself is the last line: "import time: self | cumulative | name"
+    last_line = completed.stderr.decode().strip().splitlines()[-1]
+    return int(last_line.split("|")[1])
+
+
+def median_import_ms(module: str, repeats: int) -> float:
+    return statistics.median(cumulative_import_us(module) for _ in range(repeats)) / 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    print("{:>16} {:>12}".format("module", "import (ms)"))
+    for module in SCRIPTS + DEFERRED_MODULES:
+        if module == DEFERRED_MODULES[0]:
+            print("not imported by lsf_submit at start up:")
+        print("{:>16} {:>12.1f}".format(module, median_import_ms(module, args.repeats)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Measures the CPU time Submitter spends building one bsub command.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_submitter [--submissions 5000]
+
+Each submission creates a Submitter for a jobscript and reads every property
+Submitter.submit uses. The same loop is run with a copy of Submitter whose cached
+properties are plain properties and whose Config does not remember the parameters
+of a rule, which is how both behaved before memoization.
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+from unittest.mock import patch
+
+from tests.src.CookieCutter import CookieCutter
+from tests.src.lsf_config import Config
+from tests.src.lsf_submit import Submitter, cached_property
+
+JOBSCRIPT = """#!/bin/sh
+# properties = {"type": "single", "rule": "align", "local": false, "input": ["a.fq"], "output": ["a.bam"], "wildcards": {"sample": "a", "lane": "1"}, "params": {}, "log": [], "threads": 4, "resources": {"mem_mb": 8000, "time": 120}, "jobid": 7, "cluster": {}}
+echo hello
+"""  # noqa: E501
+
+LSF_CONFIG = {
+    "__default__": "-P project -W 60 -R 'select[avx2]'",
+    "align": ["-q long", "-R 'select[gpu]'", "-n 4"],
+}
+
+COOKIECUTTER = {
+    "get_log_dir": "logs/cluster",
+    "get_default_mem_mb": 1024,
+    "get_default_queue": "normal",
+    "get_default_project": "",
+}
+
+
+def uncached(cls: type) -> type:
+    """Copy of cls with every cached property turned back into a property."""
+    attributes = {
+        name: property(attribute.func)
+        for name, attribute in vars(cls).items()
+        if isinstance(attribute, cached_property)
+    }
+    return type("Uncached" + cls.__name__, (cls,), attributes)
+
+
+class UncachedConfig(Config):
+    def params_for_rule(self, rulename: str) -> List[str]:
+        """The bsub arguments of the rule, assembled again on every call."""
+        self._params_for_rule.clear()
+        return super().params_for_rule(rulename)
+
+
+def submit_without_running(submitter: Submitter):
+    # the properties submit() reads, in the order it reads them
+    submitter.logdir
+    submitter.outlog
+    submitter.errlog
+    submitter.submit_cmd
+    submitter.outlog
+
+
+def cpu_time_per_submission(
+    cls: type, config_cls: type, jobscript: str, submissions: int
+) -> float:
+    start = time.process_time()
+    for _ in range(submissions):
+        # every submission is a new process that parses lsf.yaml again
+        lsf_config = config_cls(LSF_CONFIG)
+        submit_without_running(cls(jobscript, lsf_config=lsf_config))
+    return (time.process_time() - start) / submissions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--submissions", type=int, default=5000)
+    args = parser.parse_args()
+
+    patches = [
+        patch.object(CookieCutter, name, return_value=value)
+        for name, value in COOKIECUTTER.items()
+    ]
+    for cookiecutter_patch in patches:
+        cookiecutter_patch.start()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        jobscript = Path(tmpdir) / "snakejob.align.7.sh"
+        jobscript.write_text(JOBSCRIPT)
+        cached = cpu_time_per_submission(
+            Submitter, Config, str(jobscript), args.submissions
+        )
+        plain = cpu_time_per_submission(
+            uncached(Submitter), UncachedConfig, str(jobscript), args.submissions
+        )
+
+    for cookiecutter_patch in patches:
+        cookiecutter_patch.stop()
+
+    print("{:>22} {:>10}".format("", "CPU (us)"))
+    print("{:>22} {:>10.1f}".format("uncached properties", plain * 1e6))
+    print("{:>22} {:>10.1f}".format("cached properties", cached * 1e6))
+    print("{:>22} {:>9.1f}x".format("speedup", plain / cached))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Compares OSLayer.tail with forking the tail executable on large job logs.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_tail [--sizes-gb 1 4] [--repeats 200]
+
+The logs are sparse files ending with an LSF completion summary, so creating a
+multi-GB log costs no disk space.
+"""
+
+import argparse
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from tests.src.OSLayer import OSLayer
+
+LSF_TRAILER = b"""
+------------------------------------------------------------
+Sender: LSF System <lsfadmin@host>
+Subject: Job 123456: <rule.i=0> in cluster <cluster> Done
+
+Job <rule.i=0> was submitted from host <login> by user <user> in cluster <cluster>.
+Job was executed on host(s) <node>, in queue <normal>, as user <user>.
+</home/user> was used as the home directory.
+</home/user/project> was used as the working directory.
+Started at Mon Oct  1 10:00:00 2018
+Terminated at Mon Oct  1 10:05:00 2018
+Results reported at Mon Oct  1 10:05:00 2018
+
+Your job looked like:
+
+------------------------------------------------------------
+# LSBATCH: User input
+.snakemake/tmp.abcdef/snakejob.rule.2.sh
+------------------------------------------------------------
+
+Successfully completed.
+
+Resource usage summary:
+
+    CPU time :                                   290.00 sec.
+    Max Memory :                                 1024 MB
+    Average Memory :                             512.00 MB
+    Total Requested Memory :                     2048.00 MB
+    Delta Memory :                               1024.00 MB
+    Max Swap :                                   -
+    Max Processes :                              4
+    Max Threads :                                5
+    Run time :                                   300 sec.
+    Turnaround time :                            305 sec.
+
+The output (if any) is above this job summary.
+"""
+
+
+def make_log(directory: Path, size_bytes: int) -> Path:
+    path = directory / "job_{}.out".format(size_bytes)
+    with path.open("wb") as stream:
+        stream.seek(max(0, size_bytes - len(LSF_TRAILER)))
+        stream.write(LSF_TRAILER)
+    return path
+
+
+def tail_with_fork(path: Path, num_lines: int):
+    completed = subprocess.run(
+        ["tail", "-n", str(num_lines), str(path)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+    return completed.stdout.splitlines(keepends=True)
+
+
+def time_per_call(function, path: Path, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function(str(path), 30)
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes-gb", type=float, nargs="+", default=[0.001, 1, 4])
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    print(
+        "{:>10} {:>14} {:>14} {:>8}".format(
+            "log size", "fork (us)", "native (us)", "speedup"
+        )
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for size_gb in args.sizes_gb:
+            path = make_log(Path(tmpdir), int(size_gb * 1024**3))
+            assert tail_with_fork(path, 30) == OSLayer.tail(str(path), 30)
+            fork = time_per_call(tail_with_fork, path, args.repeats)
+            native = time_per_call(OSLayer.tail, path, args.repeats)
+            print(
+                "{:>8}GB {:>14.1f} {:>14.1f} {:>7.1f}x".format(
+                    size_gb, fork * 1e6, native * 1e6, fork / native
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
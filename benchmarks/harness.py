@@ -0,0 +1,243 @@
+"""A small asv-style benchmark runner.
+
+A benchmark is a generator function registered with @benchmark. It sets up what it
+needs, yields a Timed, and cleans up after the yield. For every combination of the
+parameters given to @benchmark, the runner calls Timed.prepare (untimed) and
+Timed.call (timed) once to warm up and then repeat times, and records the wall time
+and the CPU time of this process and of its child processes (the LSF commands).
+Results are written as JSON together with the commit they were measured at, so
+that runs of two commits can be compared with compare_results.
+"""
+
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+Timed = namedtuple("Timed", ["call", "operations", "prepare"])
+Timed.__new__.__defaults__ = (1, None)
+Timed.__doc__ = """What a benchmark measures: call is timed, prepare (if any) runs
+untimed before every call, and operations is how many operations (jobs,
+submissions, lookups) one call makes."""
+
+Benchmark = namedtuple("Benchmark", ["name", "function", "params"])
+
+REGISTRY = OrderedDict()
+
+
+def benchmark(name: str, **params: List) -> Callable:
+    """Registers a generator function as the benchmark name, to be run with every
+    combination of the values listed for each of params."""
+
+    def register(function: Callable) -> Callable:
+        if name in REGISTRY:
+            raise ValueError("Benchmark {} is registered twice".format(name))
+        REGISTRY[name] = Benchmark(name, contextmanager(function), params)
+        return function
+
+    return register
+
+
+def param_combinations(params: Dict[str, List]) -> List[Dict]:
+    names = sorted(params)
+    return [
+        OrderedDict(zip(names, values))
+        for values in itertools.product(*(params[name] for name in names))
+    ]
+
+
+def result_key(name: str, params: Dict) -> str:
+    """Identifies a benchmark run across result files, e.g. "status.tail(size_mb=1)"."""
+    if not params:
+        return name
+    return "{}({})".format(
+        name, ", ".join("{}={}".format(key, params[key]) for key in sorted(params))
+    )
+
+
+def summarize(samples: List[float]) -> dict:
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "max": max(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "samples": samples,
+    }
+
+
+def _children_cpu() -> float:
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+def measure(timed: Timed, repeat: int, warmup: int = 1) -> dict:
+    wall, cpu, child_cpu = [], [], []
+    for index in range(warmup + repeat):
+        if timed.prepare is not None:
+            timed.prepare()
+        # waited-for children only; every LSF command the profile runs is waited for
+        start = (time.perf_counter(), time.process_time(), _children_cpu())
+        timed.call()
+        end = (time.perf_counter(), time.process_time(), _children_cpu())
+        if index >= warmup:
+            wall.append(end[0] - start[0])
+            cpu.append(end[1] - start[1])
+            child_cpu.append(end[2] - start[2])
+    result = {
+        "operations": timed.operations,
+        "wall": summarize(wall),
+        "cpu": summarize(cpu),
+        "child_cpu": summarize(child_cpu),
+    }
+    median = result["wall"]["median"]
+    result["operations_per_second"] = timed.operations / median if median else None
+    return result
+
+
+def run_benchmarks(
+    names_containing: Optional[str] = None,
+    repeat: int = 5,
+    log: Callable[[str], None] = print,
+) -> Dict[str, dict]:
+    results = OrderedDict()
+    for bench in REGISTRY.values():
+        if names_containing and names_containing not in bench.name:
+            continue
+        for params in param_combinations(bench.params):
+            key = result_key(bench.name, params)
+            with bench.function(**params) as timed:
+                result = measure(timed, repeat)
+            result.update(name=bench.name, params=params)
+            results[key] = result
+            log(format_result(key, result))
+    return results
+
+
+def format_result(key: str, result: dict) -> str:
+    line = "{:<56} {:>10.4f} s {:>10.4f} s CPU".format(
+        key,
+        result["wall"]["median"],
+        result["cpu"]["median"] + result["child_cpu"]["median"],
+    )
+    if result["operations"] > 1:
+        line += " {:>12.1f} ops/s".format(result["operations_per_second"])
+    return line
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        completed = subprocess.run(
+            ["git"] + list(args),
+            cwd=str(Path(__file__).parent),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.decode().strip()
+
+
+def environment() -> dict:
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "argv": sys.argv,
+    }
+
+
+def default_results_path(directory: Path) -> Path:
+    commit = _git("rev-parse", "--short", "HEAD") or "unknown"
+    if environment()["dirty"]:
+        commit += "-dirty"
+    return Path(directory) / "{}.json".format(commit)
+
+
+def write_results(path: Path, results: Dict[str, dict]):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w") as stream:
+        json.dump({"environment": environment(), "results": results}, stream, indent=1)
+
+
+def read_results(path: Path) -> dict:
+    with Path(path).open() as stream:
+        return json.load(stream)
+
+
+Comparison = namedtuple("Comparison", ["key", "before", "after", "ratio", "verdict"])
+Comparison.__doc__ = """The median wall time per operation of one benchmark in two
+result files. verdict is "slower", "faster" or "same" given the threshold, or
+"added" or "removed"."""
+
+
+def seconds_per_operation(result: Optional[dict]) -> Optional[float]:
+    if result is None:
+        return None
+    return result["wall"]["median"] / result["operations"]
+
+
+def compare_results(before: dict, after: dict, threshold: float = 0.25) -> List:
+    """Compares the median wall time per operation of the benchmarks in two result
+    files. A benchmark is slower or faster when it changed by more than threshold
+    (0.25 is 25 %)."""
+    comparisons = []
+    keys = list(before["results"])
+    keys += [key for key in after["results"] if key not in before["results"]]
+    for key in keys:
+        old = seconds_per_operation(before["results"].get(key))
+        new = seconds_per_operation(after["results"].get(key))
+        if old is None or new is None:
+            verdict = "removed" if new is None else "added"
+            comparisons.append(Comparison(key, old, new, None, verdict))
+            continue
+        ratio = new / old if old else float("inf")
+        if ratio > 1 + threshold:
+            verdict = "slower"
+        elif ratio < 1 / (1 + threshold):
+            verdict = "faster"
+        else:
+            verdict = "same"
+        comparisons.append(Comparison(key, old, new, ratio, verdict))
+    return comparisons
+
+
+def format_comparison(comparison: Comparison) -> str:
+    def seconds(value: Optional[float]) -> str:
+        return "-" if value is None else "{:.6f}".format(value)
+
+    ratio = "-" if comparison.ratio is None else "{:.2f}x".format(comparison.ratio)
+    return "{:<56} {:>12} {:>12} {:>8} {}".format(
+        comparison.key,
+        seconds(comparison.before),
+        seconds(comparison.after),
+        ratio,
+        comparison.verdict,
+    )
+
+
+@contextmanager
+def environment_variables(**variables: str) -> Iterator[None]:
+    saved = {name: os.environ.get(name) for name in variables}
+    os.environ.update(variables)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
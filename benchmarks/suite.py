@@ -0,0 +1,208 @@
+"""The benchmarks of submission, status checks and cancellation run by
+python -m benchmarks. Everything that calls LSF runs against the simulated LSF of
+tests/fake_lsf, with query_latency etc. at their default of 0, so the numbers are
+the cost of the profile and of starting the LSF commands.
+"""
+
+import io
+import tempfile
+from contextlib import ExitStack, contextmanager, redirect_stderr
+from pathlib import Path
+from typing import Iterator
+from unittest.mock import patch
+
+import yaml
+
+from benchmarks.bench_submitter import (
+    COOKIECUTTER,
+    JOBSCRIPT,
+    LSF_CONFIG,
+    submit_without_running,
+)
+from benchmarks.bench_tail import make_log
+from benchmarks.harness import Timed, benchmark, environment_variables
+from tests.fake_lsf import FakeLSF
+from tests.src import OSLayer as os_layer
+from tests.src.CookieCutter import CookieCutter
+from tests.src.lsf_batch_query import query_records_batch
+from tests.src.lsf_cancel import kill_jobs
+from tests.src.lsf_config import Config
+from tests.src.lsf_status import StatusChecker
+from tests.src.lsf_status_async import get_statuses
+from tests.src.lsf_submit import Submitter
+
+SUBMISSIONS = 20
+STATUS_CHECKS = 20
+LOG_CHECKS = 100
+
+
+@contextmanager
+def fake_lsf_backend(**settings) -> Iterator[FakeLSF]:
+    """A simulated LSF first on PATH for the duration of the block."""
+    with tempfile.TemporaryDirectory() as directory:
+        fake_lsf = FakeLSF(Path(directory) / "fake_lsf", **settings)
+        fake_lsf.install()
+        with environment_variables(**fake_lsf.env()):
+            # executables are looked up once per process
+            os_layer.resolve_executable.cache_clear()
+            try:
+                yield fake_lsf
+            finally:
+                os_layer.resolve_executable.cache_clear()
+
+
+@contextmanager
+def profile_settings(**overrides) -> Iterator[None]:
+    """The cookiecutter settings, which are not rendered in tests/src."""
+    settings = dict(COOKIECUTTER, jobscript_timeout=10, **overrides)
+    with ExitStack() as stack:
+        for name, value in settings.items():
+            stack.enter_context(patch.object(CookieCutter, name, return_value=value))
+        yield
+
+
+@contextmanager
+def jobscript_in(directory: Path) -> Iterator[str]:
+    jobscript = Path(directory) / "snakejob.align.7.sh"
+    jobscript.write_text(JOBSCRIPT)
+    yield str(jobscript)
+
+
+@benchmark("submit.build_command")
+def build_command():
+    """CPU time of one submission without bsub: parsing the config and building
+    the bsub command for a jobscript."""
+    with tempfile.TemporaryDirectory() as directory, profile_settings(
+        get_log_dir=directory
+    ), jobscript_in(directory) as jobscript:
+
+        def submit():
+            for _ in range(SUBMISSIONS):
+                submit_without_running(
+                    Submitter(jobscript, lsf_config=Config(LSF_CONFIG))
+                )
+
+        yield Timed(submit, operations=SUBMISSIONS)
+
+
+@benchmark("submit.bsub")
+def submit_with_bsub():
+    """Submissions of a jobscript to the simulated bsub."""
+    with fake_lsf_backend() as fake_lsf, profile_settings(
+        get_log_dir=str(fake_lsf.directory / "logs")
+    ), jobscript_in(fake_lsf.directory) as jobscript:
+
+        def submit():
+            for _ in range(SUBMISSIONS):
+                Submitter(jobscript, lsf_config=Config(LSF_CONFIG)).submit_job()
+
+        yield Timed(submit, operations=SUBMISSIONS)
+
+
+def submitted_jobs(fake_lsf: FakeLSF, count: int) -> list:
+    fake_lsf.configure(pend_seconds=0, run_seconds=3600)
+    outlog = str(fake_lsf.directory / "job.out")
+    return [(str(jobid), outlog) for jobid in fake_lsf.add_jobs(count, outlog=outlog)]
+
+
+@benchmark("status.bjobs_per_job", jobs=[1000], latency=[0, 0.05])
+def status_per_job(jobs: int, latency: float):
+    """Status checks with one bjobs call each, the default status script. latency
+    is the time mbatchd takes to answer every query."""
+    with fake_lsf_backend(query_latency=latency) as fake_lsf:
+        sample = submitted_jobs(fake_lsf, jobs)[:STATUS_CHECKS]
+
+        def check():
+            for jobid, outlog in sample:
+                StatusChecker(jobid, outlog).get_status()
+
+        yield Timed(check, operations=STATUS_CHECKS)
+
+
+@benchmark("status.async", jobs=[1000], latency=[0, 0.05])
+def status_async(jobs: int, latency: float):
+    """The same status checks run concurrently by the asyncio status checker."""
+    with fake_lsf_backend(query_latency=latency) as fake_lsf:
+        sample = submitted_jobs(fake_lsf, jobs)[:STATUS_CHECKS]
+        yield Timed(lambda: get_statuses(sample), operations=STATUS_CHECKS)
+
+
+@benchmark("status.batched_bjobs", jobs=[1000, 10000])
+def status_batched(jobs: int):
+    """One bjobs call for every job, as the status cache and daemon refresh."""
+    with fake_lsf_backend() as fake_lsf:
+        jobids = [jobid for jobid, _ in submitted_jobs(fake_lsf, jobs)]
+        yield Timed(lambda: query_records_batch(jobids), operations=jobs)
+
+
+@benchmark("status.log_tail", size_mb=[1, 1024, 16384])
+def status_from_log(size_mb: int):
+    """The fallback of a status check to the LSF summary at the end of the log.
+    The logs are sparse files, so large ones cost no disk space."""
+    with tempfile.TemporaryDirectory() as directory:
+        outlog = str(make_log(Path(directory), size_mb * 1024**2))
+        checker = StatusChecker(123456, outlog)
+
+        def check():
+            for _ in range(LOG_CHECKS):
+                status = checker._query_status_using_log_or_fail()
+                assert status == StatusChecker.SUCCESS
+
+        yield Timed(check, operations=LOG_CHECKS)
+
+
+def large_config(rules: int) -> dict:
+    config = {"__default__": LSF_CONFIG["__default__"]}
+    for index in range(rules):
+        config["rule_{}".format(index)] = [
+            "-q long",
+            "-R 'select[mem>{}]'".format(index),
+            "-n {}".format(index % 16 + 1),
+        ]
+    return config
+
+
+@benchmark("config.params_for_rule", rules=[100, 10000])
+def params_for_rule(rules: int):
+    """Looking up the bsub params of every rule of a large config once."""
+    lsf_config = Config(large_config(rules))
+    rulenames = ["rule_{}".format(index) for index in range(rules)]
+
+    def look_up():
+        for rulename in rulenames:
+            lsf_config.params_for_rule(rulename)
+
+    yield Timed(look_up, operations=rules, prepare=lsf_config._params_for_rule.clear)
+
+
+@benchmark("config.load", rules=[100, 10000], cached=[False, True])
+def load_config(rules: int, cached: bool):
+    """What every submission pays for a large lsf.yaml: loading it, with or without
+    the compiled cache, and the params of one rule."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "lsf.yaml"
+        path.write_text(yaml.safe_dump(large_config(rules)))
+        cache_path = Path(directory) / "lsf_config.pickle" if cached else None
+
+        def load():
+            Config.from_path(path, cache_path).params_for_rule("rule_0")
+
+        yield Timed(load)
+
+
+@benchmark("cancel.bulk", jobs=[1000, 10000])
+def cancel_bulk(jobs: int):
+    """Cancelling every job of a run with chunked, concurrent bkill calls."""
+    with fake_lsf_backend() as fake_lsf:
+        jobids = []
+
+        def submit():
+            jobids[:] = [jobid for jobid, _ in submitted_jobs(fake_lsf, jobs)]
+
+        def cancel():
+            # kill_jobs reports what it killed on stderr
+            with redirect_stderr(io.StringIO()):
+                summary = kill_jobs(jobids)
+            assert len(summary.killed) == jobs
+
+        yield Timed(cancel, operations=jobs, prepare=submit)
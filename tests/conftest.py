@@ -0,0 +1,17 @@
+import pytest
+
+from tests.fake_lsf import FakeLSF
+from tests.src import OSLayer as os_layer
+
+
+@pytest.fixture
+def fake_lsf(tmp_path, monkeypatch) -> FakeLSF:
+    """The simulated LSF commands of tests/fake_lsf, first on PATH."""
+    fake = FakeLSF(tmp_path / "fake_lsf")
+    fake.install()
+    for name, value in fake.env().items():
+        monkeypatch.setenv(name, value)
+    # executables are looked up once per process
+    os_layer.resolve_executable.cache_clear()
+    yield fake
+    os_layer.resolve_executable.cache_clear()
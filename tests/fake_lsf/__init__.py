@@ -0,0 +1,83 @@
+import json
+import os
+import stat
+import sys
+from pathlib import Path
+from typing import List
+
+from . import lsf
+
+LAUNCHER = """#!{python} -S
+import sys
+sys.path.insert(0, {module_dir!r})
+import lsf
+sys.exit(lsf.main({command!r}, sys.argv[1:]))
+"""
+
+
+class FakeLSF:
+    """
+    Installs the simulated LSF commands of lsf.py into directory/bin and controls
+    the simulation. Commands find the simulation through the environment returned
+    by env(), e.g. put it on PATH with the fake_lsf fixture.
+    """
+
+    def __init__(self, directory: Path, **settings):
+        self.directory = Path(directory)
+        self.bin_dir = self.directory / "bin"
+        self.settings = dict(settings)
+
+    def install(self) -> Path:
+        self.bin_dir.mkdir(parents=True, exist_ok=True)
+        # the launchers skip site-packages: the simulator only needs the stdlib and
+        # starts in a few milliseconds
+        for command in lsf.COMMANDS:
+            launcher = self.bin_dir / command
+            launcher.write_text(
+                LAUNCHER.format(
+                    python=sys.executable,
+                    module_dir=str(Path(lsf.__file__).parent),
+                    command=command,
+                )
+            )
+            launcher.chmod(launcher.stat().st_mode | stat.S_IEXEC)
+        self._write_settings()
+        lsf.Store(self.directory, create=True)
+        return self.bin_dir
+
+    def env(self) -> dict:
+        return {
+            "PATH": "{}{}{}".format(self.bin_dir, os.pathsep, os.environ["PATH"]),
+            "FAKE_LSF_DIR": str(self.directory),
+        }
+
+    def configure(self, **settings):
+        """Changes the settings (see lsf.DEFAULTS) for the commands run from now."""
+        self.settings.update(settings)
+        self._write_settings()
+
+    def advance(self, seconds: float):
+        """Moves the simulated clock forward."""
+        self.configure(clock_offset=self.settings.get("clock_offset", 0.0) + seconds)
+
+    def _write_settings(self):
+        path = self.directory / lsf.CONFIG_NAME
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self.settings))
+        os.replace(str(tmp_path), str(path))
+
+    def store(self) -> lsf.Store:
+        return lsf.Store(self.directory)
+
+    def add_jobs(self, count: int, **fields) -> List[int]:
+        """Adds count jobs as if they had been submitted with bsub, without running
+        bsub, and returns their jobids. fields are the name, queue, job_group,
+        command and outlog of each; a relative outlog is relative to the current
+        directory, as with bsub."""
+        if fields.get("outlog"):
+            fields["outlog"] = os.path.abspath(fields["outlog"])
+        return self.store().add_jobs([dict(fields) for _ in range(count)])
+
+    def stat(self, jobid: int) -> str:
+        store = self.store()
+        return store.jobs_by_id([str(jobid)])[str(jobid)].stat(store.now())
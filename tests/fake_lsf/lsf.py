@@ -0,0 +1,647 @@
+"""A stand-in for the LSF commands the profile runs, for tests and load tests on
+machines without LSF.
+
+bsub, bjobs, bkill, bhist, bacct, bqueues and bgadd are small executables (see
+FakeLSF.install) that call main() with their name. They share a SQLite store in
+$FAKE_LSF_DIR. No job is ever run; its state follows from the clock instead:
+
+    PEND for pend_seconds after submission, then RUN for run_seconds, then
+    DONE, or EXIT with a fraction exit_rate of the jobs.
+    A fraction unknown_rate of the jobs turns UNKWN instead of RUN and stays so
+    until it is killed. bkill turns it ZOMBI for zombie_seconds, then EXIT;
+    bkill -r removes it (EXIT) at once.
+    bjobs forgets finished jobs clean_period seconds after they finished, like
+    mbatchd with CLEAN_PERIOD. bhist and bacct keep them.
+
+When a job finishes, the LSF trailer (status line and resource usage summary) is
+written to its output log by the next command that runs. Every command waits
+latency seconds (more with probability slowdown_rate, as a busy mbatchd does) and
+bjobs fails with probability failure_rate. The settings live in config.json next
+to the store; clock_offset moves the simulated clock forward.
+
+Job arrays (-J "name[1-10]") are not simulated and job group limits are recorded
+but not enforced.
+"""
+
+import json
+import os
+import random
+import shlex
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+STORE_NAME = "lsf.db"
+CONFIG_NAME = "config.json"
+COMMANDS = ("bsub", "bjobs", "bkill", "bhist", "bacct", "bqueues", "bgadd")
+
+DEFAULTS = {
+    "pend_seconds": 1.0,
+    "run_seconds": 5.0,
+    "exit_rate": 0.0,
+    "unknown_rate": 0.0,
+    "zombie_seconds": 60.0,
+    "clean_period": 3600.0,
+    "max_mem_mb": 100,
+    "submit_latency": 0.0,
+    "query_latency": 0.0,
+    "kill_latency": 0.0,
+    "slowdown_rate": 0.0,
+    "slowdown_seconds": 1.0,
+    "failure_rate": 0.0,
+    "clock_offset": 0.0,
+    "first_jobid": 1000,
+    "default_queue": "normal",
+    "queues": {"normal": {"max": None}},
+    "seed": 0,
+}
+
+PEND = "PEND"
+RUN = "RUN"
+DONE = "DONE"
+EXIT = "EXIT"
+UNKNOWN = "UNKWN"
+ZOMBIE = "ZOMBI"
+KILLED_EXIT_CODE = 130
+
+# bsub options that take no value; all others take one
+BSUB_FLAGS = {"-B", "-H", "-I", "-Ip", "-Is", "-K", "-N", "-r", "-rn", "-x", "-tty"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    jobid INTEGER PRIMARY KEY,
+    name TEXT,
+    queue TEXT,
+    job_group TEXT,
+    command TEXT,
+    outlog TEXT,
+    submit_time REAL,
+    start_time REAL,
+    finish_time REAL,
+    final_stat TEXT,
+    final_exit_code INTEGER,
+    unknown INTEGER,
+    max_mem_mb INTEGER,
+    killed_time REAL,
+    removed INTEGER DEFAULT 0,
+    log_written INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_pending_logs ON jobs (log_written, finish_time);
+CREATE TABLE IF NOT EXISTS job_groups (name TEXT PRIMARY KEY, job_limit INTEGER);
+"""
+
+TRAILER = """
+------------------------------------------------------------
+Sender: LSF System <lsfadmin@fakehost>
+Subject: Job {jobid}: <{name}> in cluster <fake> {subject}
+
+Job <{name}> was submitted from host <login> by user <{user}> in cluster <fake> at \
+{submitted}.
+Job was executed on host(s) <fakehost>, in queue <{queue}>, as user <{user}> in \
+cluster <fake> at {started}.
+<{cwd}> was used as the working directory.
+Started at {started}
+Terminated at {finished}
+Results reported at {finished}
+
+Your job looked like:
+
+------------------------------------------------------------
+# LSBATCH: User input
+{command}
+------------------------------------------------------------
+
+{status_lines}
+
+Resource usage summary:
+
+    CPU time :                                   {cpu_time:.2f} sec.
+    Max Memory :                                 {max_mem_mb} MB
+    Average Memory :                             {average_mem_mb:.2f} MB
+    Total Requested Memory :                     -
+    Delta Memory :                               -
+    Max Swap :                                   -
+    Max Processes :                              1
+    Max Threads :                                1
+    Run time :                                   {run_time} sec.
+    Turnaround time :                            {turnaround} sec.
+
+The output (if any) follows:
+
+
+"""
+
+
+class Job:
+    """A row of the jobs table, which tells the state of the job at any time."""
+
+    def __init__(self, row: sqlite3.Row, zombie_seconds: float):
+        self.__dict__.update(dict(row))
+        self.zombie_seconds = zombie_seconds
+
+    def _stat_unless_killed(self, now: float) -> str:
+        if now < self.start_time:
+            return PEND
+        if self.unknown:
+            return UNKNOWN
+        if now < self.finish_time:
+            return RUN
+        return self.final_stat
+
+    @property
+    def was_killed(self) -> bool:
+        return self.killed_time is not None and self._stat_unless_killed(
+            self.killed_time
+        ) not in (DONE, EXIT)
+
+    @property
+    def end_time(self) -> Optional[float]:
+        """When the job finished, or None if it never will by itself."""
+        if not self.was_killed:
+            return None if self.unknown else self.finish_time
+        if self._stat_unless_killed(self.killed_time) == UNKNOWN and not self.removed:
+            return self.killed_time + self.zombie_seconds
+        return self.killed_time
+
+    def stat(self, now: float) -> str:
+        if not self.was_killed or now < self.killed_time:
+            return self._stat_unless_killed(now)
+        # an unknown job killed without -r is a zombie for a while
+        return ZOMBIE if now < self.end_time else EXIT
+
+    def exit_code(self, now: float) -> Optional[int]:
+        if self.stat(now) != EXIT:
+            return None
+        return KILLED_EXIT_CODE if self.was_killed else self.final_exit_code
+
+    def is_finished(self, now: float) -> bool:
+        return self.stat(now) in (DONE, EXIT)
+
+    def is_cleaned(self, now: float, clean_period: float) -> bool:
+        """Whether mbatchd has forgotten the job."""
+        return self.is_finished(now) and now - self.end_time > clean_period
+
+
+class Store:
+    def __init__(self, directory: Path, create: bool = False):
+        self.directory = Path(directory)
+        self.config = dict(DEFAULTS)
+        try:
+            with (self.directory / CONFIG_NAME).open() as stream:
+                self.config.update(json.load(stream))
+        except FileNotFoundError:
+            pass
+        self.connection = sqlite3.connect(
+            str(self.directory / STORE_NAME), timeout=60, isolation_level=None
+        )
+        self.connection.row_factory = sqlite3.Row
+        if create:
+            # done once, as it takes the write lock every command would wait for
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.executescript(SCHEMA)
+        self.rng = random.Random()
+
+    def now(self) -> float:
+        return time.time() + self.config["clock_offset"]
+
+    def wait(self, latency_setting: str):
+        latency = self.config[latency_setting]
+        if self.rng.random() < self.config["slowdown_rate"]:
+            latency += self.config["slowdown_seconds"]
+        if latency > 0:
+            time.sleep(latency)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        # IMMEDIATE takes the write lock up front, so what is read in the
+        # transaction is still true when it writes
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    def jobs(self, where: str = "", parameters: Tuple = ()) -> List[Job]:
+        rows = self.connection.execute(
+            "SELECT * FROM jobs {} ORDER BY jobid".format(where), parameters
+        )
+        return [Job(row, self.config["zombie_seconds"]) for row in rows]
+
+    def jobs_by_id(self, jobids: List[str]) -> Dict[str, Job]:
+        remaining = [int(jobid) for jobid in jobids if jobid.isdigit()]
+        jobs = dict()
+        # one query per 500 ids keeps below the SQLite variable limit
+        while remaining:
+            chunk, remaining = remaining[:500], remaining[500:]
+            for job in self.jobs(
+                "WHERE jobid IN ({})".format(",".join("?" * len(chunk))), tuple(chunk)
+            ):
+                jobs[str(job.jobid)] = job
+        return jobs
+
+    def add_jobs(self, jobs: List[dict], now: Optional[float] = None) -> List[int]:
+        """Adds jobs, each a dict of name, queue, job_group, command and outlog,
+        deciding now how each will go. Returns their jobids."""
+        if now is None:
+            now = self.now()
+        config = self.config
+        with self.transaction():
+            (last,) = self.connection.execute("SELECT MAX(jobid) FROM jobs").fetchone()
+            jobid = config["first_jobid"] if last is None else last + 1
+            jobids = []
+            rows = []
+            for job in jobs:
+                # the outcome of a job only depends on the seed and its jobid
+                rng = random.Random("{}-{}".format(config["seed"], jobid))
+                start_time = now + config["pend_seconds"]
+                failed = rng.random() < config["exit_rate"]
+                rows.append(
+                    (
+                        jobid,
+                        job.get("name") or str(jobid),
+                        job.get("queue") or config["default_queue"],
+                        job.get("job_group"),
+                        job.get("command", ""),
+                        job.get("outlog"),
+                        now,
+                        start_time,
+                        start_time + config["run_seconds"],
+                        EXIT if failed else DONE,
+                        1 if failed else 0,
+                        int(rng.random() < config["unknown_rate"]),
+                        rng.randint(1, max(1, config["max_mem_mb"])),
+                    )
+                )
+                jobids.append(jobid)
+                jobid += 1
+            self.connection.executemany(
+                "INSERT INTO jobs (jobid, name, queue, job_group, command, outlog, "
+                "submit_time, start_time, finish_time, final_stat, final_exit_code, "
+                "unknown, max_mem_mb) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            for job in jobs:
+                if job.get("job_group"):
+                    self.connection.execute(
+                        "INSERT OR IGNORE INTO job_groups VALUES (?, 0)",
+                        (job["job_group"],),
+                    )
+        return jobids
+
+    def kill(self, job: Job, now: float, remove: bool):
+        self.connection.execute(
+            "UPDATE jobs SET killed_time = ?, removed = ? WHERE jobid = ?",
+            (now, int(remove), job.jobid),
+        )
+
+    def write_finished_logs(self, now: float):
+        """Writes the trailer of every job that finished since the last command."""
+        where = (
+            "WHERE log_written = 0 "
+            "AND ((finish_time <= ? AND unknown = 0) OR killed_time <= ?)"
+        )
+        if not any(job.is_finished(now) for job in self.jobs(where, (now, now))):
+            return
+        with self.transaction():
+            # again under the lock, so no trailer is written twice
+            finished = [
+                job for job in self.jobs(where, (now, now)) if job.is_finished(now)
+            ]
+            for job in finished:
+                if job.outlog:
+                    write_trailer(job, now)
+            self.connection.executemany(
+                "UPDATE jobs SET log_written = 1 WHERE jobid = ?",
+                [(job.jobid,) for job in finished],
+            )
+
+
+def _format_time(timestamp: float) -> str:
+    return time.strftime("%a %b %d %H:%M:%S %Y", time.localtime(timestamp))
+
+
+def write_trailer(job: Job, now: float):
+    stat = job.stat(now)
+    if stat == DONE:
+        subject = "Done"
+        status_lines = "Successfully completed."
+    else:
+        subject = "Exited"
+        exit_code = job.exit_code(now)
+        status_lines = "Exited with exit code {}.".format(exit_code)
+        if exit_code == KILLED_EXIT_CODE:
+            status_lines = "TERM_OWNER: job killed by owner.\n" + status_lines
+    started = min(job.start_time, job.end_time)
+    run_time = max(0, int(job.end_time - started))
+    path = Path(job.outlog)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a") as stream:
+        stream.write(
+            TRAILER.format(
+                jobid=job.jobid,
+                name=job.name,
+                subject=subject,
+                user=os.environ.get("USER", "user"),
+                queue=job.queue,
+                cwd=os.getcwd(),
+                command=job.command,
+                submitted=_format_time(job.submit_time),
+                started=_format_time(started),
+                finished=_format_time(job.end_time),
+                status_lines=status_lines,
+                cpu_time=run_time * 0.9,
+                max_mem_mb=job.max_mem_mb,
+                average_mem_mb=job.max_mem_mb / 2,
+                run_time=run_time,
+                turnaround=int(job.end_time - job.submit_time),
+            )
+        )
+
+
+def parse_bsub_args(args: List[str]) -> dict:
+    job = {"command": ""}
+    values = {"-J": "name", "-q": "queue", "-g": "job_group", "-o": "outlog"}
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        if not arg.startswith("-"):
+            job["command"] = " ".join(args[index:])
+            break
+        if arg not in BSUB_FLAGS:
+            index += 1
+            if arg in values and index < len(args):
+                job[values[arg]] = args[index]
+        index += 1
+    if job.get("outlog"):
+        # like LSF, relative to where the job was submitted rather than to where
+        # the command that finishes it runs
+        job["outlog"] = os.path.abspath(job["outlog"])
+    return job
+
+
+def submitted_line(jobid: int, job: dict, queue: str) -> str:
+    return "Job <{}> is submitted to {}queue <{}>.".format(
+        jobid, "" if job.get("queue") else "default ", queue
+    )
+
+
+def bsub(store: Store, args: List[str]) -> Tuple[str, str, int]:
+    store.wait("submit_latency")
+    if args[:1] == ["-pack"]:
+        with open(args[1]) as stream:
+            jobs = [
+                parse_bsub_args(shlex.split(line)) for line in stream if line.strip()
+            ]
+    else:
+        jobs = [parse_bsub_args(args)]
+    for job in jobs:
+        if "[" in job.get("name", ""):
+            return "", "Job arrays are not supported by the fake LSF.", 255
+    jobids = store.add_jobs(jobs)
+    lines = [
+        submitted_line(jobid, job, job.get("queue") or store.config["default_queue"])
+        for jobid, job in zip(jobids, jobs)
+    ]
+    return "\n".join(lines), "", 0
+
+
+def _option_values(args: List[str], options: Tuple[str, ...]) -> Tuple[dict, List[str]]:
+    """Splits args into the values of options and the remaining arguments."""
+    values = dict()
+    rest = []
+    index = 0
+    while index < len(args):
+        if args[index] in options and index + 1 < len(args):
+            values[args[index]] = args[index + 1]
+            index += 2
+        else:
+            rest.append(args[index])
+            index += 1
+    return values, rest
+
+
+def bjobs_fields(job: Job, fields: List[str], now: float) -> dict:
+    stat = job.stat(now)
+    started = stat not in (PEND,)
+    end_time = job.end_time if job.is_finished(now) else now
+    exit_code = job.exit_code(now)
+    values = {
+        "jobid": str(job.jobid),
+        "jobindex": "0",
+        "stat": stat,
+        "exit_code": "" if exit_code is None else str(exit_code),
+        "pend_reason": "New job is waiting for scheduling;" if stat == PEND else "",
+        "max_mem": "{} Mbytes".format(job.max_mem_mb) if started else "",
+        "run_time": "{} second(s)".format(
+            max(0, int(end_time - job.start_time)) if started else 0
+        ),
+        "output_file": job.outlog or "",
+        "queue": job.queue,
+        "job_name": job.name,
+        "job_group": job.job_group or "",
+    }
+    return {field.upper(): values.get(field, "-") for field in fields}
+
+
+def bjobs(store: Store, args: List[str]) -> Tuple[str, str, int]:
+    store.wait("query_latency")
+    if store.rng.random() < store.config["failure_rate"]:
+        return "", "LSF is processing your request. Please wait ...", 255
+    options, rest = _option_values(args, ("-o", "-g"))
+    show_finished = "-a" in rest
+    jobids = [arg for arg in rest if not arg.startswith("-")]
+    fields = options.get("-o", "jobid stat queue job_name").split()
+    now = store.now()
+    clean_period = store.config["clean_period"]
+    records = []
+    exit_status = 0
+    if jobids:
+        known = store.jobs_by_id(jobids)
+        for jobid in jobids:
+            job = known.get(jobid)
+            if job is None or job.is_cleaned(now, clean_period):
+                records.append(
+                    {"JOBID": jobid, "ERROR": "Job <{}> is not found".format(jobid)}
+                )
+                exit_status = 255
+            else:
+                records.append(bjobs_fields(job, fields, now))
+    else:
+        if "-g" in options:
+            jobs = store.jobs("WHERE job_group = ?", (options["-g"],))
+        else:
+            jobs = store.jobs()
+        for job in jobs:
+            if job.is_cleaned(now, clean_period):
+                continue
+            if job.is_finished(now) and not show_finished:
+                continue
+            records.append(bjobs_fields(job, fields, now))
+    output = {"COMMAND": "bjobs", "JOBS": len(records), "RECORDS": records}
+    if "-json" in rest:
+        return json.dumps(output), "", exit_status
+    lines = [" ".join(record.get(f.upper(), "-") for f in fields) for record in records]
+    return "\n".join(lines), "", exit_status
+
+
+def _kill_targets(
+    store: Store, options: dict, jobids: List[str], now: float
+) -> List[Tuple[str, Optional[Job]]]:
+    if jobids != ["0"]:
+        known = store.jobs_by_id(jobids)
+        return [(jobid, known.get(jobid)) for jobid in jobids]
+    # job id 0 means every unfinished job of the user, or of the group
+    if "-g" in options:
+        jobs = store.jobs("WHERE job_group = ?", (options["-g"],))
+    else:
+        jobs = store.jobs()
+    return [(str(job.jobid), job) for job in jobs if not job.is_finished(now)]
+
+
+def bkill(store: Store, args: List[str]) -> Tuple[str, str, int]:
+    store.wait("kill_latency")
+    options, rest = _option_values(args, ("-g",))
+    remove = "-r" in rest
+    jobids = [arg for arg in rest if not arg.startswith("-")]
+    now = store.now()
+    clean_period = store.config["clean_period"]
+    output_lines = []
+    error_lines = []
+    with store.transaction():
+        targets = _kill_targets(store, options, jobids, now)
+        if not targets:
+            error_lines.append("No unfinished job found")
+        for jobid, job in targets:
+            if job is None or job.is_cleaned(now, clean_period):
+                error_lines.append("Job <{}>: No matching job found".format(jobid))
+            elif job.is_finished(now):
+                error_lines.append("Job <{}>: Job has already finished".format(jobid))
+            elif job.was_killed and not remove:
+                error_lines.append("Job <{}>: Job is being terminated".format(jobid))
+            else:
+                store.kill(job, now, remove)
+                output_lines.append("Job <{}> is being terminated".format(jobid))
+    return "\n".join(output_lines), "\n".join(error_lines), 255 if error_lines else 0
+
+
+def history_block(job: Job, now: float, accounting: bool) -> str:
+    lines = [
+        "Job <{}>, Job Name <{}>, User <{}>, Project <default>, Command <{}>".format(
+            job.jobid, job.name, os.environ.get("USER", "user"), job.command
+        ),
+        "{}: Submitted from host <login>, to Queue <{}>;".format(
+            _format_time(job.submit_time), job.queue
+        ),
+    ]
+    stat = job.stat(now)
+    if stat != PEND:
+        lines.append(
+            "{}: Dispatched 1 Task(s) on Host(s) <fakehost>;".format(
+                _format_time(job.start_time)
+            )
+        )
+    if stat == DONE:
+        event = "Completed <done>." if accounting else "Done successfully."
+        lines.append("{}: {}".format(_format_time(job.end_time), event))
+    elif stat == EXIT:
+        event = (
+            "Completed <exit>."
+            if accounting
+            else "Exited with exit code {}.".format(job.exit_code(now))
+        )
+        lines.append("{}: {}".format(_format_time(job.end_time), event))
+    return "\n".join(lines)
+
+
+def history(store: Store, args: List[str], accounting: bool) -> Tuple[str, str, int]:
+    store.wait("query_latency")
+    jobids = [arg for arg in args if not arg.startswith("-")]
+    now = store.now()
+    known = store.jobs_by_id(jobids)
+    blocks = []
+    for jobid in jobids:
+        job = known.get(jobid)
+        # bacct only knows finished jobs
+        if job is not None and (not accounting or job.is_finished(now)):
+            blocks.append(history_block(job, now, accounting))
+    if not blocks:
+        return "", "No matching job found", 255
+    separator = "\n" + "-" * 78 + "\n\n"
+    return separator.join(blocks) + separator, "", 0
+
+
+def bqueues(store: Store, args: List[str]) -> Tuple[str, str, int]:
+    store.wait("query_latency")
+    options, rest = _option_values(args, ("-o",))
+    fields = options.get("-o", "queue_name status max njobs pend run").split()
+    queues = [arg for arg in rest if not arg.startswith("-")]
+    configured = store.config["queues"]
+    now = store.now()
+    counts = {queue: {PEND: 0, RUN: 0} for queue in configured}
+    for job in store.jobs("WHERE log_written = 0"):
+        stat = job.stat(now)
+        if job.queue in counts and stat in (PEND, RUN):
+            counts[job.queue][stat] += 1
+    records = []
+    for queue in queues or list(configured):
+        if queue not in configured:
+            records.append({"QUEUE_NAME": queue, "ERROR": "No such queue"})
+            continue
+        maximum = configured[queue].get("max")
+        values = {
+            "queue_name": queue,
+            "status": "Open:Active",
+            "max": "-" if maximum is None else str(maximum),
+            "njobs": str(counts[queue][PEND] + counts[queue][RUN]),
+            "pend": str(counts[queue][PEND]),
+            "run": str(counts[queue][RUN]),
+            "rsv": "0",
+        }
+        records.append({field.upper(): values.get(field, "-") for field in fields})
+    output = {"COMMAND": "bqueues", "QUEUES": len(records), "RECORDS": records}
+    return json.dumps(output), "", 0
+
+
+def bgadd(store: Store, args: List[str]) -> Tuple[str, str, int]:
+    options, rest = _option_values(args, ("-L",))
+    group = rest[-1]
+    cursor = store.connection.execute(
+        "INSERT OR IGNORE INTO job_groups VALUES (?, ?)",
+        (group, int(options.get("-L", 0))),
+    )
+    if cursor.rowcount == 0:
+        return "", "Job group <{}> already exists".format(group), 255
+    return "Job group <{}> was added.".format(group), "", 0
+
+
+def main(command: str, args: List[str]) -> int:
+    directory = os.environ.get("FAKE_LSF_DIR")
+    if not directory:
+        print("{}: FAKE_LSF_DIR is not set".format(command), file=sys.stderr)
+        return 255
+    store = Store(Path(directory))
+    store.write_finished_logs(store.now())
+    if command == "bsub":
+        output, error, status = bsub(store, args)
+    elif command == "bjobs":
+        output, error, status = bjobs(store, args)
+    elif command == "bkill":
+        output, error, status = bkill(store, args)
+    elif command in ("bhist", "bacct"):
+        output, error, status = history(store, args, accounting=command == "bacct")
+    elif command == "bqueues":
+        output, error, status = bqueues(store, args)
+    elif command == "bgadd":
+        output, error, status = bgadd(store, args)
+    else:
+        output, error, status = "", "{}: not simulated".format(command), 127
+    if output:
+        print(output)
+    if error:
+        print(error, file=sys.stderr)
+    return status
@@ -1,9 +1,12 @@
+import os
+import subprocess
+from pathlib import Path
 from unittest.mock import patch
 
 import pytest
 
 from tests.src.CookieCutter import CookieCutter
-from tests.src.OSLayer import OSLayer, TailError
+from tests.src.OSLayer import OSLayer, TailError, resolve_executable
 
 
 class TestTail:
@@ -61,3 +64,135 @@ class TestTail:
         expected = [b"second line\n", b"third line\n"]
 
         assert actual == expected
+
+    def test_lastLineWithoutNewline_returnsLineWithoutNewline(self, tmpdir):
+        content = "one line\nsecond line"
+        path = tmpdir.join("tail.txt")
+        path.write(content)
+
+        actual = OSLayer.tail(str(path), num_lines=1)
+        expected = [b"second line"]
+
+        assert actual == expected
+
+    def test_zeroLinesRequested_returnsEmpty(self, tmpdir):
+        path = tmpdir.join("tail.txt")
+        path.write("one line\n")
+
+        assert OSLayer.tail(str(path), num_lines=0) == []
+
+    def test_carriageReturnsAreNotLineBreaks(self, tmpdir):
+        path = tmpdir.join("tail.txt")
+        path.write_binary(b"one\rline\nsecond line\n")
+
+        actual = OSLayer.tail(str(path), num_lines=2)
+        expected = [b"one\rline\n", b"second line\n"]
+
+        assert actual == expected
+
+    def test_linesSpanSeveralBlocks_returnsLastNLines(self, tmpdir):
+        lines = [
+            "line {} {}\n".format(i, "x" * (i % 5000)).encode() for i in range(3000)
+        ]
+        path = tmpdir.join("tail.txt")
+        path.write_binary(b"".join(lines))
+
+        actual = OSLayer.tail(str(path), num_lines=30)
+        expected = lines[-30:]
+
+        assert actual == expected
+
+    def test_moreLinesRequestedThanInFile_returnsAllLines(self, tmpdir):
+        path = tmpdir.join("tail.txt")
+        path.write("a\nb\n")
+
+        actual = OSLayer.tail(str(path), num_lines=30)
+        expected = [b"a\n", b"b\n"]
+
+        assert actual == expected
+
+    def test_largeSparseFile_returnsTrailer(self, tmpdir):
+        path = tmpdir.join("tail.txt")
+        trailer = b"".join(b"trailer %d\n" % i for i in range(40))
+        with open(str(path), "wb") as stream:
+            stream.seek(2**30)
+            stream.write(trailer)
+
+        actual = OSLayer.tail(str(path), num_lines=30)
+        expected = trailer.splitlines(keepends=True)[-30:]
+
+        assert actual == expected
+
+
+class TestRunProcess:
+    def test_argumentList_isRunWithoutShell(self):
+        stdout, stderr = OSLayer.run_process(["echo", "a  b", "$HOME"])
+
+        assert stdout == "a  b $HOME"
+
+    def test_executable_isResolvedToAbsolutePath(self):
+        with patch.object(subprocess, "run", wraps=subprocess.run) as run_mock:
+            OSLayer.run_process(["true"])
+
+        executable = run_mock.call_args[1]["executable"]
+        assert os.path.isabs(executable)
+        assert run_mock.call_args[1]["close_fds"] is False
+
+    def test_unknownCommand_raisesLikeShell(self):
+        with pytest.raises(subprocess.CalledProcessError) as error:
+            OSLayer.run_process(["no-such-command-for-sure"])
+
+        assert error.value.returncode == 127
+
+    def test_unknownCommandWithoutCheck_returnsError(self):
+        stdout, stderr = OSLayer.run_process(["no-such-command-for-sure"], check=False)
+
+        assert stdout == ""
+        assert stderr == "no-such-command-for-sure: command not found"
+
+
+class TestResolveExecutable:
+    def test_commandOnPath_resolvesToAbsolutePath(self, tmp_path, monkeypatch):
+        command = tmp_path / "some-command"
+        command.write_text("#!/bin/sh\n")
+        command.chmod(0o755)
+        monkeypatch.setenv("PATH", str(tmp_path))
+        resolve_executable.cache_clear()
+        try:
+            assert resolve_executable("some-command") == str(command)
+            assert resolve_executable("no-such-command-for-sure") is None
+        finally:
+            resolve_executable.cache_clear()
+
+
+class TestMkdir:
+    def test_missingParents_areCreated(self, tmp_path):
+        directory = tmp_path / "a" / "b"
+
+        OSLayer.mkdir(directory)
+
+        assert directory.is_dir()
+
+    def test_existingDirectory_isOneMkdirCall(self, tmp_path):
+        with patch.object(Path, "mkdir", autospec=True, wraps=Path.mkdir) as mkdir_mock:
+            OSLayer.mkdir(tmp_path)
+
+        mkdir_mock.assert_called_once_with(tmp_path)
+
+
+class TestRemoveFile:
+    def test_existingFile_isRemoved(self, tmp_path):
+        path = tmp_path / "a.out"
+        path.touch()
+
+        OSLayer.remove_file(path)
+
+        assert not path.exists()
+
+    def test_missingFile_isIgnored(self, tmp_path):
+        OSLayer.remove_file(tmp_path / "a.out")
+
+    def test_directory_isLeftAlone(self, tmp_path):
+        OSLayer.remove_file(tmp_path)
+
+        assert tmp_path.is_dir()
@@ -0,0 +1,90 @@
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks import harness
+from benchmarks.harness import Timed, benchmark, compare_results, run_benchmarks
+
+
+@pytest.fixture
+def registry():
+    with patch.object(harness, "REGISTRY", harness.OrderedDict()) as registry:
+        yield registry
+
+
+def results(**seconds_per_key) -> dict:
+    return {
+        "environment": {},
+        "results": {
+            key: {"operations": 10, "wall": {"median": seconds * 10}}
+            for key, seconds in seconds_per_key.items()
+        },
+    }
+
+
+class TestRunBenchmarks:
+    def test_everyParamCombination_isSetUpRunAndTornDown(self, registry):
+        events = []
+
+        @benchmark("example", size=[1, 2], mode=["a"])
+        def example(size, mode):
+            events.append(("setup", size, mode))
+            yield Timed(lambda: events.append("call"), operations=size)
+            events.append(("teardown", size, mode))
+
+        measured = run_benchmarks(repeat=2, log=lambda line: None)
+
+        assert list(measured) == ["example(mode=a, size=1)", "example(mode=a, size=2)"]
+        assert events[:5] == [("setup", 1, "a"), "call", "call", "call"] + [
+            ("teardown", 1, "a")
+        ]
+        result = measured["example(mode=a, size=2)"]
+        assert result["params"] == {"mode": "a", "size": 2}
+        assert len(result["wall"]["samples"]) == 2
+        assert result["operations_per_second"] == pytest.approx(
+            2 / result["wall"]["median"]
+        )
+
+    def test_prepare_runsUntimedBeforeEveryCall(self, registry):
+        calls = []
+
+        @benchmark("prepared")
+        def prepared():
+            yield Timed(lambda: calls.append("call"), prepare=lambda: calls.append("p"))
+
+        run_benchmarks(repeat=1, log=lambda line: None)
+
+        assert calls == ["p", "call", "p", "call"]
+
+    def test_filter_skipsOtherBenchmarks(self, registry):
+        for name in ("status.one", "cancel.one"):
+            benchmark(name)(lambda: (yield Timed(lambda: None)))
+
+        measured = run_benchmarks("status", repeat=1, log=lambda line: None)
+
+        assert list(measured) == ["status.one"]
+
+    def test_sameNameTwice_raisesError(self, registry):
+        benchmark("twice")(lambda: (yield Timed(lambda: None)))
+
+        with pytest.raises(ValueError):
+            benchmark("twice")(lambda: (yield Timed(lambda: None)))
+
+
+class TestCompareResults:
+    def test_timePerOperation_isComparedAgainstThreshold(self):
+        before = results(slow=1.0, fast=1.0, noise=1.0, gone=1.0)
+        after = results(slow=1.5, fast=0.5, noise=1.05, new=1.0)
+
+        verdicts = {
+            comparison.key: comparison.verdict
+            for comparison in compare_results(before, after, threshold=0.1)
+        }
+
+        assert verdicts == {
+            "slow": "slower",
+            "fast": "faster",
+            "noise": "same",
+            "gone": "removed",
+            "new": "added",
+        }
@@ -0,0 +1,39 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from tests.src.OSLayer import OSLayer
+from tests.src.directory_cache import DirectoryCache
+
+
+class TestDirectoryCache:
+    @patch.object(OSLayer, OSLayer.mkdir.__name__)
+    def test_knownDirectory_isNotCreatedAgain(self, mkdir_mock):
+        cache = DirectoryCache()
+
+        cache.mkdir(Path("logs/a"))
+        cache.mkdir(Path("logs/a"))
+        cache.mkdir(Path("logs/b"))
+
+        assert mkdir_mock.call_count == 2
+        assert Path("logs/a") in cache
+
+    @patch.object(OSLayer, OSLayer.mkdir.__name__)
+    def test_fullCache_isCleared(self, mkdir_mock):
+        cache = DirectoryCache(max_entries=2)
+
+        for name in ("a", "b", "c"):
+            cache.mkdir(Path(name))
+
+        assert Path("a") not in cache
+        assert Path("c") in cache
+
+    @patch.object(OSLayer, OSLayer.mkdir.__name__, side_effect=PermissionError)
+    def test_failedMkdir_isNotRemembered(self, mkdir_mock):
+        cache = DirectoryCache()
+
+        with pytest.raises(PermissionError):
+            cache.mkdir(Path("logs"))
+
+        assert Path("logs") not in cache
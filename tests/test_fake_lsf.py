@@ -0,0 +1,194 @@
+import json
+import shlex
+from subprocess import CalledProcessError
+from unittest.mock import patch
+
+import pytest
+
+from tests.src.CookieCutter import CookieCutter
+from tests.src.OSLayer import OSLayer
+from tests.src.lsf_batch_query import query_records_batch
+from tests.src.lsf_cancel import kill_jobs
+from tests.src.lsf_job_groups import JobGroups
+from tests.src.lsf_status import StatusChecker
+from tests.src.lsf_status_async import get_statuses
+from tests.src.lsf_status_cache import StatusCache
+from tests.src.lsf_submit import Submitter
+from tests.src.usage_history import read_usage_summary
+
+
+def submit(outlog: str, *options: str) -> int:
+    output_stream, _ = OSLayer.run_process(
+        ["bsub", "-o", outlog] + list(options) + ["run.sh"]
+    )
+    return int(output_stream.split("<")[1].split(">")[0])
+
+
+def bjobs_stat(jobid: int) -> str:
+    output_stream, _ = OSLayer.run_process(
+        ["bjobs", "-json", "-o", "jobid stat", str(jobid)], check=False
+    )
+    return json.loads(output_stream)["RECORDS"][0].get("STAT", "not found")
+
+
+class TestSimulatedJob:
+    def test_jobGoesFromPendingToRunningToDone(self, fake_lsf, tmp_path):
+        fake_lsf.configure(pend_seconds=10, run_seconds=20)
+        jobid = submit(str(tmp_path / "job.out"))
+
+        stats = [bjobs_stat(jobid)]
+        for seconds in (10, 20):
+            fake_lsf.advance(seconds)
+            stats.append(bjobs_stat(jobid))
+
+        assert stats == ["PEND", "RUN", "DONE"]
+
+    def test_finishedJob_logHasLsfTrailer(self, fake_lsf, tmp_path):
+        fake_lsf.configure(exit_rate=1.0)
+        outlog = tmp_path / "logs" / "job.out"
+        jobid = submit(str(outlog))
+        fake_lsf.advance(3600)
+        bjobs_stat(jobid)
+
+        lines = outlog.read_text().splitlines()
+
+        status_line = lines[lines.index("Resource usage summary:") - 2]
+        assert status_line == "Exited with exit code 1."
+        assert read_usage_summary(str(outlog)).max_mem_mb > 0
+
+    def test_relativeLog_isWrittenWhereJobWasSubmitted(
+        self, fake_lsf, tmp_path, monkeypatch
+    ):
+        (tmp_path / "submit").mkdir()
+        (tmp_path / "query").mkdir()
+        monkeypatch.chdir(tmp_path / "submit")
+        jobid = submit("job.out")
+        fake_lsf.advance(3600)
+
+        monkeypatch.chdir(tmp_path / "query")
+        bjobs_stat(jobid)
+
+        assert (tmp_path / "submit" / "job.out").exists()
+        assert not (tmp_path / "query" / "job.out").exists()
+
+    def test_bjobsForgetsJobsAfterCleanPeriod(self, fake_lsf, tmp_path):
+        fake_lsf.configure(clean_period=60)
+        jobid = submit(str(tmp_path / "job.out"))
+        fake_lsf.advance(3600)
+
+        assert bjobs_stat(jobid) == "not found"
+        output_stream, _ = OSLayer.run_process(["bhist", "-l", str(jobid)])
+        assert "Done successfully" in output_stream
+
+    def test_killedJob_exitsWithOwnerTermination(self, fake_lsf, tmp_path):
+        jobid = submit(str(tmp_path / "job.out"))
+
+        output_stream, _ = OSLayer.run_process(["bkill", str(jobid)])
+
+        assert output_stream == "Job <{}> is being terminated".format(jobid)
+        assert bjobs_stat(jobid) == "EXIT"
+
+    def test_unknownJob_isZombieAfterKillUntilRemoved(self, fake_lsf, tmp_path):
+        fake_lsf.configure(unknown_rate=1.0)
+        jobid = submit(str(tmp_path / "job.out"))
+        fake_lsf.advance(3600)
+        stats = [bjobs_stat(jobid)]
+
+        for kill_cmd in (["bkill"], ["bkill", "-r"]):
+            OSLayer.run_process(kill_cmd + [str(jobid)], check=False)
+            stats.append(bjobs_stat(jobid))
+
+        assert stats == ["UNKWN", "ZOMBI", "EXIT"]
+
+    def test_busyMbatchd_bjobsFails(self, fake_lsf):
+        fake_lsf.configure(failure_rate=1.0)
+
+        with pytest.raises(CalledProcessError):
+            OSLayer.run_process(["bjobs", "-json", "1000"])
+
+
+class TestEndToEnd:
+    @pytest.fixture(autouse=True)
+    def settings(self, tmp_path):
+        with patch.object(
+            CookieCutter, CookieCutter.get_log_dir.__name__, return_value=str(tmp_path)
+        ), patch.object(
+            CookieCutter, CookieCutter.get_default_mem_mb.__name__, return_value=1000
+        ), patch.object(
+            CookieCutter, CookieCutter.get_default_project.__name__, return_value=""
+        ):
+            yield
+
+    @staticmethod
+    def submit_job(**submitter_kwargs):
+        parameters = Submitter(
+            jobscript="real_jobscript.sh", **submitter_kwargs
+        ).submit_job()
+        jobid, outlog = shlex.split(parameters)
+        return int(jobid), outlog
+
+    def test_submittedJobIsCheckedUntilSuccess(self, fake_lsf, tmp_path):
+        jobid, outlog = self.submit_job()
+        statuses = [StatusChecker(jobid, outlog).get_status()]
+
+        fake_lsf.advance(3600)
+        statuses.append(StatusChecker(jobid, outlog).get_status())
+
+        assert statuses == [StatusChecker.RUNNING, StatusChecker.SUCCESS]
+
+    def test_cleanedJob_isResolvedFromHistory(self, fake_lsf, tmp_path):
+        fake_lsf.configure(clean_period=60, exit_rate=1.0)
+        jobid, outlog = self.submit_job()
+        fake_lsf.advance(3600)
+        checker = StatusChecker(jobid, outlog)
+
+        assert checker.get_status() == StatusChecker.FAILED
+        assert list(checker.tier_latencies) == ["bjobs", "history"]
+
+    def test_unknownJob_isKilledAndThenFails(self, fake_lsf, tmp_path):
+        fake_lsf.configure(unknown_rate=1.0)
+        jobid, outlog = self.submit_job()
+        fake_lsf.advance(3600)
+
+        first = StatusChecker(jobid, outlog, kill_unknown=True).get_status()
+        fake_lsf.advance(1)
+        second = StatusChecker(jobid, outlog).get_status()
+
+        assert (first, second) == (StatusChecker.RUNNING, StatusChecker.FAILED)
+        assert fake_lsf.stat(jobid) == "EXIT"
+
+    def test_jobGroupOfRunIsCancelledAtOnce(self, fake_lsf, tmp_path):
+        job_groups = JobGroups(limit=2, directory=tmp_path / "groups")
+        jobids = [self.submit_job(job_groups=job_groups)[0] for _ in range(3)]
+
+        summary = kill_jobs(
+            [str(jobid) for jobid in jobids],
+            job_group=job_groups.group_for("real_jobscript.sh"),
+        )
+
+        assert sorted(summary.killed) == sorted(str(jobid) for jobid in jobids)
+        assert {fake_lsf.stat(jobid) for jobid in jobids} == {"EXIT"}
+
+
+class TestLoad:
+    jobs = 2000
+
+    def test_thousandsOfJobs_queriedAndCancelledInBatches(self, fake_lsf, tmp_path):
+        fake_lsf.configure(pend_seconds=0, run_seconds=60, exit_rate=0.1)
+        jobids = [str(jobid) for jobid in fake_lsf.add_jobs(self.jobs)]
+        fake_lsf.advance(30)
+
+        records = query_records_batch(jobids)
+        summary = kill_jobs(jobids[: self.jobs // 2], chunk_size=250)
+        fake_lsf.advance(60)
+        status_cache = StatusCache(ttl=60, directory=tmp_path)
+        for jobid in jobids:
+            status_cache.register_job(jobid)
+        # every lookup reads the whole table, so a sample will do
+        stats = {status_cache.get_record(jobid).stat for jobid in jobids[::10]}
+        statuses = get_statuses([(jobid, "none.out") for jobid in jobids[-10:]])
+
+        assert {record.stat for record in records.values()} == {"RUN"}
+        assert len(summary.killed) == self.jobs // 2
+        assert stats == {"DONE", "EXIT"}
+        assert set(statuses.values()) <= {StatusChecker.SUCCESS, StatusChecker.FAILED}
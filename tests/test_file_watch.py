@@ -0,0 +1,86 @@
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from tests.src import file_watch
+from tests.src.file_watch import DirectoryWatch, InotifyUnavailable, wait_for_file
+
+linux_only = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is Linux-only"
+)
+
+
+def create_later(path, delay: float) -> threading.Thread:
+    thread = threading.Timer(delay, path.write_text, args=("#!/bin/sh\n",))
+    thread.start()
+    return thread
+
+
+class TestWaitForFile:
+    def test_existingFile_returnsTrue(self, tmp_path):
+        path = tmp_path / "jobscript.sh"
+        path.touch()
+
+        assert wait_for_file(path, timeout=0)
+
+    def test_fileNeverCreated_returnsFalseAfterTimeout(self, tmp_path):
+        start = time.monotonic()
+
+        assert not wait_for_file(tmp_path / "jobscript.sh", timeout=0.2)
+        assert time.monotonic() - start >= 0.2
+
+    def test_fileCreatedWhileWaiting_returnsTrue(self, tmp_path):
+        path = tmp_path / "jobscript.sh"
+        create_later(path, 0.1)
+
+        assert wait_for_file(path, timeout=5)
+
+    @patch.object(file_watch, "DirectoryWatch", side_effect=InotifyUnavailable)
+    def test_withoutInotify_pollsWithBackoff(self, watch_mock, tmp_path):
+        path = tmp_path / "jobscript.sh"
+        create_later(path, 0.1)
+
+        with patch.object(file_watch.time, "sleep", wraps=time.sleep) as sleep_mock:
+            assert wait_for_file(path, timeout=5)
+
+        intervals = [args[0] for args, _ in sleep_mock.call_args_list]
+        assert intervals[:3] == [0.001, 0.002, 0.004]
+        assert max(intervals) <= file_watch.MAX_POLL_INTERVAL
+
+    def test_missingDirectory_pollsUntilTimeout(self, tmp_path):
+        assert not wait_for_file(tmp_path / "nope" / "jobscript.sh", timeout=0.05)
+
+
+@linux_only
+class TestDirectoryWatch:
+    def test_createdAndMovedEntriesAreReported(self, tmp_path):
+        with DirectoryWatch(tmp_path) as watch:
+            (tmp_path / "a.tmp").touch()
+            (tmp_path / "a.tmp").rename(tmp_path / "b.sh")
+
+            names = watch.wait(timeout=1)
+
+        assert names == ["a.tmp", "b.sh"]
+
+    def test_nothingCreated_returnsEmptyAfterTimeout(self, tmp_path):
+        with DirectoryWatch(tmp_path) as watch:
+            assert watch.wait(timeout=0.01) == []
+
+    def test_fileCreatedWhileWaiting_wakesWithoutPolling(self, tmp_path):
+        path = tmp_path / "jobscript.sh"
+        create_later(path, 0.2)
+        # with polling capped at the first interval, only inotify can be this fast
+        with patch.object(file_watch, "MAX_POLL_INTERVAL", 10.0), patch.object(
+            file_watch, "MIN_POLL_INTERVAL", 10.0
+        ):
+            start = time.monotonic()
+            assert wait_for_file(path, timeout=5)
+
+        assert time.monotonic() - start < 1.0
+
+    def test_missingDirectory_raisesUnavailable(self, tmp_path):
+        with pytest.raises(InotifyUnavailable):
+            DirectoryWatch(tmp_path / "nope")
@@ -0,0 +1,247 @@
+import multiprocessing
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from tests.src import job_registry
+from tests.src.job_registry import (
+    JobRegistry,
+    JobRuntime,
+    RUNNING,
+    SUCCESS,
+    FAILED,
+    CANCELLED,
+)
+
+
+def register(registry: JobRegistry, jobid: int = 123):
+    registry.record_submission(
+        jobid,
+        rule="align",
+        wildcards={"sample": "a"},
+        resources={"mem_mb": 1000},
+        outlog="logs/align/sample=a/jobid1_x.out",
+        errlog="logs/align/sample=a/jobid1_x.err",
+        submit_time=100.0,
+    )
+
+
+def submit_and_finish(path, first_jobid: int, num_jobs: int):
+    registry = JobRegistry(path)
+    for jobid in range(first_jobid, first_jobid + num_jobs):
+        register(registry, jobid)
+        registry.update_state(jobid, RUNNING, "RUN")
+        registry.update_state(jobid, SUCCESS, "DONE")
+
+
+class TestJobRegistry:
+    def test_unknownJob_returnsNone(self, tmp_path):
+        registry = JobRegistry(tmp_path / "jobs.sqlite")
+
+        assert registry.get(123) is None
+
+    def test_recordSubmission_storesJob(self, tmp_path):
+        registry = JobRegistry(tmp_path / "jobs.sqlite")
+
+        register(registry)
+        job = registry.get(123)
+
+        assert job.rule == "align"
+        assert job.wildcards == {"sample": "a"}
+        assert job.resources == {"mem_mb": 1000}
+        assert job.outlog == "logs/align/sample=a/jobid1_x.out"
+        assert job.submit_time == 100.0
+        assert job.state == RUNNING
+        assert job.started_at is None
+        assert job.finished_at is None
+
+    def test_updateState_recordsStartAndFinishOnce(self, tmp_path):
+        registry = JobRegistry(tmp_path / "jobs.sqlite")
+        register(registry)
+
+        registry.update_state(123, RUNNING, "PEND")
+        assert registry.get(123).started_at is None
+
+        registry.update_state(123, RUNNING, "RUN")
+        started_at = registry.get(123).started_at
+        registry.update_state(123, RUNNING, "RUN")
+        registry.update_state(123, FAILED, "EXIT")
+        job = registry.get(123)
+
+        assert job.started_at == started_at
+        assert job.state == FAILED
+        assert job.lsf_stat == "EXIT"
+        assert job.finished_at >= started_at
+
+    def test_updateStateUnchanged_takesNoWriteLock(self, tmp_path):
+        registry = JobRegistry(tmp_path / "jobs.sqlite")
+        register(registry)
+        registry.update_state(123, RUNNING, "RUN")
+
+        with patch.object(registry, "_write") as write_mock:
+            registry.update_state(123, RUNNING, "RUN")
+            registry.update_state(123, RUNNING)
+            registry.update_state(999, RUNNING, "RUN")
+
+        write_mock.assert_not_called()
+
+    def test_updateStateWithoutLsfStat_keepsLastLsfStat(self, tmp_path):
+        registry = JobRegistry(tmp_path / "jobs.sqlite")
+        register(registry)
+
+        registry.update_state(123, RUNNING, "RUN")
+        registry.update_state(123, SUCCESS)
+
+        assert registry.get(123).lsf_stat == "RUN"
+
+    def test_activeJobids_excludesFinishedJobs(self, tmp_path):
+        registry = JobRegistry(tmp_path / "jobs.sqlite")
+        for jobid in (1, 2, 3):
+            register(registry, jobid)
+
+        registry.update_state(2, SUCCESS, "DONE")
+        registry.mark_cancelled(["3"])
+
+        assert registry.active_jobids() == ["1"]
+        assert registry.get(3).state == CANCELLED
+
+    def test_withoutFinished_keepsUnknownAndActiveJobs(self, tmp_path):
+        registry = JobRegistry(tmp_path / "jobs.sqlite")
+        for jobid in (1, 2):
+            register(registry, jobid)
+        registry.update_state(2, FAILED, "EXIT")
+
+        assert registry.without_finished(["1", "2", "99"]) == ["1", "99"]
+
+    def test_withoutFinished_manyJobids_areQueriedInChunks(self, tmp_path):
+        path = tmp_path / "jobs.sqlite"
+        submit_and_finish(path, first_jobid=1, num_jobs=10)
+        registry = JobRegistry(path)
+        jobids = [str(jobid) for jobid in range(1, 21)]
+
+        # SQLite limits the parameters of one statement, to 999 in older versions
+        with patch.object(job_registry, "QUERY_CHUNK_SIZE", 4), patch.object(
+            registry, "_read", wraps=registry._read
+        ) as read_mock:
+            unfinished = registry.without_finished(jobids)
+
+        assert unfinished == jobids[10:]
+        assert read_mock.call_count == 5
+
+    def test_resubmittedJobid_replacesOldJob(self, tmp_path):
+        registry = JobRegistry(tmp_path / "jobs.sqlite")
+        register(registry)
+        registry.update_state(123, SUCCESS, "DONE")
+
+        register(registry)
+
+        assert registry.get(123).state == RUNNING
+        assert registry.get(123).finished_at is None
+
+    def test_resubmittedJobid_dropsUsageAndPredictionsOfOldJob(self, tmp_path):
+        registry = JobRegistry(tmp_path / "jobs.sqlite")
+        register(registry)
+        registry.record_predictions(123, mem_mb=2000, run_limit=30)
+        registry.update_state(123, SUCCESS, "DONE")
+        registry.record_usage(123, True, max_mem_mb=512.0, run_time=60.0)
+
+        register(registry)
+        registry.update_state(123, SUCCESS, "DONE")
+
+        assert registry.usage_history("align", "max_mem_mb") == []
+        assert registry.runtime_history() == []
+        assert registry.finished_without_usage() == [
+            ("123", "logs/align/sample=a/jobid1_x.out", True)
+        ]
+
+    def test_unwritableDatabase_doesNotRaise(self, tmp_path, capsys):
+        registry = JobRegistry(tmp_path / "missing_dir" / "jobs.sqlite")
+
+        register(registry)
+
+        assert registry.get(123) is None
+        assert "[job registry]" in capsys.readouterr().err
+
+    def test_concurrentWriters_loseNoUpdates(self, tmp_path):
+        path = tmp_path / "jobs.sqlite"
+        num_processes, jobs_per_process = 100, 5
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(
+                target=submit_and_finish, args=(path, i * jobs_per_process, 5)
+            )
+            for i in range(num_processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        registry = JobRegistry(path)
+        states = registry.connection.execute(
+            "SELECT state, count(*) FROM jobs GROUP BY state"
+        ).fetchall()
+        assert all(process.exitcode == 0 for process in processes)
+        assert states == [(SUCCESS, num_processes * jobs_per_process)]
+
+    def test_sharedBetweenThreads_loseNoUpdates(self, tmp_path):
+        registry = JobRegistry(tmp_path / "jobs.sqlite")
+        threads = [
+            threading.Thread(target=register, args=(registry, jobid))
+            for jobid in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(map(int, registry.active_jobids())) == list(range(20))
+
+    def test_recordUsage_copiesRuleOfJob(self, tmp_path):
+        registry = JobRegistry(tmp_path / "jobs.sqlite")
+        register(registry)
+        registry.update_state(123, SUCCESS)
+
+        registry.record_usage(123, True, max_mem_mb=512.0, run_time=60.0)
+        registry.record_usage(456, True, max_mem_mb=1.0)
+
+        assert registry.usage_history("align", "max_mem_mb") == [512.0]
+        assert registry.usage_history("align", "cpu_time") == []
+        assert registry.finished_without_usage() == []
+
+    def test_usageHistory_unknownField_raisesError(self, tmp_path):
+        registry = JobRegistry(tmp_path / "jobs.sqlite")
+
+        with pytest.raises(ValueError):
+            registry.usage_history("align", "state; DROP TABLE jobs")
+
+    def test_usageHistory_filteredByWildcards(self, tmp_path):
+        registry = JobRegistry(tmp_path / "jobs.sqlite")
+        register(registry, 1)
+        registry.record_usage(1, True, run_time=10.0)
+
+        assert registry.usage_history("align", "run_time", wildcards={"sample": "a"})
+        assert not registry.usage_history(
+            "align", "run_time", wildcards={"sample": "b"}
+        )
+
+    def test_runtimeHistory_includesPredictedRunLimit(self, tmp_path):
+        registry = JobRegistry(tmp_path / "jobs.sqlite")
+        register(registry)
+        registry.record_predictions(123, mem_mb=2000, run_limit=30)
+        registry.update_state(123, SUCCESS)
+        registry.record_usage(123, True, max_mem_mb=512.0, run_time=60.0)
+
+        (actual,) = registry.runtime_history()
+
+        assert actual == JobRuntime(
+            "align",
+            {"mem_mb": 1000},
+            30,
+            100.0,
+            None,
+            registry.get(123).finished_at,
+            60.0,
+            True,
+        )
@@ -0,0 +1,286 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from tests.src.OSLayer import OSLayer
+from tests.src.lsf_batch_query import (
+    JobRecord,
+    InvalidBjobsOutput,
+    bjobs_group_query_cmd,
+    bjobs_query_cmd,
+    parse_bjobs_output,
+    parse_history_output,
+    query_bjobs_batch,
+    query_history_batch,
+    query_records_batch,
+)
+
+
+def bjobs_output(*records) -> str:
+    return json.dumps(
+        {"COMMAND": "bjobs", "JOBS": len(records), "RECORDS": list(records)}
+    )
+
+
+def record(jobid: str, stat: str, **fields) -> dict:
+    fields.update({"JOBID": jobid, "STAT": stat})
+    return fields
+
+
+class TestParseBjobsOutput:
+    def test_noRecords_returnsEmpty(self):
+        assert parse_bjobs_output(bjobs_output()) == dict()
+
+    def test_severalJobs_returnsRecordPerJob(self):
+        output = bjobs_output(record("123", "RUN"), record("456", "DONE"))
+
+        actual = parse_bjobs_output(output)
+
+        assert actual["123"].stat == "RUN"
+        assert actual["456"].stat == "DONE"
+
+    def test_allFieldsAreParsed(self):
+        output = bjobs_output(
+            record(
+                "123",
+                "PEND",
+                EXIT_CODE="",
+                PEND_REASON="New job is waiting for scheduling;",
+                MAX_MEM="512 Kbytes",
+                RUN_TIME="0 second(s)",
+            )
+        )
+
+        actual = parse_bjobs_output(output)["123"]
+        expected = JobRecord(
+            jobid="123",
+            stat="PEND",
+            exit_code=None,
+            pend_reason="New job is waiting for scheduling;",
+            max_mem_mb=0.512,
+            run_time=0,
+        )
+
+        assert actual == expected
+
+    def test_arrayElements_jobidIncludesIndex(self):
+        output = bjobs_output(
+            record("123", "RUN", JOBINDEX="1"),
+            record("123", "DONE", JOBINDEX="2"),
+            record("456", "RUN", JOBINDEX="0"),
+        )
+
+        actual = parse_bjobs_output(output)
+
+        assert actual["123[1]"].stat == "RUN"
+        assert actual["123[2]"].stat == "DONE"
+        assert actual["456"].stat == "RUN"
+
+    def test_missingOrDashFields_areNone(self):
+        output = bjobs_output(record("123", "RUN", EXIT_CODE="-", MAX_MEM="-"))
+
+        actual = parse_bjobs_output(output)["123"]
+
+        assert actual.exit_code is None
+        assert actual.max_mem_mb is None
+        assert actual.run_time is None
+
+    def test_jobNotFoundRecordsAreIgnored(self):
+        output = bjobs_output(
+            record("123", "RUN"), {"JOBID": "456", "ERROR": "Job <456> is not found"}
+        )
+
+        actual = parse_bjobs_output(output)
+
+        assert list(actual) == ["123"]
+
+    def test_notJson_raisesError(self):
+        with pytest.raises(InvalidBjobsOutput):
+            parse_bjobs_output("123 RUN")
+
+
+class TestQueryBjobsBatch:
+    @patch.object(OSLayer, OSLayer.run_process.__name__)
+    def test_noJobids_doesNotCallBjobs(self, run_process_mock):
+        assert query_bjobs_batch([]) == dict()
+        run_process_mock.assert_not_called()
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(bjobs_output(record("1", "RUN"), record("2", "EXIT")), ""),
+    )
+    def test_severalJobids_singleBjobsCall(self, run_process_mock):
+        actual = query_bjobs_batch(["1", "2"])
+
+        assert actual["1"].stat == "RUN"
+        assert actual["2"].stat == "EXIT"
+        run_process_mock.assert_called_once_with(
+            bjobs_query_cmd(["1", "2"]), check=False
+        )
+
+    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("", "error"))
+    def test_emptyOutput_returnsEmpty(self, run_process_mock):
+        assert query_bjobs_batch(["1"]) == dict()
+
+    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("junk", ""))
+    def test_invalidOutput_returnsEmpty(self, run_process_mock):
+        assert query_bjobs_batch(["1"]) == dict()
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(
+            bjobs_output(record("1", "RUN"), record("2", "DONE"), record("3", "PEND")),
+            "",
+        ),
+    )
+    def test_withGroup_queriesGroupAndKeepsRequestedJobs(self, run_process_mock):
+        actual = query_bjobs_batch(["1", "2"], group="/snakemake/run")
+
+        assert sorted(actual) == ["1", "2"]
+        run_process_mock.assert_called_once_with(
+            bjobs_group_query_cmd("/snakemake/run"), check=False
+        )
+
+    def test_bjobsGroupQueryCmd(self):
+        actual = bjobs_group_query_cmd("/snakemake/run")
+
+        assert actual[:2] == ["bjobs", "-json"]
+        assert actual[-3:] == ["-a", "-g", "/snakemake/run"]
+
+    def test_bjobsQueryCmd(self):
+        actual = bjobs_query_cmd(["1", "2"])
+        expected = [
+            "bjobs",
+            "-json",
+            "-o",
+            "jobid jobindex stat exit_code pend_reason max_mem run_time",
+            "1",
+            "2",
+        ]
+
+        assert actual == expected
+
+    def test_bjobsQueryCmd_passesArrayElementsAsArguments(self):
+        actual = bjobs_query_cmd(["1", "2[3]"])
+
+        assert actual[-2:] == ["1", "2[3]"]
+
+
+BHIST_OUTPUT = """
+Job <1>, User <user>, Project <default>, Command <.snakemake/tmp.abc/snakejob.ru
+                     le.1.sh>
+Mon Oct  1 10:00:00: Submitted from host <login>, to Queue <normal>;
+Mon Oct  1 10:05:00: Done successfully. The CPU time used is 290.0 seconds;
+------------------------------------------------------------------------------
+
+Job <2>, User <user>, Project <default>, Command <snakejob.rule.2.sh>
+Mon Oct  1 10:00:00: Submitted from host <login>, to Queue <normal>;
+Mon Oct  1 10:05:00: Exited with exit code 1. The CPU time used is 2.0 second
+                     s;
+------------------------------------------------------------------------------
+
+Job <3>, User <user>, Project <default>, Command <snakejob.rule.3.sh>
+Mon Oct  1 10:00:00: Submitted from host <login>, to Queue <normal>;
+Mon Oct  1 10:00:05: Dispatched 1 Task(s) on Host(s) <node>;
+"""
+
+
+class TestParseHistoryOutput:
+    def test_emptyOutput_returnsEmpty(self):
+        assert parse_history_output("") == dict()
+
+    def test_doneExitedAndUnfinishedJobs(self):
+        actual = parse_history_output(BHIST_OUTPUT)
+        expected = {"1": "DONE", "2": "EXIT", "3": "RUN"}
+
+        assert actual == expected
+
+    def test_requeuedJob_lastEventWins(self):
+        output = (
+            "Job <1>, User <user>\n"
+            "Mon Oct  1 10:00:00: Exited with exit code 1.\n"
+            "Mon Oct  1 10:10:00: Done successfully.\n"
+        )
+
+        assert parse_history_output(output) == {"1": "DONE"}
+
+    def test_bacctCompletedLines(self):
+        output = (
+            "Job <1>, User <user>, Status <EXIT>\n"
+            "Mon Oct  1 10:05:00: Completed <exit>; TERM_OWNER: job killed by owner.\n"
+        )
+
+        assert parse_history_output(output) == {"1": "EXIT"}
+
+    def test_unrecognisedEnd_isLeftOut(self):
+        output = (
+            "Job <1>, User <user>, Command <snakejob.Running.sh>\n"
+            "Mon Oct  1 10:00:00: Submitted from host <login>;\n"
+            "Mon Oct  1 10:05:00: Completed <unknown>; TERM_RUNLIMIT: job killed.\n"
+        )
+
+        assert parse_history_output(output) == dict()
+
+    def test_pendingJob_isRunning(self):
+        output = (
+            "Job <1>, User <user>, Command <snakejob.Done.sh>\n"
+            "Mon Oct  1 10:00:00: Submitted from host <login>, to Queue <normal>;\n"
+        )
+
+        assert parse_history_output(output) == {"1": "RUN"}
+
+    def test_bacctWithoutRecognisedEnd_isLeftOut(self):
+        output = (
+            "Job <1>, User <user>\n"
+            "Mon Oct  1 10:00:00: Submitted from host <login>;\n"
+            "Mon Oct  1 10:00:05: Dispatched 1 Task(s) on Host(s) <node>;\n"
+        )
+
+        assert parse_history_output(output, "bacct") == dict()
+
+
+class TestQueryHistoryBatch:
+    @patch.object(OSLayer, OSLayer.run_process.__name__)
+    def test_bacctIsOnlyAskedForJobsUnknownToBhist(self, run_process_mock):
+        run_process_mock.side_effect = [
+            ("Job <1>, User <user>\nMon: Done successfully.", ""),
+            ("Job <2>, User <user>\nMon: Completed <exit>.", ""),
+        ]
+
+        actual = query_history_batch(["1", "2"])
+
+        assert actual == {"1": "DONE", "2": "EXIT"}
+        run_process_mock.assert_any_call(["bhist", "-l", "1", "2"], check=False)
+        run_process_mock.assert_any_call(["bacct", "-l", "2"], check=False)
+
+    @patch.object(OSLayer, OSLayer.run_process.__name__)
+    def test_noJobids_nothingIsQueried(self, run_process_mock):
+        assert query_history_batch([]) == dict()
+        run_process_mock.assert_not_called()
+
+    @patch.object(OSLayer, OSLayer.run_process.__name__)
+    def test_unrecognisedEndInBhist_isAskedOfBacct(self, run_process_mock):
+        run_process_mock.side_effect = [
+            ("Job <1>, User <user>\nMon: Submitted.\nMon: Completed <zombi>.", ""),
+            ("Job <1>, User <user>\nMon: Completed <exit>.", ""),
+        ]
+
+        assert query_history_batch(["1"]) == {"1": "EXIT"}
+
+
+class TestQueryRecordsBatch:
+    @patch.object(OSLayer, OSLayer.run_process.__name__)
+    def test_jobsMissingFromBjobsAreLookedUpInHistory(self, run_process_mock):
+        run_process_mock.side_effect = [
+            (bjobs_output(record("1", "RUN")), "Job <2> is not found"),
+            ("Job <2>, User <user>\nMon: Done successfully.", ""),
+        ]
+
+        actual = query_records_batch(["1", "2"])
+
+        assert actual["1"].stat == "RUN"
+        assert actual["2"] == JobRecord("2", "DONE", None, "", None, None)
+        run_process_mock.assert_called_with(["bhist", "-l", "2"], check=False)
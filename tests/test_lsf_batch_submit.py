@@ -0,0 +1,323 @@
+import json
+import multiprocessing
+import os
+import subprocess
+import time
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from tests.src.OSLayer import OSLayer
+from tests.src.lsf_batch_submit import (
+    DISPATCHER,
+    FLUSH_TIMEOUT,
+    PACK,
+    BatchSubmissionError,
+    SubmissionSpool,
+    element_id,
+    flush,
+    parse_element_id,
+)
+
+
+def entry(tmp_path, name: str) -> dict:
+    return {
+        "jobscript": str(tmp_path / "{}.sh".format(name)),
+        "outlog": str(tmp_path / "{}.out".format(name)),
+        "errlog": str(tmp_path / "{}.err".format(name)),
+        "submit_cmd": ["bsub", "-J", name, "{}.sh".format(name)],
+        "params": ["-M", "1000", "-q", "normal"],
+        "array_name": "rule",
+        "array_logdir": str(tmp_path / "logs"),
+        "rule": "rule",
+        "wildcards": {"i": name},
+        "resources": {},
+    }
+
+
+def add_entries(directory, name: str, count: int, indices):
+    spool = SubmissionSpool(directory)
+    for i in range(count):
+        _, index, _ = spool.add("key", {"name": name, "i": i}, max_size=10000)
+        indices.put(index)
+
+
+class TestElementId:
+    def test_roundTrip(self):
+        assert parse_element_id(element_id("batch-ab12", 3)) == ("batch-ab12", 3)
+
+    def test_lsfJobid_isNotAnElement(self):
+        assert parse_element_id("123") is None
+        assert parse_element_id("123[4]") is None
+
+
+class TestSubmissionSpool:
+    def test_firstEntryOpensBatchAndLaterEntriesJoinIt(self, tmp_path):
+        spool = SubmissionSpool(tmp_path)
+
+        first = spool.add("key", {"i": 1}, max_size=10)
+        second = spool.add("key", {"i": 2}, max_size=10)
+
+        assert first[1:] == (1, True)
+        assert second == (first[0], 2, False)
+
+    def test_differentKeys_differentBatches(self, tmp_path):
+        spool = SubmissionSpool(tmp_path)
+
+        first, _, _ = spool.add("key", {"i": 1}, max_size=10)
+        other, _, opened = spool.add("other_key", {"i": 2}, max_size=10)
+
+        assert other != first
+        assert opened
+
+    def test_fullBatchIsClosed(self, tmp_path):
+        spool = SubmissionSpool(tmp_path)
+
+        first, _, _ = spool.add("key", {"i": 1}, max_size=2)
+        spool.add("key", {"i": 2}, max_size=2)
+        third, index, opened = spool.add("key", {"i": 3}, max_size=2)
+
+        assert not spool.is_open("key", first)
+        assert third != first
+        assert (index, opened) == (1, True)
+
+    def test_closedBatchTakesNoNewEntries(self, tmp_path):
+        spool = SubmissionSpool(tmp_path)
+        batch_id, _, _ = spool.add("key", {"i": 1}, max_size=10)
+
+        entries = spool.close("key", batch_id)
+        new_batch_id, _, _ = spool.add("key", {"i": 2}, max_size=10)
+
+        assert entries == [{"i": 1}]
+        assert new_batch_id != batch_id
+
+    def test_resolve_beforeSubmission_returnsNone(self, tmp_path):
+        spool = SubmissionSpool(tmp_path)
+        batch_id, index, _ = spool.add("key", {"i": 1}, max_size=10)
+
+        assert spool.resolve(batch_id, index) is None
+
+    def test_resolve_afterSubmission_returnsJobid(self, tmp_path):
+        spool = SubmissionSpool(tmp_path)
+        batch_id, _, _ = spool.add("key", {"i": 1}, max_size=10)
+
+        spool.publish(batch_id, {"jobids": ["5[1]", "5[2]"]})
+
+        assert spool.resolve(batch_id, 2) == "5[2]"
+
+    def test_resolve_failedSubmission_raisesError(self, tmp_path):
+        spool = SubmissionSpool(tmp_path)
+        batch_id, _, _ = spool.add("key", {"i": 1}, max_size=10)
+
+        spool.publish(batch_id, {"error": "bsub failed"})
+
+        with pytest.raises(BatchSubmissionError):
+            spool.resolve(batch_id, 1)
+
+    def test_resolve_lostBatch_raisesError(self, tmp_path):
+        spool = SubmissionSpool(tmp_path)
+        batch_id, _, _ = spool.add("key", {"i": 1}, max_size=10)
+        mtime = time.time() - FLUSH_TIMEOUT - 1
+        os.utime(str(spool.spool_path(batch_id)), (mtime, mtime))
+
+        with pytest.raises(BatchSubmissionError):
+            spool.resolve(batch_id, 1)
+
+    def test_concurrentAdds_getUniqueIndices(self, tmp_path):
+        context = multiprocessing.get_context("fork")
+        indices = context.Queue()
+        processes = [
+            context.Process(target=add_entries, args=(tmp_path, str(i), 10, indices))
+            for i in range(20)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        actual = sorted(indices.get() for _ in range(200))
+
+        assert actual == list(range(1, 201))
+
+
+class TestFlush:
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=("Job <42> is submitted to queue <normal>.", ""),
+    )
+    def test_singleJob_isSubmittedAsNormalJob(self, run_process_mock, tmp_path):
+        spool = SubmissionSpool(tmp_path)
+        batch_id, _, _ = spool.add("key", entry(tmp_path, "a"), max_size=10)
+
+        jobids = flush(spool, "key", batch_id, window=0)
+
+        assert jobids == ["42"]
+        run_process_mock.assert_called_once_with(["bsub", "-J", "a", "a.sh"])
+        assert spool.resolve(batch_id, 1) == "42"
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=("Job <42> is submitted to queue <normal>.", ""),
+    )
+    def test_severalJobs_areSubmittedAsArray(self, run_process_mock, tmp_path):
+        spool = SubmissionSpool(tmp_path)
+        batch_id, _, _ = spool.add("key", entry(tmp_path, "a"), max_size=10)
+        spool.add("key", entry(tmp_path, "b"), max_size=10)
+
+        jobids = flush(spool, "key", batch_id, window=0)
+
+        array_logdir = tmp_path / "logs" / batch_id
+        expected_cmd = [
+            "bsub",
+            "-M",
+            "1000",
+            "-q",
+            "normal",
+            "-o",
+            str(array_logdir / "%I.out"),
+            "-e",
+            str(array_logdir / "%I.err"),
+            "-J",
+            "rule[1-2]",
+            str(DISPATCHER),
+            str(spool.jobscripts_path(batch_id).absolute()),
+        ]
+        assert jobids == ["42[1]", "42[2]"]
+        run_process_mock.assert_called_once_with(expected_cmd)
+        assert spool.jobscripts_path(batch_id).read_text().splitlines() == [
+            str(tmp_path / "a.sh"),
+            str(tmp_path / "b.sh"),
+        ]
+        assert os.readlink(str(tmp_path / "b.out")) == str(array_logdir / "2.out")
+        assert spool.resolve(batch_id, 2) == "42[2]"
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        side_effect=subprocess.CalledProcessError(255, "bsub"),
+    )
+    def test_bsubFails_errorIsPublished(self, run_process_mock, tmp_path):
+        spool = SubmissionSpool(tmp_path)
+        batch_id, _, _ = spool.add("key", entry(tmp_path, "a"), max_size=10)
+
+        assert flush(spool, "key", batch_id, window=0) is None
+        with pytest.raises(BatchSubmissionError):
+            spool.resolve(batch_id, 1)
+
+
+class TestFlushPack:
+    def add(self, spool, tmp_path, *names):
+        batch_id = None
+        for name in names:
+            batch_id, _, _ = spool.add("pack", entry(tmp_path, name), max_size=10)
+        return batch_id
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(
+            "Job <41> is submitted to queue <normal>.\n"
+            "Job <42> is submitted to queue <normal>.",
+            "",
+        ),
+    )
+    def test_allJobsSubmitted_jobidsInOrder(self, run_process_mock, tmp_path):
+        spool = SubmissionSpool(tmp_path)
+        batch_id = self.add(spool, tmp_path, "a", "b")
+
+        jobids = flush(spool, "pack", batch_id, window=0, mode=PACK)
+
+        assert jobids == ["41", "42"]
+        run_process_mock.assert_called_once_with(
+            ["bsub", "-pack", str(spool.pack_path(batch_id))], check=False
+        )
+        assert spool.pack_path(batch_id).read_text() == "-J a a.sh\n-J b b.sh\n"
+        assert spool.resolve(batch_id, 2) == "42"
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(
+            "Job <41> is submitted to queue <normal>.\n"
+            "Job <42> is submitted to queue <normal>.",
+            "",
+        ),
+    )
+    def test_packFile_quotesArguments(self, run_process_mock, tmp_path):
+        spool = SubmissionSpool(tmp_path)
+        first = entry(tmp_path, "a")
+        first["submit_cmd"] = ["bsub", "-R", "span[hosts=1] select[mem>1]", "a.sh"]
+        batch_id, _, _ = spool.add("pack", first, max_size=10)
+        spool.add("pack", entry(tmp_path, "b"), max_size=10)
+
+        flush(spool, "pack", batch_id, window=0, mode=PACK)
+
+        first_line = spool.pack_path(batch_id).read_text().splitlines()[0]
+        assert first_line == "-R 'span[hosts=1] select[mem>1]' a.sh"
+
+    def test_rejectedJob_othersAreMatchedByOutlog(self, tmp_path):
+        spool = SubmissionSpool(tmp_path)
+        batch_id = self.add(spool, tmp_path, "a", "b", "c")
+        bjobs_output = json.dumps(
+            {
+                "RECORDS": [
+                    {"JOBID": "41", "OUTPUT_FILE": str(tmp_path / "a.out")},
+                    {"JOBID": "42", "OUTPUT_FILE": str(tmp_path / "c.out")},
+                ]
+            }
+        )
+        run_process_mock = MagicMock(
+            side_effect=[
+                (
+                    "Job <41> is submitted to queue <normal>.\n"
+                    "Job <42> is submitted to queue <normal>.",
+                    "Bad resource requirement syntax. Job not submitted.",
+                ),
+                (bjobs_output, ""),
+            ]
+        )
+
+        with patch.object(OSLayer, OSLayer.run_process.__name__, run_process_mock):
+            jobids = flush(spool, "pack", batch_id, window=0, mode=PACK)
+
+        assert jobids == ["41", None, "42"]
+        assert spool.resolve(batch_id, 3) == "42"
+        with pytest.raises(BatchSubmissionError, match="Bad resource"):
+            spool.resolve(batch_id, 2)
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=("", "LSB_MAX_PACK_JOBS is not set"),
+    )
+    def test_noJobSubmitted_errorIsPublished(self, run_process_mock, tmp_path):
+        spool = SubmissionSpool(tmp_path)
+        batch_id = self.add(spool, tmp_path, "a", "b")
+
+        assert flush(spool, "pack", batch_id, window=0, mode=PACK) is None
+        with pytest.raises(BatchSubmissionError, match="LSB_MAX_PACK_JOBS"):
+            spool.resolve(batch_id, 1)
+
+
+def test_dispatcher_runsJobscriptOfArrayIndex(tmp_path):
+    jobscripts = []
+    for name in ("first", "second"):
+        jobscript = tmp_path / "{}.sh".format(name)
+        jobscript.write_text("#!/bin/sh\necho {}\n".format(name))
+        jobscript.chmod(0o755)
+        jobscripts.append(str(jobscript))
+    jobscripts_path = tmp_path / "batch.jobscripts"
+    jobscripts_path.write_text("\n".join(jobscripts) + "\n")
+
+    completed = subprocess.run(
+        [str(DISPATCHER), str(jobscripts_path)],
+        env=dict(os.environ, LSB_JOBINDEX="2"),
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+
+    assert completed.stdout.decode().strip() == "second"
+    assert Path(DISPATCHER).stat().st_mode & 0o111
@@ -1,8 +1,25 @@
+import json
+import tempfile
 import unittest
-from unittest.mock import patch
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+import pytest
 
 from tests.src.OSLayer import OSLayer
-from tests.src.lsf_cancel import kill_jobs, parse_input, KILL
+from tests.src.lsf_batch_submit import SubmissionSpool
+from tests.src.lsf_cancel import (
+    kill_jobs,
+    parse_bkill_output,
+    parse_input,
+    resolve_batch_jobids,
+    CancelSummary,
+    FAILED,
+    FINISHED,
+    KILL,
+    KILLED,
+)
+from tests.src.retry_policy import RetryPolicy
 
 
 class TestParseInput(unittest.TestCase):
@@ -47,6 +64,14 @@ class TestParseInput(unittest.TestCase):
         expected = [fake_args[1], fake_args[3]]
         assert actual == expected
 
+    def test_parse_input_array_element_and_batch_element(self):
+        fake_args = [self.script, "1234[5]", "log/file.out", "batch-ab12[3]", "l.out"]
+        with patch("sys.argv", fake_args):
+            actual = parse_input()
+
+        expected = ["1234[5]", "batch-ab12[3]"]
+        assert actual == expected
+
     def test_parse_input_multiple_args_but_no_jobs(self):
         fake_args = [self.script, "log/file.out", "log/123"]
         with patch("sys.argv", fake_args):
@@ -55,6 +80,96 @@ class TestParseInput(unittest.TestCase):
         assert not actual
 
 
+class TestParseBkillOutput:
+    def test_outcomesAreClassified(self):
+        output = (
+            "Job <1> is being terminated\n"
+            "Job <2[3]> is being terminated\n"
+            "Job <4>: Job has already finished\n"
+            "Job <5>: No matching job found\n"
+            "Job <6>: User permission denied\n"
+            "Job <7>: Operation is in progress\n"
+        )
+
+        assert parse_bkill_output(output) == {
+            "1": KILLED,
+            "2[3]": KILLED,
+            "4": FINISHED,
+            "5": FINISHED,
+            "6": FAILED,
+            "7": KILLED,
+        }
+
+
+def group_bjobs_output(*jobs) -> str:
+    """What bjobs -json -g prints for the (jobid, stat) jobs of a group."""
+    return json.dumps(
+        {
+            "COMMAND": "bjobs",
+            "JOBS": len(jobs),
+            "RECORDS": [{"JOBID": jobid, "STAT": stat} for jobid, stat in jobs],
+        }
+    )
+
+
+def bkill(cmd, check=False):
+    """Kills every job except 13, which it does not report on."""
+    return (
+        "\n".join(
+            "Job <{}> is being terminated".format(jobid)
+            for jobid in cmd[1:]
+            if jobid != "13"
+        ),
+        "",
+    )
+
+
+class TestKillJobsInChunks:
+    @patch.object(OSLayer, OSLayer.run_process.__name__, side_effect=bkill)
+    def test_jobsAreKilledInChunks(self, run_process_mock):
+        jobids = [str(jobid) for jobid in range(1, 6)]
+
+        summary = kill_jobs(jobids, chunk_size=2, workers=2)
+
+        chunks = sorted(
+            call_args[0][0][1:] for call_args in run_process_mock.call_args_list
+        )
+        assert chunks == [["1", "2"], ["3", "4"], ["5"]]
+        assert summary == CancelSummary(jobids, [], [])
+
+    @patch.object(OSLayer, OSLayer.run_process.__name__, side_effect=bkill)
+    def test_unreportedJobs_areRetriedThenReportedAsFailed(self, run_process_mock):
+        retry_policy = RetryPolicy(base_wait=0, max_attempts=3)
+
+        summary = kill_jobs(["12", "13"], retry_policy=retry_policy)
+
+        commands = [call_args[0][0] for call_args in run_process_mock.call_args_list]
+        assert commands == [[KILL, "12", "13"], [KILL, "13"], [KILL, "13"]]
+        assert summary == CancelSummary(["12"], [], ["13"])
+
+    @patch.object(OSLayer, OSLayer.eprint.__name__)
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=("Job <1> is being terminated", "Job <2>: No matching job found"),
+    )
+    def test_summaryIsPrinted(self, run_process_mock, eprint_mock):
+        job_registry = MagicMock()
+        job_registry.without_finished.side_effect = lambda jobids: jobids
+
+        kill_jobs(["1", "2", "3"], job_registry=job_registry)
+
+        eprint_mock.assert_called_once_with(
+            "[cluster-cancel] killed 1, already finished 1, failed 1: 3"
+        )
+        job_registry.mark_cancelled.assert_called_once_with(["1"])
+
+    @pytest.mark.parametrize("chunk_size", [0, -1])
+    def test_chunkSizeBelowOne_raisesError(self, chunk_size):
+        with pytest.raises(ValueError):
+            kill_jobs(["1"], chunk_size=chunk_size)
+
+
 class TestKillJobs(unittest.TestCase):
     @patch.object(
         OSLayer,
@@ -69,7 +184,7 @@ class TestKillJobs(unittest.TestCase):
         run_process_mock,
     ):
         jobids = ["123"]
-        expected_kill_cmd = "{} {}".format(KILL, " ".join(jobids))
+        expected_kill_cmd = [KILL] + jobids
 
         kill_jobs(jobids)
 
@@ -88,7 +203,7 @@ class TestKillJobs(unittest.TestCase):
         run_process_mock,
     ):
         jobids = ["123", "456"]
-        expected_kill_cmd = "{} {}".format(KILL, " ".join(jobids))
+        expected_kill_cmd = [KILL] + jobids
 
         kill_jobs(jobids)
 
@@ -129,8 +244,171 @@ class TestKillJobs(unittest.TestCase):
     def test_kill_jobs_empty_job_and_non_empty_job(self, run_process_mock):
         jobids = ["", "123"]
 
-        expected_kill_cmd = "{} {}".format(KILL, " ".join(jobids))
+        expected_kill_cmd = [KILL, "123"]
 
         kill_jobs(jobids)
 
         run_process_mock.assert_called_once_with(expected_kill_cmd, check=False)
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=("Job <456> is being terminated", ""),
+    )
+    def test_kill_jobs_skips_jobs_registry_knows_are_finished(self, run_process_mock):
+        job_registry = MagicMock()
+        job_registry.without_finished.return_value = ["456"]
+
+        kill_jobs(["123", "456"], job_registry=job_registry)
+
+        run_process_mock.assert_called_once_with([KILL, "456"], check=False)
+        job_registry.mark_cancelled.assert_called_once()
+        assert list(job_registry.mark_cancelled.call_args[0][0]) == ["456"]
+
+    @patch.object(OSLayer, OSLayer.eprint.__name__)
+    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("", ""))
+    def test_kill_jobs_all_jobs_finished(self, run_process_mock, eprint_mock):
+        job_registry = MagicMock()
+        job_registry.without_finished.return_value = []
+
+        summary = kill_jobs(["123"], job_registry=job_registry)
+
+        run_process_mock.assert_not_called()
+        job_registry.mark_cancelled.assert_not_called()
+        assert summary == CancelSummary([], ["123"], [])
+        eprint_mock.assert_called_once_with(
+            "[cluster-cancel] killed 0, already finished 1, failed 0"
+        )
+
+    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("", ""))
+    def test_kill_jobs_passes_array_elements(self, run_process_mock):
+        kill_jobs(["123[4]"])
+
+        run_process_mock.assert_called_once_with(["bkill", "123[4]"], check=False)
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        side_effect=[
+            (group_bjobs_output(("1", "RUN"), ("2", "PEND"), ("3", "DONE")), ""),
+            ("Job <1> is being terminated\nJob <2> is being terminated", ""),
+            ("", "Job <3>: Job has already finished"),
+        ],
+    )
+    def test_kill_jobs_kills_group_then_jobs_it_did_not_report(self, run_process_mock):
+        summary = kill_jobs(["1", "2", "3"], job_group="/snakemake/run")
+
+        assert run_process_mock.call_args_list[1][0][0] == [
+            KILL,
+            "-g",
+            "/snakemake/run",
+            "0",
+        ]
+        run_process_mock.assert_called_with([KILL, "3"], check=False)
+        assert summary == CancelSummary(["1", "2"], ["3"], [])
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        side_effect=[
+            (group_bjobs_output(("1", "RUN")), ""),
+            ("Job <1> is being terminated", ""),
+        ],
+    )
+    def test_kill_jobs_group_reports_every_job_single_bkill(self, run_process_mock):
+        kill_jobs(["1"], job_group="/snakemake/run")
+
+        assert run_process_mock.call_count == 2
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        side_effect=[
+            (group_bjobs_output(("1", "RUN"), ("7", "RUN"), ("8", "DONE")), ""),
+            ("Job <1> is being terminated", ""),
+        ],
+    )
+    def test_kill_jobs_group_with_other_unfinished_jobs_kills_by_jobid(
+        self, run_process_mock
+    ):
+        summary = kill_jobs(["1"], job_group="/snakemake/run")
+
+        run_process_mock.assert_called_with([KILL, "1"], check=False)
+        assert summary == CancelSummary(["1"], [], [])
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        side_effect=[
+            (group_bjobs_output(("7", "RUN")), ""),
+            ("Job <1> is being terminated\nJob <2> is being terminated", ""),
+        ],
+    )
+    def test_kill_jobs_not_in_group_are_killed_by_jobid(self, run_process_mock):
+        summary = kill_jobs(["1", "2"], job_group="/snakemake/other-run")
+
+        commands = [call_args[0][0] for call_args in run_process_mock.call_args_list]
+        assert ["-g" in command for command in commands] == [True, False]
+        assert commands[1] == [KILL, "1", "2"]
+        assert summary == CancelSummary(["1", "2"], [], [])
+
+
+class TestKillJobsWithFakeLsf:
+    def test_currentGroupOfAnotherRun_isNotKilled(self, fake_lsf):
+        fake_lsf.configure(pend_seconds=0, run_seconds=3600)
+        ours = fake_lsf.add_jobs(2, job_group="/snakemake/ours")
+        theirs = fake_lsf.add_jobs(2, job_group="/snakemake/theirs")
+
+        summary = kill_jobs(
+            [str(jobid) for jobid in ours], job_group="/snakemake/theirs"
+        )
+
+        assert len(summary.killed) == 2
+        assert [fake_lsf.stat(jobid) for jobid in ours] == ["EXIT", "EXIT"]
+        assert [fake_lsf.stat(jobid) for jobid in theirs] == ["RUN", "RUN"]
+
+
+class TestResolveBatchJobids(unittest.TestCase):
+    def test_batch_elements_are_replaced_by_lsf_jobids(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spool = SubmissionSpool(Path(tmpdir))
+            batch_id, index, _ = spool.add("key", {}, max_size=10)
+            spool.publish(batch_id, {"jobids": ["42[1]"]})
+
+            with patch(
+                "tests.src.lsf_batch_submit.SubmissionSpool", return_value=spool
+            ):
+                actual = resolve_batch_jobids(["7", "{}[{}]".format(batch_id, index)])
+
+        assert actual == ["7", "42[1]"]
+
+    def test_failed_batch_elements_are_dropped(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spool = SubmissionSpool(Path(tmpdir))
+            batch_id, index, _ = spool.add("key", {}, max_size=10)
+            spool.publish(batch_id, {"error": "bsub failed"})
+
+            with patch(
+                "tests.src.lsf_batch_submit.SubmissionSpool", return_value=spool
+            ):
+                actual = resolve_batch_jobids(["{}[{}]".format(batch_id, index)])
+
+        assert actual == []
+
+    def test_batches_share_one_deadline(self):
+        spool = MagicMock()
+        spool.wait_for_jobid.side_effect = ["42[1]", "43[1]", "44[1]"]
+        batch_elements = ["batch-{}[1]".format(batch) for batch in "abc"]
+
+        with patch(
+            "tests.src.lsf_batch_submit.SubmissionSpool", return_value=spool
+        ), patch(
+            "tests.src.lsf_cancel.time.time", side_effect=[100.0, 100.0, 140.0, 170.0]
+        ):
+            actual = resolve_batch_jobids(batch_elements, timeout=60)
+
+        assert actual == ["42[1]", "43[1]", "44[1]"]
+        timeouts = [
+            call_args[1]["timeout"] for call_args in spool.wait_for_jobid.call_args_list
+        ]
+        assert timeouts == [60.0, 20.0, 0.0]
@@ -1,5 +1,11 @@
+import os
+import pickle
 from io import StringIO
-from tests.src.lsf_config import Config
+from unittest.mock import patch
+
+import pytest
+
+from tests.src.lsf_config import CACHE_VERSION, Config
 
 
 class TestBool:
@@ -147,7 +153,7 @@ class TestParamsForRule:
         rulename = "a"
 
         actual = config.params_for_rule(rulename)
-        expected = ""
+        expected = []
 
         assert actual == expected
 
@@ -157,7 +163,7 @@ class TestParamsForRule:
         rulename = "a"
 
         actual = config.params_for_rule(rulename)
-        expected = "-q foo"
+        expected = ["-q", "foo"]
 
         assert actual == expected
 
@@ -167,7 +173,7 @@ class TestParamsForRule:
         rulename = "rule"
 
         actual = config.params_for_rule(rulename)
-        expected = "-q foo -P project"
+        expected = ["-q", "foo", "-P", "project"]
 
         assert actual == expected
 
@@ -177,7 +183,7 @@ class TestParamsForRule:
         rulename = "rule"
 
         actual = config.params_for_rule(rulename)
-        expected = "-P project -q bar"
+        expected = ["-P", "project", "-q", "bar"]
 
         assert actual == expected
 
@@ -189,12 +195,12 @@ class TestParamsForRule:
         rulename = "rule"
 
         actual = config.params_for_rule(rulename)
-        expected = "-q bar -P project"
+        expected = ["-q", "bar", "-P", "project"]
 
         assert actual == expected
 
 
-class TestShellEscaping:
+class TestQuoting:
     def test_resource_requirements_one_level_of_quoting(self):
         config_string = """
 __default__:
@@ -204,7 +210,7 @@ __default__:
         config = Config.from_stream(stream)
         actual = config.params_for_rule("rule")
 
-        expected = "-R 'select[mem>2000] rusage[mem=2000]'"
+        expected = ["-R", "select[mem>2000] rusage[mem=2000]"]
 
         assert actual == expected
 
@@ -217,11 +223,42 @@ __default__:
         config = Config.from_stream(stream)
         actual = config.params_for_rule("rule")
 
-        expected = "-R 'select[hname!='\"'\"'escaped-hostname'\"'\"']'"
+        expected = ["-R", "select[hname!='escaped-hostname']"]
 
         assert actual == expected
 
 
+class TestQueuesForRule:
+    config_string = (
+        "__default__: '-P project'\n"
+        "__queues__:\n"
+        "  __default__: [normal, other]\n"
+        "  bigmem: bigmem\n"
+    )
+
+    def test_rule_with_queues_returns_its_queues(self):
+        config = Config.from_stream(StringIO(self.config_string))
+
+        assert config.queues_for_rule("bigmem") == ["bigmem"]
+        assert config.queues_for_rule("a") == ["normal", "other"]
+
+    def test_queues_are_not_params(self):
+        config = Config.from_stream(StringIO(self.config_string))
+
+        assert "__queues__" not in config
+        assert config.params_for_rule("__queues__") == ["-P", "project"]
+
+    def test_no_queues_returns_empty(self):
+        assert Config().queues_for_rule("a") == []
+
+    def test_queues_survive_compilation(self):
+        config = Config.from_stream(StringIO(self.config_string))
+
+        compiled = Config.from_compiled(config.compile())
+
+        assert compiled.queues_for_rule("a") == ["normal", "other"]
+
+
 def test_args_to_dict():
     args = '-W 0:01 -W 0:02 -J "test name"'
 
@@ -229,3 +266,80 @@ def test_args_to_dict():
     expected = {"-W": "0:02", "-J": "test name"}
 
     assert actual == expected
+
+
+class TestFromPath:
+    config_string = "__default__: '-P project'\nrule:\n  - '-q bar'\n"
+
+    def write_config(self, tmp_path, content=config_string):
+        path = tmp_path / "lsf.yaml"
+        path.write_text(content)
+        return path
+
+    def test_without_cache_parses_file(self, tmp_path):
+        config = Config.from_path(self.write_config(tmp_path))
+
+        assert config.params_for_rule("rule") == ["-P", "project", "-q", "bar"]
+
+    def test_cache_is_used_for_unchanged_file(self, tmp_path):
+        path = self.write_config(tmp_path)
+        cache_path = tmp_path / "lsf_config.pickle"
+        Config.from_path(path, cache_path=cache_path)
+
+        with patch.object(Config, "from_stream", side_effect=AssertionError):
+            config = Config.from_path(path, cache_path=cache_path)
+
+        assert cache_path.exists()
+        assert config.params_for_rule("rule") == ["-P", "project", "-q", "bar"]
+        assert config.params_for_rule("other_rule") == ["-P", "project"]
+
+    def test_changed_file_invalidates_cache(self, tmp_path):
+        path = self.write_config(tmp_path)
+        cache_path = tmp_path / "lsf_config.pickle"
+        Config.from_path(path, cache_path=cache_path)
+
+        self.write_config(tmp_path, "__default__: '-P other_project'\n")
+        os.utime(str(path), ns=(0, 0))
+        config = Config.from_path(path, cache_path=cache_path)
+
+        assert config.params_for_rule("rule") == ["-P", "other_project"]
+
+    def test_touched_file_with_same_content_reuses_cache(self, tmp_path):
+        path = self.write_config(tmp_path)
+        cache_path = tmp_path / "lsf_config.pickle"
+        Config.from_path(path, cache_path=cache_path)
+
+        os.utime(str(path), ns=(0, 0))
+        with patch.object(Config, "from_stream", side_effect=AssertionError):
+            config = Config.from_path(path, cache_path=cache_path)
+
+        assert config.params_for_rule("rule") == ["-P", "project", "-q", "bar"]
+
+    def test_corrupt_cache_is_rebuilt(self, tmp_path):
+        path = self.write_config(tmp_path)
+        cache_path = tmp_path / "lsf_config.pickle"
+        cache_path.write_bytes(b"not a pickle")
+
+        config = Config.from_path(path, cache_path=cache_path)
+
+        assert config.params_for_rule("rule") == ["-P", "project", "-q", "bar"]
+        assert Config.from_path(path, cache_path=cache_path).get("rule") == "-q bar"
+
+    @pytest.mark.parametrize(
+        "cache",
+        [
+            {"version": CACHE_VERSION},
+            {"version": CACHE_VERSION, "source": None, "sha256": "", "compiled": {}},
+            {"version": CACHE_VERSION, "source": (), "sha256": "", "compiled": []},
+            ["not", "a", "dict"],
+        ],
+    )
+    def test_malformed_cache_is_rebuilt(self, tmp_path, cache):
+        path = self.write_config(tmp_path)
+        cache_path = tmp_path / "lsf_config.pickle"
+        cache_path.write_bytes(pickle.dumps(cache))
+
+        config = Config.from_path(path, cache_path=cache_path)
+
+        assert config.params_for_rule("rule") == ["-P", "project", "-q", "bar"]
+        assert Config.from_path(path, cache_path=cache_path).get("rule") == "-q bar"
@@ -0,0 +1,59 @@
+from unittest.mock import patch
+
+from tests.src.OSLayer import OSLayer
+from tests.src.lsf_job_groups import (
+    JobGroups,
+    current_job_group,
+    group_add_cmd,
+    run_group,
+)
+
+
+class TestRunGroup:
+    def test_jobscriptsOfOneRun_shareGroup(self, tmp_path):
+        first = run_group(str(tmp_path / "snakejob.a.1.sh"))
+        second = run_group(str(tmp_path / "snakejob.b.2.sh"))
+
+        assert first == second
+        assert first.startswith("/snakemake/")
+
+    def test_jobscriptsOfDifferentRuns_differentGroups(self, tmp_path):
+        first = run_group(str(tmp_path / "tmp.abc" / "snakejob.a.1.sh"))
+        second = run_group(str(tmp_path / "tmp.def" / "snakejob.a.1.sh"))
+
+        assert first != second
+
+
+@patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("", ""))
+class TestJobGroups:
+    def test_limit_groupIsAddedOnce(self, run_process_mock, tmp_path):
+        job_groups = JobGroups(limit=10, directory=tmp_path / "groups")
+        jobscript = str(tmp_path / "snakejob.a.1.sh")
+
+        group = job_groups.group_for(jobscript)
+        job_groups.group_for(jobscript)
+
+        run_process_mock.assert_called_once_with(group_add_cmd(group, 10), check=False)
+
+    def test_noLimit_groupIsNotAdded(self, run_process_mock, tmp_path):
+        JobGroups(directory=tmp_path / "groups").group_for(str(tmp_path / "job.sh"))
+
+        run_process_mock.assert_not_called()
+
+    def test_groupIsRecordedAsCurrent(self, run_process_mock, tmp_path):
+        directory = tmp_path / "groups"
+        group = JobGroups(directory=directory).group_for(str(tmp_path / "job.sh"))
+
+        assert current_job_group(directory) == group
+
+    def test_otherProcess_findsCreatedGroup(self, run_process_mock, tmp_path):
+        directory = tmp_path / "groups"
+        jobscript = str(tmp_path / "job.sh")
+        JobGroups(limit=10, directory=directory).group_for(jobscript)
+
+        JobGroups(limit=10, directory=directory).group_for(jobscript)
+
+        run_process_mock.assert_called_once()
+
+    def test_noSubmission_noCurrentGroup(self, run_process_mock, tmp_path):
+        assert current_job_group(tmp_path / "groups") is None
@@ -0,0 +1,157 @@
+import json
+import math
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from tests.src.OSLayer import OSLayer
+from tests.src.lsf_queue_router import (
+    QueueLoad,
+    QueueLoadCache,
+    QueueRouter,
+    bqueues_query_cmd,
+    expected_wait,
+    parse_bqueues_output,
+)
+
+
+def bqueues_output(*records) -> str:
+    return json.dumps(
+        {"COMMAND": "bqueues", "QUEUES": len(records), "RECORDS": list(records)}
+    )
+
+
+def queue(name: str, pend: int, run: int, max_slots="-", status="Open:Active"):
+    return {
+        "QUEUE_NAME": name,
+        "STATUS": status,
+        "MAX": str(max_slots),
+        "NJOBS": str(pend + run),
+        "PEND": str(pend),
+        "RUN": str(run),
+        "RSV": "0",
+    }
+
+
+class TestParseBqueuesOutput:
+    def test_allFieldsAreParsed(self):
+        output = bqueues_output(queue("short", 5, 20, max_slots=100))
+
+        actual = parse_bqueues_output(output)
+
+        assert actual == {"short": QueueLoad("short", True, 100, 5, 20, 0)}
+
+    def test_closedQueueAndUnlimitedSlots(self):
+        output = bqueues_output(queue("long", 0, 0, status="Closed:Inact"))
+
+        actual = parse_bqueues_output(output)["long"]
+
+        assert not actual.active
+        assert actual.max_slots is None
+
+    def test_unknownQueuesAreIgnored(self):
+        output = bqueues_output({"QUEUE_NAME": "nope", "ERROR": "No such queue"})
+
+        assert parse_bqueues_output(output) == dict()
+
+    def test_queryCmd(self):
+        assert bqueues_query_cmd(["a", "b"]) == [
+            "bqueues",
+            "-json",
+            "-o",
+            "queue_name status max njobs pend run rsv",
+            "a",
+            "b",
+        ]
+
+
+class TestExpectedWait:
+    def test_freeSlotsForAllPendingJobs_isZero(self):
+        assert expected_wait(QueueLoad("q", True, 100, 10, 50, 0)) == 0.0
+
+    def test_emptyUnlimitedQueue_scoresLikePartlyUsedLimitedQueue(self):
+        unlimited = expected_wait(QueueLoad("q", True, None, 0, 0, 0))
+        limited = expected_wait(QueueLoad("q", True, 100, 0, 60, 0))
+
+        assert unlimited == limited == 0.0
+
+    def test_backlogDrainsWithRunningSlots(self):
+        busy = expected_wait(QueueLoad("q", True, None, 100, 10, 0))
+        less_busy = expected_wait(QueueLoad("q", True, None, 100, 1000, 0))
+
+        assert less_busy < busy
+
+    def test_inactiveQueue_isInfinite(self):
+        assert math.isinf(expected_wait(QueueLoad("q", False, None, 0, 0, 0)))
+
+
+class TestQueueLoadCache:
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(bqueues_output(queue("a", 1, 2), queue("b", 3, 4)), ""),
+    )
+    def test_freshTable_isSharedBetweenCaches(self, run_process_mock, tmp_path):
+        QueueLoadCache(ttl=60, directory=tmp_path).get_loads(["a", "b"])
+        actual = QueueLoadCache(ttl=60, directory=tmp_path).get_loads(["b"])
+
+        assert actual == {"b": QueueLoad("b", True, None, 3, 4, 0)}
+        run_process_mock.assert_called_once_with(
+            bqueues_query_cmd(["a", "b"]), check=False
+        )
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(bqueues_output(queue("a", 1, 2), queue("b", 3, 4)), ""),
+    )
+    def test_newQueue_refreshesAllCachedQueues(self, run_process_mock, tmp_path):
+        cache = QueueLoadCache(ttl=60, directory=tmp_path)
+
+        cache.get_loads(["a"])
+        cache.get_loads(["b"])
+
+        assert run_process_mock.call_args_list[-1][0][0] == bqueues_query_cmd(
+            ["a", "b"]
+        )
+
+    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("", "error"))
+    def test_bqueuesFails_returnsNoLoads(self, run_process_mock, tmp_path):
+        cache = QueueLoadCache(ttl=60, directory=tmp_path)
+
+        assert cache.get_loads(["a"]) == dict()
+
+
+class TestQueueRouter:
+    @pytest.fixture
+    def load_cache(self, tmp_path):
+        load_cache = MagicMock()
+        load_cache.path = tmp_path / "queue_loads.json"
+        return load_cache
+
+    def test_queueWithShortestExpectedWait_isChosen(self, load_cache):
+        load_cache.get_loads.return_value = {
+            "normal": QueueLoad("normal", True, 100, 500, 100, 0),
+            "other": QueueLoad("other", True, 100, 0, 10, 0),
+        }
+        router = QueueRouter(load_cache)
+
+        assert router.choose("align", ["normal", "other"]) == "other"
+
+        (entry,) = map(json.loads, router.audit_log.read_text().splitlines())
+        assert entry["rule"] == "align"
+        assert entry["queue"] == "other"
+        assert [c["queue"] for c in entry["candidates"]] == ["normal", "other"]
+        assert entry["candidates"][1]["expected_wait"] == 0.0
+
+    def test_noLoads_firstCandidateIsChosen(self, load_cache):
+        load_cache.get_loads.return_value = dict()
+        router = QueueRouter(load_cache)
+
+        assert router.choose("align", ["normal", "other"]) == "normal"
+
+    def test_singleCandidate_isNotQueried(self, load_cache):
+        router = QueueRouter(load_cache)
+
+        assert router.choose("align", ["normal"]) == "normal"
+        load_cache.get_loads.assert_not_called()
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+import stat
+import time
+from unittest.mock import patch
+
+import pytest
+
+from tests.src import OSLayer as os_layer
+from tests.src.lsf_status import StatusChecker, StatusParsingMixin
+from tests.src.lsf_status_async import (
+    AsyncOSLayer,
+    AsyncStatusChecker,
+    async_attempts,
+    gather_statuses,
+    get_statuses,
+)
+from tests.src.retry_policy import RetryPolicy
+
+# prints a bjobs -json record for the single job it is asked about, with the stat
+# written to stat.<jobid> next to it (DONE if there is none)
+FAKE_BJOBS = """#!/bin/sh
+sleep "${FAKE_BJOBS_DELAY:-0}"
+jobid="$4"
+stat=$(cat "$(dirname "$0")/stat.$jobid" 2>/dev/null || echo DONE)
+printf '{"COMMAND": "bjobs", "JOBS": 1, "RECORDS": [{"JOBID": "%s", "STAT": "%s"}]}' \\
+    "$jobid" "$stat"
+"""
+
+
+def bjobs_output(jobid: str, stat: str) -> str:
+    return json.dumps(
+        {"COMMAND": "bjobs", "JOBS": 1, "RECORDS": [{"JOBID": jobid, "STAT": stat}]}
+    )
+
+
+@pytest.fixture
+def fake_bjobs(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    bjobs = bin_dir / "bjobs"
+    bjobs.write_text(FAKE_BJOBS)
+    bjobs.chmod(bjobs.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", "{}{}{}".format(bin_dir, os.pathsep, os.environ["PATH"]))
+    os_layer.resolve_executable.cache_clear()
+    yield bin_dir
+    os_layer.resolve_executable.cache_clear()
+
+
+class TestAsyncOSLayer:
+    def test_runProcess_returnsOutput(self):
+        output_stream, error_stream = asyncio.run(
+            AsyncOSLayer.run_process(["echo", "hello"])
+        )
+
+        assert (output_stream, error_stream) == ("hello", "")
+
+    def test_unknownCommand_failsLikeOSLayer(self):
+        with pytest.raises(os_layer.subprocess.CalledProcessError) as error:
+            asyncio.run(AsyncOSLayer.run_process(["no-such-lsf-command"]))
+
+        assert error.value.returncode == 127
+
+    def test_failingCommandWithoutCheck_returnsOutput(self):
+        output_stream, _ = asyncio.run(
+            AsyncOSLayer.run_process(["sh", "-c", "echo out; exit 3"], check=False)
+        )
+
+        assert output_stream == "out"
+
+
+class TestAsyncStatusChecker:
+    def test_statusesAreResolvedWithFakeBjobs(self, fake_bjobs):
+        (fake_bjobs / "stat.1").write_text("RUN")
+        (fake_bjobs / "stat.2").write_text("EXIT")
+
+        actual = get_statuses([(1, "1.out"), (2, "2.out"), (3, "3.out")])
+
+        assert actual == {
+            "1": StatusChecker.RUNNING,
+            "2": StatusChecker.FAILED,
+            "3": StatusChecker.SUCCESS,
+        }
+
+    def test_lsfCommandsAreBoundedBySemaphore(self):
+        running = 0
+        most_running = 0
+
+        async def fake_run_process(cmd, check=True):
+            nonlocal running, most_running
+            running += 1
+            most_running = max(most_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return bjobs_output(cmd[-1], "RUN"), ""
+
+        jobs = [(jobid, "{}.out".format(jobid)) for jobid in range(20)]
+        with patch.object(AsyncOSLayer, "run_process", side_effect=fake_run_process):
+            actual = asyncio.run(gather_statuses(jobs, concurrency=4))
+
+        assert set(actual.values()) == {StatusChecker.RUNNING}
+        assert most_running == 4
+
+    @patch.object(AsyncOSLayer, AsyncOSLayer.run_process.__name__)
+    def test_bjobsAndHistoryFail_statusIsReadFromLog(self, run_process_mock, tmp_path):
+        run_process_mock.return_value = ("", "")
+        outlog = tmp_path / "job.out"
+        outlog.write_text(
+            "Successfully completed.\n\nResource usage summary:\n\n"
+            "    Run time :                                   2 sec.\n"
+        )
+
+        actual = asyncio.run(AsyncStatusChecker(123, str(outlog)).get_status())
+
+        assert actual == StatusChecker.SUCCESS
+        # bjobs, bhist and bacct
+        assert run_process_mock.call_count == 3
+
+    @patch.object(AsyncOSLayer, AsyncOSLayer.run_process.__name__)
+    def test_unknownJob_isKilledWhenAsked(self, run_process_mock):
+        run_process_mock.side_effect = [(bjobs_output("123", "UNKWN"), ""), ("", "")]
+        checker = AsyncStatusChecker(123, "job.out", kill_unknown=True)
+
+        actual = asyncio.run(checker.get_status())
+
+        assert actual == StatusChecker.RUNNING
+        run_process_mock.assert_called_with(["bkill", "-r", "123"])
+
+    def test_sharesParsingButNotSynchronousMethodsWithStatusChecker(self):
+        assert issubclass(AsyncStatusChecker, StatusParsingMixin)
+        assert not issubclass(AsyncStatusChecker, StatusChecker)
+        assert not hasattr(AsyncStatusChecker, "_query_record")
+
+    def test_throughputAgainstSynchronousChecker(self, fake_bjobs, monkeypatch):
+        monkeypatch.setenv("FAKE_BJOBS_DELAY", "0.05")
+        jobs = [(jobid, "{}.out".format(jobid)) for jobid in range(20)]
+
+        start = time.perf_counter()
+        sync_statuses = {
+            str(jobid): StatusChecker(jobid, outlog).get_status()
+            for jobid, outlog in jobs
+        }
+        sync_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        async_statuses = get_statuses(jobs, concurrency=len(jobs))
+        async_elapsed = time.perf_counter() - start
+
+        assert async_statuses == sync_statuses
+        # the synchronous checks wait for one bjobs after the other
+        assert async_elapsed * 3 < sync_elapsed
+
+
+class TestAsyncAttempts:
+    def test_yieldsMaxAttemptsAndSleepsWithAsyncio(self):
+        policy = RetryPolicy(RetryPolicy.EXPONENTIAL, base_wait=1, max_attempts=3)
+        waits = []
+
+        async def fake_sleep(seconds):
+            waits.append(seconds)
+
+        async def collect():
+            return [attempt async for attempt in async_attempts(policy)]
+
+        with patch("asyncio.sleep", side_effect=fake_sleep), patch(
+            "time.sleep"
+        ) as sleep_mock:
+            attempts = asyncio.run(collect())
+
+        assert attempts == [0, 1, 2]
+        assert waits == [1, 2]
+        sleep_mock.assert_not_called()
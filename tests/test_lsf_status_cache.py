@@ -0,0 +1,190 @@
+import threading
+import time
+from unittest.mock import patch
+
+from tests.src.OSLayer import OSLayer
+from tests.src.lsf_batch_query import bjobs_query_cmd
+from tests.src.lsf_status_cache import StatusCache
+from tests.test_lsf_batch_query import bjobs_output, record
+
+
+class TestGetRecord:
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(bjobs_output(record("1", "RUN")), ""),
+    )
+    def test_emptyCache_queriesBjobs(self, run_process_mock, tmp_path):
+        cache = StatusCache(ttl=60, directory=tmp_path)
+
+        actual = cache.get_record(1).stat
+
+        assert actual == "RUN"
+        run_process_mock.assert_called_once_with(bjobs_query_cmd(["1"]), check=False)
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(bjobs_output(record("1", "RUN")), ""),
+    )
+    def test_freshCache_doesNotQueryBjobsAgain(self, run_process_mock, tmp_path):
+        cache = StatusCache(ttl=60, directory=tmp_path)
+
+        cache.get_record(1)
+        actual = StatusCache(ttl=60, directory=tmp_path).get_record(1).stat
+
+        assert actual == "RUN"
+        assert run_process_mock.call_count == 1
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(bjobs_output(record("1", "RUN")), ""),
+    )
+    def test_staleCache_queriesBjobsAgain(self, run_process_mock, tmp_path):
+        cache = StatusCache(ttl=0.01, directory=tmp_path)
+
+        cache.get_record(1)
+        time.sleep(0.02)
+        cache.get_record(1)
+
+        assert run_process_mock.call_count == 2
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(bjobs_output(record("1", "DONE")), ""),
+    )
+    def test_terminalStat_isNeverQueriedAgain(self, run_process_mock, tmp_path):
+        cache = StatusCache(ttl=0.01, directory=tmp_path)
+
+        cache.get_record(1)
+        time.sleep(0.02)
+        actual = cache.get_record(1).stat
+
+        assert actual == "DONE"
+        assert run_process_mock.call_count == 1
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(
+            bjobs_output(record("1", "RUN"), record("2", "DONE"), record("3", "PEND")),
+            "",
+        ),
+    )
+    def test_registeredJobsAreQueriedTogether(self, run_process_mock, tmp_path):
+        cache = StatusCache(ttl=60, directory=tmp_path)
+        for jobid in (1, 2, 3):
+            cache.register_job(jobid)
+
+        assert cache.get_record(1).stat == "RUN"
+        assert cache.get_record(2).stat == "DONE"
+        assert cache.get_record(3).stat == "PEND"
+        run_process_mock.assert_called_once_with(
+            bjobs_query_cmd(["1", "2", "3"]), check=False
+        )
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(bjobs_output(record("1", "RUN"), record("2", "DONE")), ""),
+    )
+    def test_finishedAndUnknownJobs_areNotQueriedAgain(
+        self, run_process_mock, tmp_path
+    ):
+        cache = StatusCache(ttl=0.01, directory=tmp_path)
+        for jobid in (1, 2, 3):
+            cache.register_job(jobid, "run/snakejob.{}.sh".format(jobid))
+
+        cache.get_record(1)
+        time.sleep(0.02)
+        cache.get_record(1)
+
+        bjobs_calls = [
+            call_args[0][0]
+            for call_args in run_process_mock.call_args_list
+            if call_args[0][0][0] == "bjobs"
+        ]
+        # 3 is known to neither bjobs nor the history
+        assert bjobs_calls == [bjobs_query_cmd(["1", "2", "3"]), bjobs_query_cmd(["1"])]
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(bjobs_output(record("3", "RUN")), ""),
+    )
+    def test_jobsOfEarlierRuns_areNotQueried(self, run_process_mock, tmp_path):
+        cache = StatusCache(ttl=60, directory=tmp_path)
+        cache.register_job(1, "old_run/snakejob.1.sh")
+        cache.register_job(2, "old_run/snakejob.2.sh")
+        cache.register_job(3, "new_run/snakejob.3.sh")
+
+        cache.get_record(3)
+
+        run_process_mock.assert_called_once_with(bjobs_query_cmd(["3"]), check=False)
+
+    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("", ""))
+    def test_jobUnknownToBjobs_returnsNoneWithoutRequerying(
+        self, run_process_mock, tmp_path
+    ):
+        cache = StatusCache(ttl=60, directory=tmp_path)
+
+        assert cache.get_record(1) is None
+        assert cache.get_record(1) is None
+        commands = [call_args[0][0] for call_args in run_process_mock.call_args_list]
+        assert commands == [
+            bjobs_query_cmd(["1"]),
+            ["bhist", "-l", "1"],
+            ["bacct", "-l", "1"],
+        ]
+
+    @patch.object(OSLayer, OSLayer.run_process.__name__)
+    def test_jobUnknownToBjobs_isResolvedFromHistory(self, run_process_mock, tmp_path):
+        run_process_mock.side_effect = [
+            ("", "Job <1> is not found"),
+            ("Job <1>, User <user>\nMon Oct  1: Completed <exit>.", ""),
+        ]
+        cache = StatusCache(ttl=60, directory=tmp_path)
+
+        assert cache.get_record(1).stat == "EXIT"
+
+    @patch.object(OSLayer, OSLayer.run_process.__name__, side_effect=OSError)
+    def test_bjobsFails_returnsNone(self, run_process_mock, tmp_path):
+        cache = StatusCache(ttl=60, directory=tmp_path)
+
+        assert cache.get_record(1) is None
+
+    def test_concurrentCallers_shareOneRefresh(self, tmp_path):
+        def slow_bjobs(cmd, check=True):
+            time.sleep(0.2)
+            return (
+                bjobs_output(
+                    record("1", "RUN"), record("2", "RUN"), record("3", "RUN")
+                ),
+                "",
+            )
+
+        cache = StatusCache(ttl=60, directory=tmp_path)
+        for jobid in (1, 2, 3):
+            cache.register_job(jobid)
+        results = dict()
+
+        def get_stat(jobid):
+            results[jobid] = (
+                StatusCache(ttl=60, directory=tmp_path).get_record(jobid).stat
+            )
+
+        with patch.object(
+            OSLayer, OSLayer.run_process.__name__, side_effect=slow_bjobs
+        ) as run_process_mock:
+            threads = [
+                threading.Thread(target=get_stat, args=(jobid,)) for jobid in (1, 2, 3)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert results == {1: "RUN", 2: "RUN", 3: "RUN"}
+        assert run_process_mock.call_count == 1
@@ -0,0 +1,98 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from tests.src.OSLayer import OSLayer
+from tests.src.lsf_batch_query import bjobs_query_cmd
+from tests.src.lsf_status_daemon import StatusDaemon, StatusDaemonClient
+from tests.test_lsf_batch_query import bjobs_output, record
+
+
+@pytest.fixture
+def running_daemon(tmp_path):
+    daemon = StatusDaemon(tmp_path / "status.sock", poll_interval=0.05)
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    deadline = time.time() + 5
+    while not daemon.socket_path.exists() and time.time() < deadline:
+        time.sleep(0.01)
+    yield daemon
+    daemon.shutdown()
+    thread.join(timeout=5)
+
+
+class TestRefresh:
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(bjobs_output(record("1", "RUN"), record("2", "DONE")), ""),
+    )
+    def test_trackedJobsAreQueriedInOneCall(self, run_process_mock, tmp_path):
+        daemon = StatusDaemon(tmp_path / "status.sock")
+        daemon._tracked.update({"1", "2"})
+
+        daemon.refresh()
+
+        run_process_mock.assert_called_once_with(
+            bjobs_query_cmd(["1", "2"]), check=False
+        )
+        assert daemon.get_record("1").stat == "RUN"
+        assert daemon.get_record("2").stat == "DONE"
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(bjobs_output(record("1", "RUN"), record("2", "DONE")), ""),
+    )
+    def test_finishedJobsAreNotQueriedAgain(self, run_process_mock, tmp_path):
+        daemon = StatusDaemon(tmp_path / "status.sock")
+        daemon._tracked.update({"1", "2"})
+
+        daemon.refresh()
+        daemon.refresh()
+
+        assert run_process_mock.call_args_list[-1][0][0][-1] == "1"
+        assert daemon.get_record("2").stat == "DONE"
+
+    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("", ""))
+    def test_jobNotKnownToBjobs_hasNoStat(self, run_process_mock, tmp_path):
+        daemon = StatusDaemon(tmp_path / "status.sock")
+        daemon._tracked.add("1")
+
+        daemon.refresh()
+
+        assert daemon.get_record("1") is None
+        assert "1" not in daemon._tracked
+
+
+class TestClient:
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(bjobs_output(record("7", "PEND")), ""),
+    )
+    def test_clientGetsStatFromDaemon(self, run_process_mock, running_daemon):
+        client = StatusDaemonClient(running_daemon.socket_path, autostart=False)
+
+        assert client.get_record(7).stat == "PEND"
+
+    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("", ""))
+    def test_jobUnknownToDaemon_returnsNone(self, run_process_mock, running_daemon):
+        client = StatusDaemonClient(running_daemon.socket_path, autostart=False)
+
+        assert client.get_record(7) is None
+
+    def test_daemonNotRunning_returnsNone(self, tmp_path):
+        client = StatusDaemonClient(tmp_path / "status.sock", autostart=False)
+
+        assert client.get_record(7) is None
+
+    @patch.object(StatusDaemonClient, StatusDaemonClient.start_daemon.__name__)
+    def test_daemonNotRunning_startsDaemon(self, start_daemon_mock, tmp_path):
+        client = StatusDaemonClient(tmp_path / "status.sock")
+
+        client.get_record(7)
+
+        start_daemon_mock.assert_called_once_with()
@@ -1,18 +1,25 @@
 import json
+import shlex
+import subprocess
+import sys
 import tempfile
 import unittest
 from io import StringIO
 from pathlib import Path
 from subprocess import CalledProcessError
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock, call
 
 from tests.src.CookieCutter import CookieCutter
 from tests.src.OSLayer import OSLayer
 from tests.src.lsf_config import Config
+from tests.src.directory_cache import DirectoryCache
+from tests.src.lsf_batch_submit import SubmissionSpool
 from tests.src.lsf_submit import (
     Submitter,
     BsubInvocationError,
     JobidNotFoundError,
+    queue_router_from_settings,
+    read_job_properties,
 )
 from tests.src.memory_units import Unit, Memory
 
@@ -45,7 +52,7 @@ class TestSubmitter(unittest.TestCase):
         )
         self.assertEqual(lsf_submit.jobscript, "real_jobscript.sh")
         self.assertEqual(
-            lsf_submit.cluster_cmd, "cluster_opt_1 cluster_opt_2 cluster_opt_3"
+            lsf_submit.cluster_cmd, ["cluster_opt_1", "cluster_opt_2", "cluster_opt_3"]
         )
         self.assertEqual(lsf_submit.threads, 1)
         self.assertEqual(lsf_submit.mem_mb, Memory(memory_mb_value, Unit.MEGA))
@@ -59,7 +66,7 @@ class TestSubmitter(unittest.TestCase):
         expected_resource_cmd = (
             "-M {mem} -n 1 -R 'select[mem>{mem}] rusage[mem={mem}] span[hosts=1]'"
         ).format(mem=expected_mem)
-        self.assertEqual(lsf_submit.resources_cmd, expected_resource_cmd)
+        self.assertEqual(lsf_submit.resources_cmd, shlex.split(expected_resource_cmd))
         self.assertEqual(lsf_submit.jobname, "search_fasta_on_index.i=0")
         expected_logdir = Path("logdir") / expected_rule_name / expected_wildcards_str
         self.assertEqual(lsf_submit.logdir, expected_logdir)
@@ -70,15 +77,20 @@ class TestSubmitter(unittest.TestCase):
         expected_jobinfo_cmd = (
             '-o "{outlog}" -e "{errlog}" -J "search_fasta_on_index.i=0"'
         ).format(outlog=expected_outlog, errlog=expected_errlog)
-        self.assertEqual(lsf_submit.jobinfo_cmd, expected_jobinfo_cmd)
-        self.assertEqual(lsf_submit.queue_cmd, "-q q1")
+        self.assertEqual(lsf_submit.jobinfo_cmd, shlex.split(expected_jobinfo_cmd))
+        self.assertEqual(lsf_submit.queue_cmd, ["-q", "q1"])
         self.assertEqual(lsf_submit.proj, "proj")
-        self.assertEqual(lsf_submit.proj_cmd, "-P proj")
+        self.assertEqual(lsf_submit.proj_cmd, ["-P", "proj"])
         self.assertEqual(
             lsf_submit.submit_cmd,
-            "bsub -M {mem} -n 1 -R 'select[mem>{mem}] rusage[mem={mem}] span[hosts=1]' "
-            "{jobinfo} -q q1 -P proj cluster_opt_1 cluster_opt_2 cluster_opt_3 "
-            "real_jobscript.sh".format(mem=expected_mem, jobinfo=expected_jobinfo_cmd),
+            shlex.split(
+                "bsub -M {mem} -n 1 -R 'select[mem>{mem}] rusage[mem={mem}] "
+                "span[hosts=1]' "
+                "{jobinfo} -q q1 -P proj cluster_opt_1 cluster_opt_2 cluster_opt_3 "
+                "real_jobscript.sh".format(
+                    mem=expected_mem, jobinfo=expected_jobinfo_cmd
+                )
+            ),
         )
 
     @patch.object(
@@ -198,9 +210,14 @@ class TestSubmitter(unittest.TestCase):
         remove_file_mock.assert_any_call(expected_errlog)
         expected_mem = "2662"
         run_process_mock.assert_called_once_with(
-            "bsub -M {mem} -n 1 -R 'select[mem>{mem}] rusage[mem={mem}] span[hosts=1]' "
-            "{jobinfo} -q q1 -P proj cluster_opt_1 cluster_opt_2 cluster_opt_3 "
-            "real_jobscript.sh".format(mem=expected_mem, jobinfo=expected_jobinfo_cmd)
+            shlex.split(
+                "bsub -M {mem} -n 1 -R 'select[mem>{mem}] rusage[mem={mem}] "
+                "span[hosts=1]' "
+                "{jobinfo} -q q1 -P proj cluster_opt_1 cluster_opt_2 cluster_opt_3 "
+                "real_jobscript.sh".format(
+                    mem=expected_mem, jobinfo=expected_jobinfo_cmd
+                )
+            )
         )
         print_mock.assert_called_once_with(
             "123456 {outlog}".format(outlog=expected_outlog)
@@ -257,12 +274,407 @@ class TestSubmitter(unittest.TestCase):
         remove_file_mock.assert_any_call(expected_errlog)
         expected_mem = "2662"
         run_process_mock.assert_called_once_with(
-            "bsub -M {mem} -n 1 -R 'select[mem>{mem}] rusage[mem={mem}] span[hosts=1]' "
-            "{jobinfo} -q q1 -P proj cluster_opt_1 cluster_opt_2 cluster_opt_3 "
-            "real_jobscript.sh".format(mem=expected_mem, jobinfo=expected_jobinfo_cmd)
+            shlex.split(
+                "bsub -M {mem} -n 1 -R 'select[mem>{mem}] rusage[mem={mem}] "
+                "span[hosts=1]' "
+                "{jobinfo} -q q1 -P proj cluster_opt_1 cluster_opt_2 cluster_opt_3 "
+                "real_jobscript.sh".format(
+                    mem=expected_mem, jobinfo=expected_jobinfo_cmd
+                )
+            )
         )
         print_mock.assert_not_called()
 
+    @patch.object(
+        CookieCutter, CookieCutter.get_log_dir.__name__, return_value="logdir"
+    )
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_mem_mb.__name__, return_value=1000
+    )
+    @patch.object(OSLayer, OSLayer.get_uuid4_string.__name__, return_value="random")
+    @patch.object(OSLayer, OSLayer.mkdir.__name__)
+    @patch.object(OSLayer, OSLayer.remove_file.__name__)
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=("Job <123456> is submitted to default queue <normal>.", ""),
+    )
+    @patch.object(OSLayer, OSLayer.print.__name__)
+    def test___submit___registers_job_with_status_cache(self, *mocks):
+        status_cache = MagicMock()
+        lsf_submit = Submitter(jobscript="real_jobscript.sh", status_cache=status_cache)
+
+        lsf_submit.submit()
+
+        status_cache.register_job.assert_called_once_with(123456, "real_jobscript.sh")
+
+    @patch.object(
+        CookieCutter, CookieCutter.get_log_dir.__name__, return_value="logdir"
+    )
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_mem_mb.__name__, return_value=1000
+    )
+    @patch.object(OSLayer, OSLayer.get_uuid4_string.__name__, return_value="random")
+    @patch.object(OSLayer, OSLayer.mkdir.__name__)
+    @patch.object(OSLayer, OSLayer.remove_file.__name__)
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=("Job <123456> is submitted to default queue <normal>.", ""),
+    )
+    @patch.object(OSLayer, OSLayer.print.__name__)
+    def test___submit___stale_logs_are_kept_if_disabled(
+        self, print_mock, run_process_mock, remove_file_mock, *mocks
+    ):
+        lsf_submit = Submitter(jobscript="real_jobscript.sh", remove_stale_logs=False)
+
+        lsf_submit.submit()
+
+        remove_file_mock.assert_not_called()
+
+    @patch.object(
+        CookieCutter, CookieCutter.get_log_dir.__name__, return_value="logdir"
+    )
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_mem_mb.__name__, return_value=1000
+    )
+    @patch.object(OSLayer, OSLayer.get_uuid4_string.__name__, return_value="random")
+    @patch.object(OSLayer, OSLayer.mkdir.__name__)
+    @patch.object(OSLayer, OSLayer.remove_file.__name__)
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=("Job <123456> is submitted to default queue <normal>.", ""),
+    )
+    @patch.object(OSLayer, OSLayer.print.__name__)
+    def test___submit___logdir_is_created_through_cache(
+        self, print_mock, run_process_mock, remove_file_mock, mkdir_mock, *mocks
+    ):
+        logdir_cache = DirectoryCache()
+        for _ in range(2):
+            Submitter(jobscript="real_jobscript.sh", logdir_cache=logdir_cache).submit()
+
+        mkdir_mock.assert_called_once_with(
+            Path("logdir") / "search_fasta_on_index" / "i=0"
+        )
+
+    @patch.object(
+        CookieCutter, CookieCutter.get_log_dir.__name__, return_value="logdir"
+    )
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_mem_mb.__name__, return_value=1000
+    )
+    @patch.object(OSLayer, OSLayer.get_uuid4_string.__name__, return_value="random")
+    @patch.object(OSLayer, OSLayer.mkdir.__name__)
+    @patch.object(OSLayer, OSLayer.remove_file.__name__)
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=("Job <123456> is submitted to default queue <normal>.", ""),
+    )
+    @patch.object(OSLayer, OSLayer.print.__name__)
+    def test___submit___job_is_submitted_into_run_job_group(
+        self, print_mock, run_process_mock, *mocks
+    ):
+        job_groups = MagicMock()
+        job_groups.group_for.return_value = "/snakemake/run"
+        lsf_submit = Submitter(jobscript="real_jobscript.sh", job_groups=job_groups)
+
+        lsf_submit.submit()
+
+        job_groups.group_for.assert_called_once_with("real_jobscript.sh")
+        submit_cmd = run_process_mock.call_args[0][0]
+        group_index = submit_cmd.index("-g")
+        assert submit_cmd[group_index + 1] == "/snakemake/run"
+
+    @patch.object(
+        CookieCutter, CookieCutter.get_log_dir.__name__, return_value="logdir"
+    )
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_mem_mb.__name__, return_value=1000
+    )
+    @patch.object(OSLayer, OSLayer.get_uuid4_string.__name__, return_value="random")
+    @patch.object(OSLayer, OSLayer.mkdir.__name__)
+    @patch.object(OSLayer, OSLayer.remove_file.__name__)
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=("Job <123456> is submitted to default queue <normal>.", ""),
+    )
+    @patch.object(OSLayer, OSLayer.print.__name__)
+    def test___submit___without_job_groups_no_group_is_given(
+        self, print_mock, run_process_mock, *mocks
+    ):
+        Submitter(jobscript="real_jobscript.sh").submit()
+
+        assert "-g" not in run_process_mock.call_args[0][0]
+
+    @patch.object(
+        CookieCutter, CookieCutter.get_log_dir.__name__, return_value="logdir"
+    )
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_mem_mb.__name__, return_value=1000
+    )
+    @patch.object(OSLayer, OSLayer.get_uuid4_string.__name__, return_value="random")
+    @patch.object(OSLayer, OSLayer.mkdir.__name__)
+    @patch.object(OSLayer, OSLayer.remove_file.__name__)
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=("Job <123456> is submitted to default queue <normal>.", ""),
+    )
+    @patch.object(OSLayer, OSLayer.print.__name__)
+    def test___submit___records_predictions_in_job_registry(self, *mocks):
+        job_registry = MagicMock()
+        runtime_predictor = MagicMock()
+        runtime_predictor.predict.return_value = 45
+        lsf_submit = Submitter(
+            jobscript="real_jobscript.sh",
+            job_registry=job_registry,
+            runtime_predictor=runtime_predictor,
+        )
+
+        lsf_submit.submit()
+
+        job_registry.record_predictions.assert_called_once_with(123456, run_limit=45)
+
+    @patch.object(
+        CookieCutter, CookieCutter.get_log_dir.__name__, return_value="logdir"
+    )
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_mem_mb.__name__, return_value=1000
+    )
+    @patch.object(OSLayer, OSLayer.get_uuid4_string.__name__, return_value="random")
+    @patch.object(OSLayer, OSLayer.mkdir.__name__)
+    @patch.object(OSLayer, OSLayer.remove_file.__name__)
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=("Job <123456> is submitted to default queue <normal>.", ""),
+    )
+    @patch.object(OSLayer, OSLayer.print.__name__)
+    def test___submit___records_job_in_job_registry(self, *mocks):
+        job_registry = MagicMock()
+        lsf_submit = Submitter(jobscript="real_jobscript.sh", job_registry=job_registry)
+
+        lsf_submit.submit()
+
+        job_registry.record_submission.assert_called_once_with(
+            123456,
+            rule=lsf_submit.rule_name,
+            wildcards=lsf_submit.wildcards,
+            resources=lsf_submit.resources,
+            outlog=lsf_submit.outlog,
+            errlog=lsf_submit.errlog,
+        )
+
+    @patch.object(
+        CookieCutter, CookieCutter.get_log_dir.__name__, return_value="logdir"
+    )
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_mem_mb.__name__, return_value=1000
+    )
+    @patch.object(OSLayer, OSLayer.get_uuid4_string.__name__, return_value="random")
+    @patch.object(OSLayer, OSLayer.mkdir.__name__)
+    @patch.object(OSLayer, OSLayer.remove_file.__name__)
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=("Job <123456> is submitted to default queue <normal>.", ""),
+    )
+    @patch.object(OSLayer, OSLayer.print.__name__)
+    def test___submit___batch_mode_adds_job_to_batch_instead_of_calling_bsub(
+        self, print_mock, run_process_mock, *mocks
+    ):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spool = SubmissionSpool(Path(tmpdir))
+            lsf_submit = Submitter(jobscript="real_jobscript.sh", batch_spool=spool)
+            other_submit = Submitter(jobscript="real_jobscript.sh", batch_spool=spool)
+
+            with patch.object(spool, "start_flusher") as start_flusher_mock:
+                lsf_submit.submit()
+                other_submit.submit()
+
+            run_process_mock.assert_not_called()
+            start_flusher_mock.assert_called_once()
+            batch_id = start_flusher_mock.call_args[0][1]
+            print_mock.assert_has_calls(
+                [
+                    call("{}[1] {}".format(batch_id, lsf_submit.outlog)),
+                    call("{}[2] {}".format(batch_id, other_submit.outlog)),
+                ]
+            )
+            assert spool.entries(batch_id)[0]["submit_cmd"] == lsf_submit.submit_cmd
+
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_mem_mb.__name__, return_value=1000
+    )
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_queue.__name__, return_value=""
+    )
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_project.__name__, return_value=""
+    )
+    def test_rule_specific_params_are_computed_once(self, *mocks):
+        lsf_config = MagicMock()
+        lsf_config.params_for_rule.return_value = ["-q", "long"]
+        lsf_submit = Submitter(jobscript="real_jobscript.sh", lsf_config=lsf_config)
+
+        lsf_submit.submit_cmd
+        lsf_submit.queue_cmd
+        lsf_submit.proj_cmd
+
+        lsf_config.params_for_rule.assert_called_once_with(lsf_submit.rule_name)
+
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_mem_mb.__name__, return_value=1000
+    )
+    def test_mem_mb_is_predicted_when_rule_has_no_mem_mb(self, *mocks):
+        jobscript = Path(tempfile.NamedTemporaryFile(delete=False, suffix=".sh").name)
+        jobscript.write_text(
+            '#!/bin/sh\n# properties = {"rule": "align", "resources": {}}\n'
+        )
+        memory_predictor = MagicMock()
+        memory_predictor.predict.return_value = Memory(1500, unit=Unit.MEGA)
+        lsf_submit = Submitter(
+            jobscript=str(jobscript), memory_predictor=memory_predictor
+        )
+
+        assert lsf_submit.mem_mb == Memory(1500, unit=Unit.MEGA)
+        memory_predictor.predict.assert_called_once_with("align", {})
+
+        memory_predictor.predict.return_value = None
+        lsf_submit = Submitter(
+            jobscript=str(jobscript), memory_predictor=memory_predictor
+        )
+
+        assert lsf_submit.mem_mb == Memory(1000, unit=Unit.MEGA)
+
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_mem_mb.__name__, return_value=1000
+    )
+    def test_run_limit_is_predicted_when_rule_has_none(self, *mocks):
+        runtime_predictor = MagicMock()
+        runtime_predictor.predict.return_value = 45
+        lsf_submit = Submitter(
+            jobscript="real_jobscript.sh", runtime_predictor=runtime_predictor
+        )
+
+        assert lsf_submit.resources_cmd[-2:] == ["-W", "45"]
+        assert lsf_submit.predictions == {"run_limit": 45}
+        runtime_predictor.predict.assert_called_once_with(
+            "search_fasta_on_index", {"i": "0"}
+        )
+
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_mem_mb.__name__, return_value=1000
+    )
+    def test_run_limit_of_rule_is_not_predicted(self, *mocks):
+        jobscript = Path(tempfile.NamedTemporaryFile(delete=False, suffix=".sh").name)
+        jobscript.write_text(
+            '#!/bin/sh\n# properties = {"rule": "a", "resources": {"runtime": 5}}\n'
+        )
+        runtime_predictor = MagicMock()
+        lsf_submit = Submitter(
+            jobscript=str(jobscript), runtime_predictor=runtime_predictor
+        )
+
+        assert lsf_submit.resources_cmd.count("-W") == 1
+        runtime_predictor.predict.assert_not_called()
+
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_mem_mb.__name__, return_value=1000
+    )
+    def test_run_limit_in_lsf_config_is_not_predicted(self, *mocks):
+        runtime_predictor = MagicMock()
+        lsf_submit = Submitter(
+            jobscript="real_jobscript.sh",
+            lsf_config=Config({"search_fasta_on_index": "-W 30"}),
+            runtime_predictor=runtime_predictor,
+        )
+
+        assert "-W" not in lsf_submit.resources_cmd
+        assert lsf_submit.submit_cmd.count("-W") == 1
+        assert lsf_submit.predictions == {}
+        runtime_predictor.predict.assert_not_called()
+
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_mem_mb.__name__, return_value=1000
+    )
+    def test_mem_mb_in_lsf_config_is_not_predicted(self, *mocks):
+        jobscript = Path(tempfile.NamedTemporaryFile(delete=False, suffix=".sh").name)
+        jobscript.write_text(
+            '#!/bin/sh\n# properties = {"rule": "align", "resources": {}}\n'
+        )
+        memory_predictor = MagicMock()
+        lsf_submit = Submitter(
+            jobscript=str(jobscript),
+            lsf_config=Config({"align": "-M 8000"}),
+            memory_predictor=memory_predictor,
+        )
+
+        assert lsf_submit.mem_mb == Memory(1000, unit=Unit.MEGA)
+        assert lsf_submit.predictions == {}
+        memory_predictor.predict.assert_not_called()
+
+    def test_mem_mb_of_rule_is_not_predicted(self):
+        memory_predictor = MagicMock()
+        lsf_submit = Submitter(
+            jobscript="real_jobscript.sh", memory_predictor=memory_predictor
+        )
+
+        assert lsf_submit.mem_mb == Memory(2662, unit=Unit.MEGA)
+        memory_predictor.predict.assert_not_called()
+
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_queue.__name__, return_value="queue"
+    )
+    def test_queue_router_chooses_among_candidate_queues_of_rule(self, *mocks):
+        lsf_config = Config({"__queues__": {"__default__": ["normal", "other"]}})
+        queue_router = MagicMock()
+        queue_router.choose.return_value = "other"
+        lsf_submit = Submitter(
+            jobscript="real_jobscript.sh",
+            lsf_config=lsf_config,
+            queue_router=queue_router,
+        )
+        del lsf_submit.cluster["queue"]
+
+        assert lsf_submit.queue_cmd == ["-q", "other"]
+        queue_router.choose.assert_called_once_with(
+            "search_fasta_on_index", ["normal", "other"]
+        )
+
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_queue.__name__, return_value="queue"
+    )
+    def test_queue_router_is_not_used_without_candidate_queues(self, *mocks):
+        queue_router = MagicMock()
+        lsf_submit = Submitter(jobscript="real_jobscript.sh", queue_router=queue_router)
+        del lsf_submit.cluster["queue"]
+
+        assert lsf_submit.queue_cmd == ["-q", "queue"]
+        queue_router.choose.assert_not_called()
+
+    @patch.object(OSLayer, OSLayer.state_dir.__name__)
+    def test_queue_router_is_not_built_without_candidate_queues(self, state_dir_mock):
+        actual = queue_router_from_settings(Config({"align": "-q long"}))
+
+        self.assertIsNone(actual)
+        state_dir_mock.assert_not_called()
+
+    @patch.object(
+        CookieCutter, CookieCutter.get_queue_load_ttl.__name__, return_value=30
+    )
+    def test_queue_router_is_built_for_candidate_queues(self, *mocks):
+        lsf_config = Config({"__queues__": {"__default__": ["normal", "other"]}})
+        with tempfile.TemporaryDirectory() as tmpdir, patch.object(
+            OSLayer, OSLayer.state_dir.__name__, return_value=Path(tmpdir)
+        ):
+            actual = queue_router_from_settings(lsf_config)
+
+        self.assertEqual(actual.load_cache.ttl, 30)
+
     @patch.object(
         CookieCutter, CookieCutter.get_default_queue.__name__, return_value="queue"
     )
@@ -283,10 +695,28 @@ class TestSubmitter(unittest.TestCase):
         del lsf_submit._job_properties["cluster"]
 
         actual = lsf_submit.queue_cmd
-        expected = "-q queue"
+        expected = ["-q", "queue"]
 
         self.assertEqual(actual, expected)
 
+    @patch.object(
+        CookieCutter, CookieCutter.get_default_project.__name__, return_value=""
+    )
+    def test_quoted_params_are_single_arguments(self, *mocks):
+        content = "__default__: \"-R 'select[mem>2000] span[hosts=1]'\""
+        lsf_config = Config.from_stream(StringIO(content))
+        lsf_submit = Submitter(
+            jobscript="real_jobscript.sh",
+            cluster_cmds=["-E", "'test -d /scratch'"],
+            lsf_config=lsf_config,
+        )
+
+        assert lsf_submit.cluster_cmd == ["-E", "test -d /scratch"]
+        assert lsf_submit.rule_specific_params == [
+            "-R",
+            "select[mem>2000] span[hosts=1]",
+        ]
+
     @patch.object(
         CookieCutter, CookieCutter.get_log_dir.__name__, return_value="logdir"
     )
@@ -331,7 +761,7 @@ search_fasta_on_index: '-P project'
         expected_jobinfo_cmd = (
             '-o "{outlog}" -e "{errlog}" -J "search_fasta_on_index.i=0"'
         ).format(outlog=expected_outlog, errlog=expected_errlog)
-        expected = (
+        expected = shlex.split(
             "bsub -M {mem} -n 1 -R 'select[mem>{mem}] rusage[mem={mem}] span[hosts=1]' "
             "{jobinfo} -q q1 cluster_opt_1 cluster_opt_2 cluster_opt_3 "
             "-R 'select[mem>2000]' -gpu - -P project "
@@ -385,7 +815,7 @@ search_fasta_on_index: '-P project'
         expected_jobinfo_cmd = (
             '-o "{outlog}" -e "{errlog}" -J "search_fasta_on_index.i=0"'
         ).format(outlog=expected_outlog, errlog=expected_errlog)
-        expected = (
+        expected = shlex.split(
             "bsub -M {mem} -n 1 -R 'select[mem>{mem}] rusage[mem={mem}] span[hosts=1]' "
             "{jobinfo} cluster_opt_1 cluster_opt_2 cluster_opt_3 "
             "-q queue -gpu - -P project "
@@ -441,7 +871,7 @@ search_fasta_on_index: '-P project'
         expected_jobinfo_cmd = (
             '-o "{outlog}" -e "{errlog}" -J "search_fasta_on_index.i=0"'
         ).format(outlog=expected_outlog, errlog=expected_errlog)
-        expected = (
+        expected = shlex.split(
             "bsub -M {mem} -n 1 -R 'select[mem>{mem}] rusage[mem={mem}] span[hosts=1]' "
             "{jobinfo} cluster_opt_1 cluster_opt_2 cluster_opt_3 "
             "-q queue -gpu - -P project "
@@ -591,7 +1021,7 @@ search_fasta_on_index: '-P project'
             lsf_submit = Submitter(jobscript=str(jobscript))
 
             actual = lsf_submit.resources_cmd
-            expected = (
+            expected = shlex.split(
                 "-M 1000 -n 1 -R 'select[mem>1000] rusage[mem=1000] "
                 "span[hosts=1]' -W 1"
             )
@@ -599,5 +1029,91 @@ search_fasta_on_index: '-P project'
             assert actual == expected
 
 
+class TestStartup(unittest.TestCase):
+    def test_read_job_properties_matches_snakemake(self):
+        from snakemake.utils import read_job_properties as snakemake_reader
+
+        actual = read_job_properties("real_jobscript.sh")
+        expected = snakemake_reader("real_jobscript.sh")
+
+        self.assertEqual(actual, expected)
+
+    def test_importing_submit_script_does_not_import_snakemake_or_yaml(self):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import lsf_submit"],
+            cwd=str(Path(__file__).parent / "src"),
+            stderr=subprocess.PIPE,
+            check=True,
+        )
+        # lines look like "import time: self [us] | cumulative | imported package"
+        imported = {
+            line.rsplit("|", 1)[-1].strip()
+            for line in completed.stderr.decode().splitlines()
+        }
+
+        self.assertNotIn("snakemake", imported)
+        self.assertNotIn("yaml", imported)
+
+    @staticmethod
+    def modules_imported_by(script: str) -> set:
+        completed = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import json, sys, {}; print(json.dumps(list(sys.modules)))".format(
+                    script
+                ),
+            ],
+            cwd=str(Path(__file__).parent / "src"),
+            stdout=subprocess.PIPE,
+            check=True,
+        )
+        return set(json.loads(completed.stdout.decode()))
+
+    def test_importing_submit_script_does_not_import_optional_features(self):
+        modules = self.modules_imported_by("lsf_submit")
+
+        # with every feature off, a submission needs none of these
+        unexpected = {
+            "sqlite3",
+            "ctypes",
+            "socket",
+            "statistics",
+            "pickle",
+            "hashlib",
+            "job_registry",
+            "usage_history",
+            "lsf_queue_router",
+            "directory_cache",
+            "lsf_job_groups",
+            "lsf_batch_submit",
+            "lsf_status_cache",
+            "file_watch",
+        }
+        self.assertEqual(modules & unexpected, set())
+
+    def test_importing_status_and_cancel_scripts_does_not_import_optional_features(
+        self,
+    ):
+        # snakemake runs the status script for every job every time it polls
+        unexpected = {
+            "sqlite3",
+            "asyncio",
+            "socket",
+            "statistics",
+            "hashlib",
+            "job_registry",
+            "usage_history",
+            "lsf_batch_submit",
+            "lsf_status_cache",
+            "lsf_status_daemon",
+            "lsf_terminal_states",
+        }
+        for script in ("lsf_status", "lsf_cancel"):
+            with self.subTest(script=script):
+                modules = self.modules_imported_by(script)
+                self.assertEqual(modules & unexpected, set())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,105 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from tests.src.CookieCutter import CookieCutter
+from tests.src.OSLayer import OSLayer
+from tests.src.lsf_submit_broker import SubmitBroker
+from tests.src.lsf_submit_client import SubmitBrokerClient, SubmissionFailed
+
+BSUB_OUTPUT = ("Job <123456> is submitted to default queue <normal>.", "")
+
+
+@pytest.fixture
+def profile_settings():
+    with patch.object(
+        CookieCutter, CookieCutter.get_log_dir.__name__, return_value="logdir"
+    ), patch.object(
+        CookieCutter, CookieCutter.get_default_mem_mb.__name__, return_value=1000
+    ), patch.object(
+        CookieCutter, CookieCutter.get_default_project.__name__, return_value="proj"
+    ), patch.object(
+        OSLayer, OSLayer.get_uuid4_string.__name__, return_value="random"
+    ), patch.object(
+        OSLayer, OSLayer.mkdir.__name__
+    ), patch.object(
+        OSLayer, OSLayer.remove_file.__name__
+    ):
+        yield
+
+
+@pytest.fixture
+def running_broker(tmp_path, profile_settings):
+    broker = SubmitBroker(tmp_path / "submit.sock", config_path=tmp_path / "lsf.yaml")
+    thread = threading.Thread(target=broker.serve_forever, daemon=True)
+    thread.start()
+    deadline = time.time() + 5
+    while not broker.socket_path.exists() and time.time() < deadline:
+        time.sleep(0.01)
+    yield broker
+    broker.shutdown()
+    thread.join(timeout=5)
+
+
+class TestSubmitBroker:
+    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=BSUB_OUTPUT)
+    def test_submitsWithoutShell(self, run_process_mock, tmp_path, profile_settings):
+        broker = SubmitBroker(tmp_path / "submit.sock", tmp_path / "lsf.yaml")
+
+        response = broker.handle_request(
+            {"jobscript": "real_jobscript.sh", "cluster_cmds": ["-q", "long"]}
+        )
+
+        assert response["output"].startswith("123456 ")
+        argv = run_process_mock.call_args[0][0]
+        assert argv[0] == "bsub"
+        assert argv[-1] == "real_jobscript.sh"
+        assert "long" in argv
+
+    def test_configIsReloadedWhenItChanges(self, tmp_path):
+        config_path = tmp_path / "lsf.yaml"
+        broker = SubmitBroker(tmp_path / "submit.sock", config_path)
+
+        assert broker.lsf_config.params_for_rule("a") == []
+        config_path.write_text("__default__: -q short\n")
+        with patch.object(OSLayer, OSLayer.state_dir.__name__, return_value=tmp_path):
+            first = broker.lsf_config
+            assert broker.lsf_config is first
+            assert first.params_for_rule("a") == ["-q", "short"]
+            config_path.write_text("__default__: -q long\n")
+
+            assert broker.lsf_config.params_for_rule("a") == ["-q", "long"]
+
+
+class TestSubmitBrokerClient:
+    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=BSUB_OUTPUT)
+    def test_clientGetsOutputFromBroker(self, run_process_mock, running_broker):
+        client = SubmitBrokerClient(running_broker.socket_path, autostart=False)
+
+        output = client.submit("real_jobscript.sh", [])
+
+        assert output.startswith("123456 logdir/")
+
+    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("no job id", ""))
+    def test_failedSubmission_raisesInsteadOfFallingBack(
+        self, run_process_mock, running_broker
+    ):
+        client = SubmitBrokerClient(running_broker.socket_path, autostart=False)
+
+        with pytest.raises(SubmissionFailed, match="JobidNotFoundError"):
+            client.submit("real_jobscript.sh", [])
+
+    def test_brokerNotRunning_returnsNone(self, tmp_path):
+        client = SubmitBrokerClient(tmp_path / "submit.sock", autostart=False)
+
+        assert client.submit("real_jobscript.sh", []) is None
+
+    @patch.object(SubmitBrokerClient, SubmitBrokerClient.start_broker.__name__)
+    def test_brokerNotRunning_startsBroker(self, start_broker_mock, tmp_path):
+        client = SubmitBrokerClient(tmp_path / "submit.sock")
+
+        client.submit("real_jobscript.sh", [])
+
+        start_broker_mock.assert_called_once_with()
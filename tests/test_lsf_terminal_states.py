@@ -0,0 +1,49 @@
+import os
+import time
+
+from tests.src.lsf_terminal_states import TerminalStateStore
+
+
+def age(path, seconds):
+    mtime = time.time() - seconds
+    os.utime(str(path), (mtime, mtime))
+
+
+class TestTerminalStateStore:
+    def test_unknownJob_returnsNone(self, tmp_path):
+        store = TerminalStateStore(max_age=60, directory=tmp_path)
+
+        assert store.get(123, "log.out") is None
+
+    def test_recordedJob_returnsStatus(self, tmp_path):
+        store = TerminalStateStore(max_age=60, directory=tmp_path)
+
+        store.record(123, "log.out", "success")
+
+        assert store.get(123, "log.out") == "success"
+
+    def test_sameJobidDifferentOutlog_returnsNone(self, tmp_path):
+        store = TerminalStateStore(max_age=60, directory=tmp_path)
+
+        store.record(123, "log.out", "success")
+
+        assert store.get(123, "other.out") is None
+
+    def test_expiredEntry_returnsNoneAndIsDeleted(self, tmp_path):
+        store = TerminalStateStore(max_age=60, directory=tmp_path)
+        store.record(123, "log.out", "failed")
+        age(store._path(123, "log.out"), 120)
+
+        assert store.get(123, "log.out") is None
+        assert not store._path(123, "log.out").exists()
+
+    def test_prune_deletesOnlyExpiredEntries(self, tmp_path):
+        store = TerminalStateStore(max_age=60, directory=tmp_path)
+        store.record(1, "old.out", "success")
+        store.record(2, "new.out", "success")
+        age(store._path(1, "old.out"), 120)
+
+        store.prune()
+
+        assert not store._path(1, "old.out").exists()
+        assert store.get(2, "new.out") == "success"
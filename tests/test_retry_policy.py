@@ -0,0 +1,82 @@
+import random
+from itertools import islice
+from unittest.mock import patch
+
+import pytest
+
+from tests.src.retry_policy import RetryPolicy, InvalidRetryStrategy
+
+
+def first_waits(policy: RetryPolicy, n: int) -> list:
+    return list(islice(policy.waits(), n))
+
+
+class TestWaits:
+    def test_invalidStrategy_raisesError(self):
+        with pytest.raises(InvalidRetryStrategy):
+            RetryPolicy("linear")
+
+    def test_fixed_alwaysWaitsBaseWait(self):
+        policy = RetryPolicy(RetryPolicy.FIXED, base_wait=0.5)
+
+        assert first_waits(policy, 3) == [0.5, 0.5, 0.5]
+
+    def test_exponential_doublesWait(self):
+        policy = RetryPolicy(RetryPolicy.EXPONENTIAL, base_wait=0.5)
+
+        assert first_waits(policy, 4) == [0.5, 1.0, 2.0, 4.0]
+
+    def test_exponential_isCappedByMaxWait(self):
+        policy = RetryPolicy(RetryPolicy.EXPONENTIAL, base_wait=1, max_wait=3)
+
+        assert first_waits(policy, 4) == [1, 2, 3, 3]
+
+    def test_decorrelatedJitter_staysWithinBounds(self):
+        policy = RetryPolicy(
+            RetryPolicy.DECORRELATED_JITTER,
+            base_wait=1,
+            max_wait=10,
+            rng=random.Random(42),
+        )
+
+        waits = first_waits(policy, 50)
+
+        assert all(1 <= wait <= 10 for wait in waits)
+        assert len(set(waits)) > 1
+
+    def test_decorrelatedJitter_differsBetweenProcesses(self):
+        first = RetryPolicy(
+            RetryPolicy.DECORRELATED_JITTER, base_wait=1, rng=random.Random(1)
+        )
+        second = RetryPolicy(
+            RetryPolicy.DECORRELATED_JITTER, base_wait=1, rng=random.Random(2)
+        )
+
+        assert first_waits(first, 3) != first_waits(second, 3)
+
+
+class TestAttempts:
+    @patch("time.sleep")
+    def test_yieldsMaxAttemptsAndSleepsInBetween(self, sleep_mock):
+        policy = RetryPolicy(RetryPolicy.EXPONENTIAL, base_wait=1, max_attempts=3)
+
+        assert list(policy.attempts()) == [0, 1, 2]
+        assert [c[0][0] for c in sleep_mock.call_args_list] == [1, 2]
+
+    def test_stopsWhenTimeBudgetWouldBeExceeded(self):
+        clock = [0.0]
+
+        def fake_sleep(seconds):
+            clock[0] += seconds
+
+        policy = RetryPolicy(
+            RetryPolicy.EXPONENTIAL, base_wait=1, max_attempts=10, time_budget=3.5
+        )
+
+        with patch("time.sleep", side_effect=fake_sleep), patch(
+            "time.monotonic", side_effect=lambda: clock[0]
+        ):
+            attempts = list(policy.attempts())
+
+        # waits of 1 and 2 fit in the budget, the next wait of 4 does not
+        assert attempts == [0, 1, 2]
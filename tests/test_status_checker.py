@@ -1,8 +1,11 @@
+import json
 import unittest
 from subprocess import CalledProcessError
-from unittest.mock import patch, call
+from unittest.mock import patch, call, MagicMock
 
 from tests.src.OSLayer import OSLayer, TailError
+from tests.src.lsf_batch_query import JobRecord
+from tests.src.retry_policy import RetryPolicy
 from tests.src.lsf_status import (
     StatusChecker,
     BjobsError,
@@ -10,16 +13,60 @@ from tests.src.lsf_status import (
     ZOMBIE,
 )
 
+BJOBS_CMD = [
+    "bjobs",
+    "-json",
+    "-o",
+    "jobid jobindex stat exit_code pend_reason max_mem run_time",
+    "123",
+]
+
+
+def bjobs_json(stat: str, jobid: int = 123, **fields) -> str:
+    record = {
+        "JOBID": str(jobid),
+        "STAT": stat,
+        "EXIT_CODE": "",
+        "PEND_REASON": "",
+        "MAX_MEM": "",
+        "RUN_TIME": "",
+    }
+    record.update(fields)
+    return json.dumps({"COMMAND": "bjobs", "JOBS": 1, "RECORDS": [record]})
+
+
+BHIST_DONE = """
+Job <123>, User <user>, Project <default>, Command <.snakemake/tmp.abc/snakejob.s
+                     h>
+Mon Oct  1 10:00:00: Submitted from host <login>, to Queue <normal>;
+Mon Oct  1 10:00:05: Dispatched 1 Task(s) on Host(s) <node>;
+Mon Oct  1 10:05:00: Done successfully. The CPU time used is 290.0 seconds;
+
+Summary of time in seconds spent in various states by  Mon Oct  1 10:05:00
+  PEND     PSUSP    RUN      USUSP    SSUSP    UNKWN    TOTAL
+  5        0        295      0        0        0        300
+"""
+
+
+def without_job_history():
+    return patch.object(
+        StatusChecker,
+        StatusChecker._query_status_using_history.__name__,
+        new=lambda self: None,
+    )
+
 
 def assert_called_n_times_with_same_args(mock, n, args):
     assert mock.call_count == n
     for mock_call in mock.call_args_list:
         call_args, _ = mock_call
-        assert " ".join(call_args) == args
+        assert call_args == (args,)
 
 
 class TestStatusChecker(unittest.TestCase):
-    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("PEND", ""))
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json("PEND"), "")
+    )
     def test___get_status___bjobs_says_process_is_PEND___job_status_is_running(
         self, run_process_mock
     ):
@@ -27,9 +74,11 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = "running"
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with("bjobs -o 'stat' -noheader 123")
+        run_process_mock.assert_called_once_with(BJOBS_CMD)
 
-    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("RUN", ""))
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json("RUN"), "")
+    )
     def test___get_status___bjobs_says_process_is_RUN___job_status_is_running(
         self, run_process_mock
     ):
@@ -37,9 +86,11 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = "running"
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with("bjobs -o 'stat' -noheader 123")
+        run_process_mock.assert_called_once_with(BJOBS_CMD)
 
-    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("PSUSP", ""))
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json("PSUSP"), "")
+    )
     def test___get_status___bjobs_says_process_is_PSUSP___job_status_is_running(
         self, run_process_mock
     ):
@@ -47,9 +98,11 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = "running"
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with("bjobs -o 'stat' -noheader 123")
+        run_process_mock.assert_called_once_with(BJOBS_CMD)
 
-    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("USUSP", ""))
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json("USUSP"), "")
+    )
     def test___get_status___bjobs_says_process_is_USUSP___job_status_is_running(
         self, run_process_mock
     ):
@@ -57,9 +110,11 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = "running"
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with("bjobs -o 'stat' -noheader 123")
+        run_process_mock.assert_called_once_with(BJOBS_CMD)
 
-    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("SSUSP", ""))
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json("SSUSP"), "")
+    )
     def test___get_status___bjobs_says_process_is_SSUSP___job_status_is_running(
         self, run_process_mock
     ):
@@ -67,9 +122,11 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = "running"
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with("bjobs -o 'stat' -noheader 123")
+        run_process_mock.assert_called_once_with(BJOBS_CMD)
 
-    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("WAIT", ""))
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json("WAIT"), "")
+    )
     def test___get_status___bjobs_says_process_is_WAIT___job_status_is_running(
         self, run_process_mock
     ):
@@ -77,9 +134,11 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = "running"
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with("bjobs -o 'stat' -noheader 123")
+        run_process_mock.assert_called_once_with(BJOBS_CMD)
 
-    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=(UNKNOWN, ""))
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json(UNKNOWN), "")
+    )
     def test___get_status___status_UNKWN_and_wait_unknown___job_status_is_running(
         self, run_process_mock
     ):
@@ -87,9 +146,11 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = lsf_status_checker.RUNNING
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with("bjobs -o 'stat' -noheader 123")
+        run_process_mock.assert_called_once_with(BJOBS_CMD)
 
-    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=(UNKNOWN, ""))
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json(UNKNOWN), "")
+    )
     def test___get_status___status_UNKWN_and_kill_unknown___job_status_is_running(
         self, run_process_mock
     ):
@@ -99,12 +160,14 @@ class TestStatusChecker(unittest.TestCase):
         expected = lsf_status_checker.RUNNING
         self.assertEqual(actual, expected)
         calls = [
-            call("bjobs -o 'stat' -noheader {}".format(jobid)),
-            call("bkill -r {}".format(jobid)),
+            call(BJOBS_CMD),
+            call(["bkill", "-r", str(jobid)]),
         ]
         run_process_mock.assert_has_calls(calls, any_order=False)
 
-    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=(ZOMBIE, ""))
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json(ZOMBIE), "")
+    )
     def test___get_status___status_ZOMBI_and_ignore_zombie___job_status_is_failed(
         self, run_process_mock
     ):
@@ -113,11 +176,11 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = lsf_status_checker.FAILED
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with(
-            "bjobs -o 'stat' -noheader {}".format(jobid)
-        )
+        run_process_mock.assert_called_once_with(BJOBS_CMD)
 
-    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=(ZOMBIE, ""))
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json(ZOMBIE), "")
+    )
     def test___get_status___status_ZOMBI_and_kill_zombie___job_status_is_failed(
         self, run_process_mock
     ):
@@ -127,12 +190,14 @@ class TestStatusChecker(unittest.TestCase):
         expected = lsf_status_checker.FAILED
         self.assertEqual(actual, expected)
         calls = [
-            call("bjobs -o 'stat' -noheader {}".format(jobid)),
-            call("bkill -r {}".format(jobid)),
+            call(BJOBS_CMD),
+            call(["bkill", "-r", str(jobid)]),
         ]
         run_process_mock.assert_has_calls(calls, any_order=False)
 
-    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("EXIT", ""))
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json("EXIT"), "")
+    )
     def test___get_status___bjobs_says_process_is_EXIT___job_status_is_failed(
         self, run_process_mock
     ):
@@ -140,9 +205,11 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = "failed"
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with("bjobs -o 'stat' -noheader 123")
+        run_process_mock.assert_called_once_with(BJOBS_CMD)
 
-    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("POST_ERR", ""))
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json("POST_ERR"), "")
+    )
     def test___get_status___bjobs_says_process_is_POST_ERR___job_status_is_failed(
         self, run_process_mock
     ):
@@ -150,9 +217,11 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = "failed"
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with("bjobs -o 'stat' -noheader 123")
+        run_process_mock.assert_called_once_with(BJOBS_CMD)
 
-    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("DONE", ""))
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json("DONE"), "")
+    )
     def test___get_status___bjobs_says_process_is_DONE___job_status_is_success(
         self, run_process_mock
     ):
@@ -160,9 +229,13 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = "success"
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with("bjobs -o 'stat' -noheader 123")
+        run_process_mock.assert_called_once_with(BJOBS_CMD)
 
-    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("POST_DONE", ""))
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(bjobs_json("POST_DONE"), ""),
+    )
     def test___get_status___bjobs_says_process_is_POST_DONE___job_status_is_success(
         self, run_process_mock
     ):
@@ -170,7 +243,7 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = "success"
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with("bjobs -o 'stat' -noheader 123")
+        run_process_mock.assert_called_once_with(BJOBS_CMD)
 
     @patch.object(OSLayer, OSLayer.run_process.__name__)
     def test_get_status_bjobs_fails_three_times_succeeds_fourth_job_status_is_success(
@@ -187,7 +260,7 @@ class TestStatusChecker(unittest.TestCase):
             elif self.count_fail_three_times_and_then_return_DONE == 3:
                 raise CalledProcessError(1, "bjobs")
             elif self.count_fail_three_times_and_then_return_DONE == 4:
-                return "DONE", ""
+                return bjobs_json("DONE"), ""
             else:
                 assert False
 
@@ -199,9 +272,26 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = "success"
         self.assertEqual(actual, expected)
-        assert_called_n_times_with_same_args(
-            run_process_mock, 4, "bjobs -o 'stat' -noheader 123"
-        )
+        assert_called_n_times_with_same_args(run_process_mock, 4, BJOBS_CMD)
+
+    @patch("time.sleep")
+    @patch.object(OSLayer, OSLayer.run_process.__name__)
+    def test_get_status_retryPolicyBacksOffAndCountsRetries(
+        self, run_process_mock, sleep_mock
+    ):
+        run_process_mock.side_effect = [
+            CalledProcessError(1, "bjobs"),
+            CalledProcessError(1, "bjobs"),
+            (bjobs_json("DONE"), ""),
+        ]
+        policy = RetryPolicy(RetryPolicy.EXPONENTIAL, base_wait=1, max_attempts=4)
+
+        lsf_status_checker = StatusChecker(123, "dummy", retry_policy=policy)
+        actual = lsf_status_checker.get_status()
+
+        self.assertEqual(actual, "success")
+        self.assertEqual(lsf_status_checker.retries_used, 2)
+        self.assertEqual([c[0][0] for c in sleep_mock.call_args_list], [1, 2])
 
     @patch.object(OSLayer, OSLayer.run_process.__name__)
     def test_get_status_bjobs_fails_three_times_PEND_fourth_time_job_status_running(
@@ -218,7 +308,7 @@ class TestStatusChecker(unittest.TestCase):
             elif self.count_fail_three_times_and_then_return_PEND == 3:
                 raise CalledProcessError(1, "bjobs")
             elif self.count_fail_three_times_and_then_return_PEND == 4:
-                return "PEND", ""
+                return bjobs_json("PEND"), ""
             else:
                 assert False
 
@@ -230,9 +320,7 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = "running"
         self.assertEqual(actual, expected)
-        assert_called_n_times_with_same_args(
-            run_process_mock, 4, "bjobs -o 'stat' -noheader 123"
-        )
+        assert_called_n_times_with_same_args(run_process_mock, 4, BJOBS_CMD)
 
     @patch.object(OSLayer, OSLayer.run_process.__name__)
     def test_get_status_bjobs_fails_once_says_EXIT_in_the_fourth_job_status_is_failed(
@@ -245,7 +333,7 @@ class TestStatusChecker(unittest.TestCase):
             if self.count_fail_three_times_and_then_return_FAIL == 1:
                 raise BjobsError
             elif self.count_fail_three_times_and_then_return_FAIL == 2:
-                return "EXIT", ""
+                return bjobs_json("EXIT"), ""
             else:
                 assert False
 
@@ -257,10 +345,9 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = "failed"
         self.assertEqual(actual, expected)
-        assert_called_n_times_with_same_args(
-            run_process_mock, 2, "bjobs -o 'stat' -noheader 123"
-        )
+        assert_called_n_times_with_same_args(run_process_mock, 2, BJOBS_CMD)
 
+    @without_job_history()
     @patch.object(OSLayer, OSLayer.run_process.__name__, side_effect=BjobsError)
     @patch.object(
         StatusChecker,
@@ -276,11 +363,10 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = "success"
         self.assertEqual(actual, expected)
-        assert_called_n_times_with_same_args(
-            run_process_mock, 4, "bjobs -o 'stat' -noheader 123"
-        )
+        assert_called_n_times_with_same_args(run_process_mock, 4, BJOBS_CMD)
         get_lines_of_log_file_mock.assert_called_once_with()
 
+    @without_job_history()
     @patch.object(OSLayer, OSLayer.run_process.__name__, side_effect=BjobsError)
     @patch.object(
         StatusChecker,
@@ -296,11 +382,10 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = "failed"
         self.assertEqual(actual, expected)
-        assert_called_n_times_with_same_args(
-            run_process_mock, 4, "bjobs -o 'stat' -noheader 123"
-        )
+        assert_called_n_times_with_same_args(run_process_mock, 4, BJOBS_CMD)
         get_lines_of_log_file_mock.assert_called_once_with()
 
+    @without_job_history()
     @patch.object(OSLayer, OSLayer.run_process.__name__, side_effect=BjobsError)
     @patch.object(
         StatusChecker,
@@ -316,11 +401,10 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = lsf_status_checker.FAILED
         self.assertEqual(actual, expected)
-        assert_called_n_times_with_same_args(
-            run_process_mock, 4, "bjobs -o 'stat' -noheader 123"
-        )
+        assert_called_n_times_with_same_args(run_process_mock, 4, BJOBS_CMD)
         get_lines_of_log_file_mock.assert_called_once_with()
 
+    @without_job_history()
     @patch.object(OSLayer, OSLayer.run_process.__name__, side_effect=BjobsError)
     @patch.object(
         StatusChecker,
@@ -336,11 +420,10 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = lsf_status_checker.RUNNING
         self.assertEqual(actual, expected)
-        assert_called_n_times_with_same_args(
-            run_process_mock, 4, "bjobs -o 'stat' -noheader 123"
-        )
+        assert_called_n_times_with_same_args(run_process_mock, 4, BJOBS_CMD)
         get_lines_of_log_file_mock.assert_called_once_with()
 
+    @without_job_history()
     @patch.object(OSLayer, OSLayer.run_process.__name__, side_effect=BjobsError)
     @patch.object(
         StatusChecker,
@@ -356,11 +439,10 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = lsf_status_checker.FAILED
         self.assertEqual(actual, expected)
-        assert_called_n_times_with_same_args(
-            run_process_mock, 4, "bjobs -o 'stat' -noheader 123"
-        )
+        assert_called_n_times_with_same_args(run_process_mock, 4, BJOBS_CMD)
         get_lines_of_log_file_mock.assert_called_once_with()
 
+    @without_job_history()
     @patch.object(OSLayer, OSLayer.run_process.__name__, side_effect=BjobsError)
     @patch.object(
         StatusChecker,
@@ -376,11 +458,10 @@ class TestStatusChecker(unittest.TestCase):
         actual = lsf_status_checker.get_status()
         expected = lsf_status_checker.RUNNING
         self.assertEqual(actual, expected)
-        assert_called_n_times_with_same_args(
-            run_process_mock, 4, "bjobs -o 'stat' -noheader 123"
-        )
+        assert_called_n_times_with_same_args(run_process_mock, 4, BJOBS_CMD)
         get_lines_of_log_file_mock.assert_called_once_with()
 
+    @without_job_history()
     @patch.object(OSLayer, OSLayer.run_process.__name__, side_effect=BjobsError)
     @patch.object(
         StatusChecker,
@@ -397,9 +478,7 @@ class TestStatusChecker(unittest.TestCase):
         expected = lsf_status_checker.FAILED
 
         assert actual == expected
-        assert_called_n_times_with_same_args(
-            run_process_mock, 4, "bjobs -o 'stat' -noheader 123"
-        )
+        assert_called_n_times_with_same_args(run_process_mock, 4, BJOBS_CMD)
         get_lines_of_log_file_mock.assert_called_once_with()
 
     @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("", ""))
@@ -410,9 +489,11 @@ class TestStatusChecker(unittest.TestCase):
             123, "dummy", wait_between_tries=0.001, max_status_checks=4
         )
         self.assertRaises(BjobsError, lsf_status_checker._query_status_using_bjobs)
-        run_process_mock.assert_called_once_with("bjobs -o 'stat' -noheader 123")
+        run_process_mock.assert_called_once_with(BJOBS_CMD)
 
-    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("asd", ""))
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json("asd"), "")
+    )
     def test____query_status_using_bjobs___unknown_job_status___raises_KeyError(
         self, run_process_mock
     ):
@@ -420,7 +501,7 @@ class TestStatusChecker(unittest.TestCase):
             123, "dummy", wait_between_tries=0.001, max_status_checks=4
         )
         self.assertRaises(KeyError, lsf_status_checker._query_status_using_bjobs)
-        run_process_mock.assert_called_once_with("bjobs -o 'stat' -noheader 123")
+        run_process_mock.assert_called_once_with(BJOBS_CMD)
 
     def test____get_tail_of_log_file(self):
         lsf_status_checker = StatusChecker(
@@ -430,6 +511,238 @@ class TestStatusChecker(unittest.TestCase):
         expected = ["abcd", "1234"]
         self.assertEqual(actual, expected)
 
+    @patch.object(OSLayer, OSLayer.run_process.__name__)
+    def test_get_status_daemon_knows_job_bjobs_is_not_called(self, run_process_mock):
+        status_daemon = MagicMock()
+        status_daemon.get_record.return_value = JobRecord("123", "DONE", 0, "", 1.0, 5)
+        lsf_status_checker = StatusChecker(123, "dummy", status_daemon=status_daemon)
+
+        actual = lsf_status_checker.get_status()
+
+        assert actual == lsf_status_checker.SUCCESS
+        status_daemon.get_record.assert_called_once_with(123)
+        run_process_mock.assert_not_called()
+
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json("RUN"), "")
+    )
+    def test_get_status_daemon_cannot_answer_falls_back_to_bjobs(
+        self, run_process_mock
+    ):
+        status_daemon = MagicMock()
+        status_daemon.get_record.return_value = None
+        lsf_status_checker = StatusChecker(123, "dummy", status_daemon=status_daemon)
+
+        actual = lsf_status_checker.get_status()
+
+        assert actual == lsf_status_checker.RUNNING
+        run_process_mock.assert_called_once_with(BJOBS_CMD)
+
+    @patch.object(OSLayer, OSLayer.run_process.__name__)
+    def test_get_status_from_status_cache_bjobs_is_not_called(self, run_process_mock):
+        status_cache = MagicMock()
+        status_cache.get_record.return_value = JobRecord("123", "EXIT", 1, "", 1.0, 5)
+        lsf_status_checker = StatusChecker(123, "dummy", status_cache=status_cache)
+
+        actual = lsf_status_checker.get_status()
+
+        assert actual == lsf_status_checker.FAILED
+        status_cache.get_record.assert_called_once_with(123)
+        run_process_mock.assert_not_called()
+
+    @patch.object(OSLayer, OSLayer.run_process.__name__)
+    def test_get_status_terminal_state_known_nothing_is_queried(self, run_process_mock):
+        terminal_states = MagicMock()
+        terminal_states.get.return_value = "success"
+        lsf_status_checker = StatusChecker(
+            123, "dummy", terminal_states=terminal_states
+        )
+
+        actual = lsf_status_checker.get_status()
+
+        assert actual == lsf_status_checker.SUCCESS
+        terminal_states.get.assert_called_once_with(123, "dummy")
+        run_process_mock.assert_not_called()
+        terminal_states.record.assert_not_called()
+
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json("EXIT"), "")
+    )
+    def test_get_status_terminal_status_is_recorded(self, run_process_mock):
+        terminal_states = MagicMock()
+        terminal_states.get.return_value = None
+        lsf_status_checker = StatusChecker(
+            123, "dummy", terminal_states=terminal_states
+        )
+
+        actual = lsf_status_checker.get_status()
+
+        assert actual == lsf_status_checker.FAILED
+        terminal_states.record.assert_called_once_with(123, "dummy", "failed")
+
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json("RUN"), "")
+    )
+    def test_get_status_running_status_is_not_recorded(self, run_process_mock):
+        terminal_states = MagicMock()
+        terminal_states.get.return_value = None
+        lsf_status_checker = StatusChecker(
+            123, "dummy", terminal_states=terminal_states
+        )
+
+        lsf_status_checker.get_status()
+
+        terminal_states.record.assert_not_called()
+
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json("RUN"), "")
+    )
+    def test_get_status_records_state_in_job_registry(self, run_process_mock):
+        job_registry = MagicMock()
+        lsf_status_checker = StatusChecker(123, "dummy", job_registry=job_registry)
+
+        lsf_status_checker.get_status()
+
+        job_registry.update_state.assert_called_once_with(123, "running", "RUN")
+        job_registry.record_usage.assert_not_called()
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(
+            bjobs_json("DONE", MAX_MEM="2 Gbytes", RUN_TIME="42 second(s)"),
+            "",
+        ),
+    )
+    def test_get_status_finished_job_records_usage_from_bjobs(self, run_process_mock):
+        job_registry = MagicMock()
+        lsf_status_checker = StatusChecker(123, "dummy", job_registry=job_registry)
+
+        lsf_status_checker.get_status()
+
+        job_registry.record_usage.assert_called_once_with(123, True, 2000.0, 42, None)
+
+    @without_job_history()
+    @patch.object(OSLayer, OSLayer.run_process.__name__, side_effect=BjobsError)
+    @patch.object(
+        StatusChecker,
+        StatusChecker._get_tail_of_log_file.__name__,
+        return_value=[
+            "Exited with exit code 1.",
+            "",
+            "Resource usage summary:",
+            "",
+            "CPU time :                                   9.50 sec.",
+            "Max Memory :                                 7 MB",
+            "Run time :                                   12 sec.",
+        ],
+    )
+    def test_get_status_finished_job_records_usage_from_log(self, *mocks):
+        job_registry = MagicMock()
+        lsf_status_checker = StatusChecker(123, "dummy", job_registry=job_registry)
+
+        lsf_status_checker.get_status()
+
+        job_registry.record_usage.assert_called_once_with(123, False, 7.0, 12.0, 9.5)
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(
+            bjobs_json(
+                "EXIT", EXIT_CODE="137", MAX_MEM="2 Gbytes", RUN_TIME="42 second(s)"
+            ),
+            "",
+        ),
+    )
+    def test_get_status_record_holds_all_queried_fields(self, run_process_mock):
+        lsf_status_checker = StatusChecker(123, "dummy")
+
+        actual = lsf_status_checker.get_status()
+
+        assert actual == lsf_status_checker.FAILED
+        expected_record = JobRecord(
+            jobid="123",
+            stat="EXIT",
+            exit_code=137,
+            pend_reason="",
+            max_mem_mb=2000.0,
+            run_time=42,
+        )
+        assert lsf_status_checker.record == expected_record
+
+    @patch.object(
+        OSLayer,
+        OSLayer.run_process.__name__,
+        return_value=(
+            json.dumps(
+                {"RECORDS": [{"JOBID": "123", "ERROR": "Job <123> is not found"}]}
+            ),
+            "",
+        ),
+    )
+    def test____query_status_using_bjobs___job_not_found___raises_BjobsError(
+        self, run_process_mock
+    ):
+        lsf_status_checker = StatusChecker(123, "dummy")
+        self.assertRaises(BjobsError, lsf_status_checker._query_status_using_bjobs)
+
+    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("RUN", ""))
+    def test____query_status_using_bjobs___output_is_not_json___raises_BjobsError(
+        self, run_process_mock
+    ):
+        lsf_status_checker = StatusChecker(123, "dummy")
+        self.assertRaises(BjobsError, lsf_status_checker._query_status_using_bjobs)
+
+    @patch.object(OSLayer, OSLayer.run_process.__name__)
+    def test_get_status_bjobs_fails_job_history_says_done_job_status_is_success(
+        self, run_process_mock
+    ):
+        def bjobs_fails_bhist_knows_job(cmd, check=True):
+            if cmd[0] == "bjobs":
+                return "", "Job <123> is not found"
+            if cmd[0] == "bhist":
+                return BHIST_DONE, ""
+            assert False
+
+        run_process_mock.side_effect = bjobs_fails_bhist_knows_job
+        lsf_status_checker = StatusChecker(123, "dummy", max_status_checks=2)
+
+        actual = lsf_status_checker.get_status()
+
+        assert actual == lsf_status_checker.SUCCESS
+        run_process_mock.assert_called_with(["bhist", "-l", "123"], check=False)
+        assert list(lsf_status_checker.tier_latencies) == ["bjobs", "history"]
+
+    @patch.object(
+        StatusChecker,
+        StatusChecker._get_tail_of_log_file.__name__,
+        return_value=["Exited with exit code 1.", "", "Resource usage summary:"],
+    )
+    @patch.object(OSLayer, OSLayer.run_process.__name__, return_value=("", ""))
+    def test_get_status_bjobs_bhist_and_bacct_know_nothing_log_is_checked(
+        self, run_process_mock, get_lines_of_log_file_mock
+    ):
+        lsf_status_checker = StatusChecker(123, "dummy")
+
+        actual = lsf_status_checker.get_status()
+
+        assert actual == lsf_status_checker.FAILED
+        run_process_mock.assert_any_call(["bhist", "-l", "123"], check=False)
+        run_process_mock.assert_any_call(["bacct", "-l", "123"], check=False)
+        get_lines_of_log_file_mock.assert_called_once_with()
+        assert list(lsf_status_checker.tier_latencies) == ["bjobs", "history", "log"]
+
+    @patch.object(
+        OSLayer, OSLayer.run_process.__name__, return_value=(bjobs_json("RUN"), "")
+    )
+    def test_get_status_bjobs_succeeds_history_is_not_queried(self, run_process_mock):
+        lsf_status_checker = StatusChecker(123, "dummy")
+
+        lsf_status_checker.get_status()
+
+        assert list(lsf_status_checker.tier_latencies) == ["bjobs"]
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,191 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from tests.src.job_registry import JobRegistry, SUCCESS, FAILED
+from tests.src.memory_units import Memory, Unit
+from tests.src.job_registry import JobRuntime
+from tests.src.usage_history import (
+    MemoryPredictor,
+    ResourceUsage,
+    RuntimePredictor,
+    format_runtime_report,
+    import_usage_from_logs,
+    parse_usage_summary,
+    percentile,
+    runtime_report,
+)
+from tests.test_job_registry import register
+
+LOG_TRAILER = """Sender: LSF System <lsfadmin@node>
+Subject: Job 123: <snakejob.align.1.sh> in cluster <cluster> Done
+
+Successfully completed.
+
+Resource usage summary:
+
+    CPU time :                                   290.00 sec.
+    Max Memory :                                 1.50 GB
+    Average Memory :                             1.20 GB
+    Total Requested Memory :                     4000.00 MB
+    Delta Memory :                               2500.00 MB
+    Max Swap :                                   -
+    Max Processes :                              3
+    Max Threads :                                4
+    Run time :                                   300 sec.
+    Turnaround time :                            360 sec.
+
+The output (if any) is above this job summary.
+"""
+
+
+class TestParseUsageSummary:
+    def test_lsfTrailer_returnsUsage(self):
+        actual = parse_usage_summary(LOG_TRAILER.splitlines())
+
+        assert actual == ResourceUsage(
+            max_mem_mb=1500.0, run_time=300.0, cpu_time=290.0
+        )
+
+    def test_noSummary_returnsNone(self):
+        assert parse_usage_summary(["Successfully completed."]) is None
+
+    def test_fieldsNotReported_areNone(self):
+        lines = ["Resource usage summary:", "", "Max Memory :  -", "Run time : 5 sec."]
+
+        actual = parse_usage_summary(lines)
+
+        assert actual == ResourceUsage(max_mem_mb=None, run_time=5.0, cpu_time=None)
+
+
+class TestPercentile:
+    @pytest.mark.parametrize(
+        "percent, expected", [(0, 1), (50, 5), (90, 9), (95, 10), (100, 10)]
+    )
+    def test_nearestRank(self, percent, expected):
+        assert percentile(list(range(10, 0, -1)), percent) == expected
+
+
+class TestMemoryPredictor:
+    def test_percentileOfPeaksPlusHeadroom(self):
+        registry = MagicMock()
+        registry.usage_history.return_value = [1000.0, 900.0, 1100.0, 800.0, 950.0]
+        predictor = MemoryPredictor(registry, percent=80, headroom=10, min_samples=5)
+
+        actual = predictor.predict("align")
+
+        assert actual == Memory(1100, unit=Unit.MEGA)
+        registry.usage_history.assert_called_once_with("align", "max_mem_mb", 100)
+
+    def test_tooFewSamples_predictsNothing(self):
+        registry = MagicMock()
+        registry.usage_history.return_value = [1000.0, 900.0]
+        predictor = MemoryPredictor(registry, min_samples=5)
+
+        assert predictor.predict("align") is None
+
+    def test_onlySuccessfulJobsOfRuleAreUsed(self, tmp_path):
+        registry = JobRegistry(tmp_path / "jobs.sqlite")
+        for jobid, mem_mb, state in (
+            (1, 100, SUCCESS),
+            (2, 200, SUCCESS),
+            (3, 900, FAILED),
+        ):
+            register(registry, jobid)
+            registry.update_state(jobid, state)
+            registry.record_usage(jobid, state == SUCCESS, mem_mb, 10.0)
+        predictor = MemoryPredictor(registry, percent=100, headroom=0, min_samples=2)
+
+        assert predictor.predict("align") == Memory(200, unit=Unit.MEGA)
+        assert predictor.predict("sort") is None
+
+
+def finished_job(registry: JobRegistry, jobid: int, sample: str, run_time: float):
+    registry.record_submission(
+        jobid, "align", {"sample": sample}, {}, outlog="out", errlog="err"
+    )
+    registry.update_state(jobid, SUCCESS)
+    registry.record_usage(jobid, True, run_time=run_time)
+
+
+class TestRuntimePredictor:
+    def test_runLimitInMinutesWithHeadroom(self):
+        registry = MagicMock()
+        registry.usage_history.return_value = [600.0, 1200.0, 900.0]
+        predictor = RuntimePredictor(registry, percent=100, headroom=50, min_samples=3)
+
+        assert predictor.predict("align") == 30
+
+    def test_shortJobs_getAtLeastOneMinute(self):
+        registry = MagicMock()
+        registry.usage_history.return_value = [1.0, 2.0, 3.0]
+        predictor = RuntimePredictor(registry, headroom=0, min_samples=3)
+
+        assert predictor.predict("align") == 1
+
+    def test_wildcardPattern_usesJobsWithSameWildcardValues(self, tmp_path):
+        registry = JobRegistry(tmp_path / "jobs.sqlite")
+        for jobid in range(3):
+            finished_job(registry, jobid, sample="big", run_time=6000.0)
+            finished_job(registry, 10 + jobid, sample="small", run_time=60.0)
+        predictor = RuntimePredictor(
+            registry, percent=100, headroom=0, min_samples=3, wildcards=["sample"]
+        )
+
+        assert predictor.predict("align", {"sample": "small"}) == 1
+        assert predictor.predict("align", {"sample": "big"}) == 100
+        # too few jobs with this value: all jobs of the rule are used
+        assert predictor.predict("align", {"sample": "new"}) == 100
+
+
+class TestRuntimeReport:
+    def test_predictedAgainstActualAndWaitTimes(self):
+        jobs = [
+            JobRuntime("align", {}, 10, 0.0, 60.0, 400.0, 300.0, True),
+            JobRuntime("align", {}, 10, 0.0, None, 1000.0, 600.0, False),
+            JobRuntime("align", {}, None, 0.0, 600.0, 900.0, 300.0, True),
+            JobRuntime("align", {"runtime": 5}, None, 0.0, 30.0, 90.0, 60.0, True),
+            JobRuntime("sort", {}, None, 0.0, None, None, None, True),
+        ]
+
+        align, sort = runtime_report(jobs)
+
+        assert align == ("align", 4, 2, 10, 5.0, 10.0, 1, (60.0 + 400.0) / 2 / 60, 10.0)
+        assert sort == ("sort", 1, 0, None, None, None, 0, None, None)
+
+    def test_format_oneLinePerRule(self):
+        reports = runtime_report(
+            [JobRuntime("align", {}, 10, 0.0, 60.0, 400.0, 300.0, True)]
+        )
+
+        lines = format_runtime_report(reports).splitlines()
+
+        assert lines[0].split()[:2] == ["rule", "jobs"]
+        assert lines[1].split() == [
+            "align",
+            "1",
+            "1",
+            "10",
+            "5.0",
+            "5.0",
+            "0",
+            "1.0",
+            "-",
+        ]
+
+
+class TestImportUsageFromLogs:
+    def test_finishedJobsWithoutUsage_areImportedFromTheirLogs(self, tmp_path):
+        registry = JobRegistry(tmp_path / "jobs.sqlite")
+        outlog = tmp_path / "job.out"
+        outlog.write_text("job output\n" + LOG_TRAILER)
+        for jobid, state in ((1, SUCCESS), (2, FAILED)):
+            registry.record_submission(
+                jobid, "align", {}, {}, outlog=outlog, errlog="err"
+            )
+            registry.update_state(jobid, state)
+        registry.record_submission(3, "align", {}, {}, outlog=outlog, errlog="err")
+
+        assert import_usage_from_logs(registry) == 2
+        assert import_usage_from_logs(registry) == 0
+        assert registry.usage_history("align", "cpu_time") == [290.0]
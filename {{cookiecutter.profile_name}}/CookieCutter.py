@@ -46,3 +46,103 @@ class CookieCutter:
     @staticmethod
     def jobscript_timeout() -> int:
         return int("{{cookiecutter.jobscript_timeout}}")
+
+    @staticmethod
+    def use_status_daemon() -> bool:
+        return "{{cookiecutter.use_status_daemon}}".lower() == "true"
+
+    @staticmethod
+    def get_status_daemon_poll_interval() -> float:
+        return float("{{cookiecutter.status_daemon_poll_interval}}")
+
+    @staticmethod
+    def get_status_cache_ttl() -> float:
+        return float("{{cookiecutter.status_cache_ttl}}")
+
+    @staticmethod
+    def get_terminal_state_max_age() -> float:
+        return float("{{cookiecutter.terminal_state_max_age}}")
+
+    @staticmethod
+    def get_status_retry_strategy() -> str:
+        return "{{cookiecutter.status_retry_strategy}}"
+
+    @staticmethod
+    def get_status_retry_max_wait() -> float:
+        return float("{{cookiecutter.status_retry_max_wait}}")
+
+    @staticmethod
+    def get_status_retry_budget() -> float:
+        return float("{{cookiecutter.status_retry_budget}}")
+
+    @staticmethod
+    def use_job_registry() -> bool:
+        return "{{cookiecutter.use_job_registry}}".lower() == "true"
+
+    @staticmethod
+    def get_batch_submission() -> str:
+        return "{{cookiecutter.batch_submission}}"
+
+    @staticmethod
+    def get_batch_submission_window() -> float:
+        return float("{{cookiecutter.batch_submission_window}}")
+
+    @staticmethod
+    def get_batch_submission_max_size() -> int:
+        return int("{{cookiecutter.batch_submission_max_size}}")
+
+    @staticmethod
+    def use_submit_broker() -> bool:
+        return "{{cookiecutter.use_submit_broker}}".lower() == "true"
+
+    @staticmethod
+    def get_submit_broker_workers() -> int:
+        return int("{{cookiecutter.submit_broker_workers}}")
+
+    @staticmethod
+    def get_memory_prediction_percentile() -> float:
+        return float("{{cookiecutter.memory_prediction_percentile}}")
+
+    @staticmethod
+    def get_memory_prediction_headroom() -> float:
+        return float("{{cookiecutter.memory_prediction_headroom}}")
+
+    @staticmethod
+    def get_runtime_prediction_percentile() -> float:
+        return float("{{cookiecutter.runtime_prediction_percentile}}")
+
+    @staticmethod
+    def get_runtime_prediction_headroom() -> float:
+        return float("{{cookiecutter.runtime_prediction_headroom}}")
+
+    @staticmethod
+    def get_runtime_prediction_wildcards() -> str:
+        return "{{cookiecutter.runtime_prediction_wildcards}}"
+
+    @staticmethod
+    def get_queue_load_ttl() -> float:
+        return float("{{cookiecutter.queue_load_ttl}}")
+
+    @staticmethod
+    def remove_stale_logs() -> bool:
+        return "{{cookiecutter.remove_stale_logs}}".lower() == "true"
+
+    @staticmethod
+    def get_cancel_chunk_size() -> int:
+        return int("{{cookiecutter.cancel_chunk_size}}")
+
+    @staticmethod
+    def get_cancel_workers() -> int:
+        return int("{{cookiecutter.cancel_workers}}")
+
+    @staticmethod
+    def get_cancel_retries() -> int:
+        return int("{{cookiecutter.cancel_retries}}")
+
+    @staticmethod
+    def use_job_groups() -> bool:
+        return "{{cookiecutter.use_job_groups}}".lower() == "true"
+
+    @staticmethod
+    def get_job_group_limit() -> int:
+        return int("{{cookiecutter.job_group_limit}}")
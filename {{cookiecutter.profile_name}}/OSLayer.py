@@ -1,9 +1,14 @@
+import fcntl
+import os
+import shutil
 import subprocess
 import sys
 import time
 import uuid
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Tuple, List
+from typing import Tuple, List, Iterator, Optional
 
 if not __name__.startswith("tests.src."):
     sys.path.append(str(Path(__file__).parent.absolute()))
@@ -14,11 +19,22 @@ else:
 stdout = str
 stderr = str
 
+TAIL_BLOCK_SIZE = 8192
+
 
 class TailError(Exception):
     pass
 
 
+@lru_cache(maxsize=None)
+def resolve_executable(name: str) -> Optional[str]:
+    """The absolute path of the command name on PATH, or None if there is none.
+    Looked up once per process rather than by every exec of every call; call
+    resolve_executable.cache_clear() after changing PATH."""
+    path = shutil.which(name)
+    return None if path is None else os.path.abspath(path)
+
+
 class OSLayer:
     """
     This class provides an abstract layer to communicating with the OS.
@@ -28,17 +44,91 @@ class OSLayer:
 
     @staticmethod
     def mkdir(directory: Path):
-        directory.mkdir(parents=True, exist_ok=True)
+        """Creates directory and any missing parents. Costs a single mkdir call when
+        the parent exists, whether or not directory does, which matters on shared
+        filesystems where every metadata operation goes to the server.
+        """
+        try:
+            directory.mkdir()
+        except FileExistsError:
+            # unlike exist_ok, this does not stat the path to check it is a directory
+            pass
+        except FileNotFoundError:
+            directory.mkdir(parents=True, exist_ok=True)
 
     @staticmethod
     def remove_file(file: Path):
-        if file.is_file():
+        """Removes file if it exists, with a single unlink call. Directories are
+        left alone."""
+        try:
             file.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError:
+            if not file.is_dir():
+                raise
 
     @staticmethod
-    def run_process(cmd: str, check: bool = True) -> Tuple[stdout, stderr]:
+    def state_dir() -> Path:
+        """Directory, relative to the snakemake working directory, where the profile
+        keeps state shared between its processes (sockets, caches, ...).
+        """
+        directory = Path(".snakemake") / "lsf_profile"
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory
+
+    @staticmethod
+    @contextmanager
+    def file_lock(
+        path: Path, shared: bool = False, blocking: bool = True
+    ) -> Iterator[None]:
+        """Holds an advisory lock on path for the duration of the with block.
+        Raises BlockingIOError if blocking is False and the lock is already taken.
+        """
+        mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        if not blocking:
+            mode |= fcntl.LOCK_NB
+        with open(str(path), "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def wait_for_file(path: Path, timeout: float) -> bool:
+        """Waits up to timeout seconds for path to exist and returns whether it does.
+        Uses inotify where available and exponential-backoff polling otherwise.
+        """
+        # only imported when a file is not there yet, as it loads ctypes
+        if not __name__.startswith("tests.src."):
+            from file_watch import wait_for_file
+        else:
+            from .file_watch import wait_for_file
+
+        return wait_for_file(path, timeout)
+
+    @staticmethod
+    def run_process(cmd: List[str], check: bool = True) -> Tuple[stdout, stderr]:
+        """Runs cmd, a list of arguments, without a shell. A command that cannot be
+        found is reported like the shell would, with exit status 127.
+        """
+        executable = resolve_executable(cmd[0])
+        if executable is None:
+            error = "{}: command not found".format(cmd[0])
+            if check:
+                raise subprocess.CalledProcessError(127, cmd, b"", error.encode())
+            return "", error
+        # with an absolute executable and close_fds off, python spawns the process
+        # with posix_spawn (vfork + exec) instead of forking the interpreter. The
+        # profile opens all of its files close-on-exec, so nothing leaks to the child
         completed_process = subprocess.run(
-            cmd, check=check, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            cmd,
+            executable=executable,
+            check=check,
+            close_fds=False,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
         )
         return (
             completed_process.stdout.decode().strip(),
@@ -59,21 +149,50 @@ class OSLayer:
 
     @staticmethod
     def tail(path: str, num_lines: int = 10) -> List[bytes]:
+        """Returns the last num_lines lines of path, like tail -n num_lines.
+        The file is read backwards from its end in TAIL_BLOCK_SIZE blocks, so the
+        cost does not depend on the size of the file.
+        """
         if not Path(path).exists():
             # allow for filesystem latency
             time.sleep(CookieCutter.get_latency_wait())
             if not Path(path).exists():
                 raise FileNotFoundError("{} does not exist.".format(path))
 
-        process = subprocess.Popen(
-            ["tail", "-n", str(num_lines), path],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        exit_code = process.wait()
-        if exit_code != 0:
+        if not isinstance(num_lines, int) or num_lines < 0:
             raise TailError(
-                "Failed to execute the tail command on the file {} due to the "
-                "following error:\n{}".format(path, process.stderr.read().decode())
+                "Invalid number of lines to tail {}: {}".format(path, num_lines)
             )
-        return process.stdout.readlines()
+        if num_lines == 0:
+            return []
+
+        blocks = []
+        newlines = 0
+        try:
+            with open(path, "rb") as stream:
+                position = stream.seek(0, os.SEEK_END)
+                # one newline more than lines requested guarantees the first line
+                # we return is complete
+                while position > 0 and newlines <= num_lines:
+                    block_size = min(TAIL_BLOCK_SIZE, position)
+                    position -= block_size
+                    stream.seek(position)
+                    block = stream.read(block_size)
+                    newlines += block.count(b"\n")
+                    blocks.append(block)
+        except OSError as error:
+            raise TailError(
+                "Failed to tail the file {} due to the following error:\n{}".format(
+                    path, error
+                )
+            )
+
+        data = b"".join(reversed(blocks))
+        if not data:
+            return []
+        lines = [line + b"\n" for line in data.split(b"\n")]
+        if data.endswith(b"\n"):
+            lines.pop()
+        else:
+            lines[-1] = lines[-1][:-1]
+        return lines[-num_lines:]
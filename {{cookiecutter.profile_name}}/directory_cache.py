@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer
+else:
+    from .OSLayer import OSLayer
+
+# forgotten all at once when exceeded, so a long-lived process stays small
+MAX_ENTRIES = 100000
+
+
+class DirectoryCache:
+    """
+    Remembers the directories a long-running process (the submit broker) has made,
+    so jobs sharing a log directory do not each ask the filesystem for it again.
+    The directory is only assumed to exist for the lifetime of the process.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._known = set()
+
+    def __contains__(self, directory: Path) -> bool:
+        return directory in self._known
+
+    def mkdir(self, directory: Path):
+        if directory in self._known:
+            return
+        OSLayer.mkdir(directory)
+        if len(self._known) >= self.max_entries:
+            self._known.clear()
+        self._known.add(directory)
@@ -0,0 +1,135 @@
+import ctypes
+import os
+import select
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import List, Union
+
+# from <sys/inotify.h>
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+# bounds of the exponential backoff between existence checks
+MIN_POLL_INTERVAL = 0.001
+MAX_POLL_INTERVAL = 0.5
+
+_libc = None
+
+
+class InotifyUnavailable(Exception):
+    pass
+
+
+def _load_libc() -> ctypes.CDLL:
+    global _libc
+    if _libc is None:
+        # the symbols of the running interpreter include libc; find_library would
+        # start a subprocess
+        libc = ctypes.CDLL(None, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise InotifyUnavailable("libc has no inotify support")
+        libc.inotify_add_watch.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint32,
+        ]
+        _libc = libc
+    return _libc
+
+
+class DirectoryWatch:
+    """
+    An inotify watch reporting the names of entries created in, or moved into, a
+    directory. Creations by other hosts on network filesystems such as NFS are not
+    reported.
+    """
+
+    def __init__(self, directory: Union[str, Path]):
+        libc = _load_libc()
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise InotifyUnavailable(os.strerror(ctypes.get_errno()))
+        watch = libc.inotify_add_watch(
+            self.fd, os.fsencode(str(directory)), IN_CREATE | IN_MOVED_TO
+        )
+        if watch < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise InotifyUnavailable(os.strerror(error))
+
+    def __enter__(self) -> "DirectoryWatch":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def wait(self, timeout: float) -> List[str]:
+        """Waits up to timeout seconds for entries to appear and returns their
+        names."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            start = offset + EVENT_HEADER.size
+            offset = start + length
+            names.append(os.fsdecode(data[start:offset].rstrip(b"\0")))
+        return names
+
+
+def wait_for_file(path: Union[str, Path], timeout: float) -> bool:
+    """Waits up to timeout seconds for path to exist and returns whether it does.
+
+    Where inotify is available the parent directory is watched, so a file created
+    on this host is seen as soon as it appears. Existence is also checked with an
+    exponential backoff from MIN_POLL_INTERVAL to MAX_POLL_INTERVAL seconds, which
+    is all that is done without inotify and catches files created by other hosts
+    on network filesystems.
+    """
+    path = Path(path)
+    if path.exists():
+        return True
+
+    deadline = time.monotonic() + timeout
+    watch = None
+    try:
+        watch = DirectoryWatch(path.parent)
+    except (InotifyUnavailable, OSError):
+        pass
+
+    try:
+        interval = MIN_POLL_INTERVAL
+        # checked again after the watch is set up, in case the file appeared before
+        while not path.exists():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if watch is not None:
+                if path.name in watch.wait(min(interval, remaining)):
+                    return True
+            else:
+                time.sleep(min(interval, remaining))
+            interval = min(2 * interval, MAX_POLL_INTERVAL)
+        return True
+    finally:
+        if watch is not None:
+            # closing an inotify instance waits for a kernel grace period of several
+            # milliseconds, which the caller need not wait for
+            threading.Thread(target=watch.close, daemon=True).start()
@@ -0,0 +1,379 @@
+import json
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer
+else:
+    from .OSLayer import OSLayer
+
+REGISTRY_NAME = "jobs.sqlite"
+
+RUNNING = "running"
+SUCCESS = "success"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINAL_STATES = (SUCCESS, FAILED, CANCELLED)
+# jobids per query, well below SQLite's limit on the parameters of a statement
+QUERY_CHUNK_SIZE = 500
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        jobid TEXT PRIMARY KEY,
+        rule TEXT,
+        wildcards TEXT,
+        resources TEXT,
+        outlog TEXT,
+        errlog TEXT,
+        submit_time REAL,
+        state TEXT,
+        lsf_stat TEXT,
+        updated_at REAL,
+        started_at REAL,
+        finished_at REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state)",
+    """
+    CREATE TABLE IF NOT EXISTS usage (
+        jobid TEXT PRIMARY KEY,
+        rule TEXT,
+        wildcards TEXT,
+        succeeded INTEGER,
+        max_mem_mb REAL,
+        run_time REAL,
+        cpu_time REAL,
+        recorded_at REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS usage_rule ON usage (rule, succeeded, recorded_at)",
+    """
+    CREATE TABLE IF NOT EXISTS predictions (
+        jobid TEXT PRIMARY KEY,
+        mem_mb REAL,
+        run_limit REAL
+    )
+    """,
+)
+USAGE_FIELDS = ("max_mem_mb", "run_time", "cpu_time")
+
+UPDATE_STATE = (
+    "UPDATE jobs SET state = ?, lsf_stat = coalesce(?, lsf_stat), updated_at = ?, "
+    "started_at = coalesce(started_at, CASE WHEN ? = 'RUN' THEN ? END), "
+    "finished_at = coalesce(finished_at, CASE WHEN ? IN (?, ?, ?) THEN ? END) "
+    "WHERE jobid = ? AND (state IS NOT ? OR lsf_stat IS NOT coalesce(?, lsf_stat))"
+)
+
+RegisteredJob = namedtuple(
+    "RegisteredJob",
+    [
+        "jobid",
+        "rule",
+        "wildcards",
+        "resources",
+        "outlog",
+        "errlog",
+        "submit_time",
+        "state",
+        "lsf_stat",
+        "updated_at",
+        "started_at",
+        "finished_at",
+    ],
+)
+RegisteredJob.__doc__ = """One submitted job. wildcards and resources are dicts, times
+are seconds since the epoch and are None until the job reached that point."""
+
+JobRuntime = namedtuple(
+    "JobRuntime",
+    [
+        "rule",
+        "resources",
+        "run_limit",
+        "submit_time",
+        "started_at",
+        "finished_at",
+        "run_time",
+        "succeeded",
+    ],
+)
+JobRuntime.__doc__ = """When a finished job was submitted, started and finished, how
+long it ran (seconds) and the run limit (minutes) predicted for it, if any."""
+
+
+def _matches(wildcards: dict, pattern: dict) -> bool:
+    return all(
+        str(wildcards.get(name)) == str(value) for name, value in pattern.items()
+    )
+
+
+class JobRegistry:
+    """
+    SQLite database of every job the profile submitted, shared by the submit, status
+    and cancel scripts of a workflow. The database runs in WAL mode so status
+    checks read while other processes write, and every write is a single short
+    transaction that waits up to timeout seconds for the write lock. The registry
+    is bookkeeping only: errors are reported on stderr and never fail a submission
+    or status check.
+    """
+
+    def __init__(self, path: Optional[Path] = None, timeout: float = 60.0):
+        if path is None:
+            path = OSLayer.state_dir() / REGISTRY_NAME
+        self.path = Path(path)
+        self.timeout = timeout
+        self._connection = None
+        # the connection may be shared by the threads of a long-running process
+        self._lock = threading.RLock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            # autocommit mode; transactions are opened explicitly with BEGIN
+            connection = sqlite3.connect(
+                str(self.path),
+                timeout=self.timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute(
+                "PRAGMA busy_timeout = {}".format(int(self.timeout * 1000))
+            )
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._connection = connection
+        return self._connection
+
+    def _write(self, statement: str, *parameters: tuple):
+        """Runs statement once per parameter tuple in a single transaction."""
+        self._write_all((statement, parameters))
+
+    def _write_all(self, *statements: Tuple[str, Iterable[tuple]]):
+        """Runs every statement once per parameter tuple paired with it, all in a
+        single transaction."""
+        with self._lock:
+            try:
+                connection = self.connection
+                # take the write lock up front so a reader never has to upgrade
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    for statement, parameters in statements:
+                        connection.executemany(statement, parameters)
+                except BaseException:
+                    connection.execute("ROLLBACK")
+                    raise
+                connection.execute("COMMIT")
+            except sqlite3.Error as error:
+                OSLayer.eprint("[job registry] write failed: {}".format(error))
+
+    def _read(self, statement: str, parameters: tuple = ()) -> List[tuple]:
+        with self._lock:
+            try:
+                return self.connection.execute(statement, parameters).fetchall()
+            except sqlite3.Error as error:
+                OSLayer.eprint("[job registry] read failed: {}".format(error))
+                return []
+
+    def record_submission(
+        self,
+        jobid: int,
+        rule: str,
+        wildcards: dict,
+        resources: dict,
+        outlog: Path,
+        errlog: Path,
+        submit_time: Optional[float] = None,
+    ):
+        if submit_time is None:
+            submit_time = time.time()
+        # LSF reuses jobids eventually, so a new submission replaces the old job,
+        # and the usage and predictions of that job must not count for the new one
+        self._write_all(
+            ("DELETE FROM usage WHERE jobid = ?", [(str(jobid),)]),
+            ("DELETE FROM predictions WHERE jobid = ?", [(str(jobid),)]),
+            (
+                "INSERT OR REPLACE INTO jobs (jobid, rule, wildcards, resources, "
+                "outlog, errlog, submit_time, state, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        str(jobid),
+                        rule,
+                        json.dumps(wildcards, sort_keys=True, default=str),
+                        json.dumps(resources, sort_keys=True, default=str),
+                        str(outlog),
+                        str(errlog),
+                        submit_time,
+                        RUNNING,
+                        submit_time,
+                    )
+                ],
+            ),
+        )
+
+    def update_state(self, jobid: int, state: str, lsf_stat: Optional[str] = None):
+        """Records the latest status of jobid. The first time LSF reports the job as
+        RUN sets started_at and the first final state sets finished_at. Most checks
+        find the job unchanged, so the row is compared under a plain read first and
+        the write lock is only taken when there is something to write.
+        """
+        rows = self._read(
+            "SELECT state, lsf_stat FROM jobs WHERE jobid = ?", (str(jobid),)
+        )
+        if not rows:
+            return
+        current_state, current_lsf_stat = rows[0]
+        if state == current_state and lsf_stat in (None, current_lsf_stat):
+            return
+        self._write(UPDATE_STATE, self._update_parameters(jobid, state, lsf_stat))
+
+    @staticmethod
+    def _update_parameters(jobid: int, state: str, lsf_stat: Optional[str]) -> tuple:
+        now = time.time()
+        return (
+            (state, lsf_stat, now, lsf_stat, now, state)
+            + FINAL_STATES
+            + (now, str(jobid), state, lsf_stat)
+        )
+
+    def get(self, jobid: int) -> Optional[RegisteredJob]:
+        rows = self._read(
+            "SELECT {} FROM jobs WHERE jobid = ?".format(
+                ", ".join(RegisteredJob._fields)
+            ),
+            (str(jobid),),
+        )
+        if not rows:
+            return None
+        job = RegisteredJob(*rows[0])
+        return job._replace(
+            wildcards=json.loads(job.wildcards or "{}"),
+            resources=json.loads(job.resources or "{}"),
+        )
+
+    def active_jobids(self) -> List[str]:
+        """Jobids of all jobs that have not reached a final state."""
+        rows = self._read(
+            "SELECT jobid FROM jobs WHERE state NOT IN (?, ?, ?) ORDER BY submit_time",
+            FINAL_STATES,
+        )
+        return [jobid for jobid, in rows]
+
+    def without_finished(self, jobids: Iterable[str]) -> List[str]:
+        """Drops the jobids the registry knows to be in a final state."""
+        jobids = [str(jobid) for jobid in jobids]
+        finished = set()
+        # SQLite limits the number of parameters of a statement (999 before 3.32)
+        for start in range(0, len(jobids), QUERY_CHUNK_SIZE):
+            end = start + QUERY_CHUNK_SIZE
+            chunk = jobids[start:end]
+            finished.update(
+                jobid
+                for jobid, in self._read(
+                    "SELECT jobid FROM jobs "
+                    "WHERE state IN (?, ?, ?) AND jobid IN ({})".format(
+                        ", ".join("?" * len(chunk))
+                    ),
+                    FINAL_STATES + tuple(chunk),
+                )
+            )
+        return [jobid for jobid in jobids if jobid not in finished]
+
+    def mark_cancelled(self, jobids: Iterable[str]):
+        self._write(
+            UPDATE_STATE,
+            *(self._update_parameters(jobid, CANCELLED, None) for jobid in jobids),
+        )
+
+    def record_usage(
+        self,
+        jobid: int,
+        succeeded: bool,
+        max_mem_mb: Optional[float] = None,
+        run_time: Optional[float] = None,
+        cpu_time: Optional[float] = None,
+    ):
+        """Adds the resource usage of a finished job to the usage history of its
+        rule. Jobs the registry does not know are ignored."""
+        self._write(
+            "INSERT OR REPLACE INTO usage (jobid, rule, wildcards, succeeded, "
+            "max_mem_mb, run_time, cpu_time, recorded_at) "
+            "SELECT jobid, rule, wildcards, ?, ?, ?, ?, ? FROM jobs WHERE jobid = ?",
+            (int(succeeded), max_mem_mb, run_time, cpu_time, time.time(), str(jobid)),
+        )
+
+    def usage_history(
+        self,
+        rule: str,
+        field: str,
+        limit: int = 100,
+        wildcards: Optional[dict] = None,
+    ) -> List[float]:
+        """The given usage field of the latest limit successful jobs of rule that
+        reported it, newest first. If wildcards is given, only jobs with these
+        wildcard values are taken into account."""
+        if field not in USAGE_FIELDS:
+            raise ValueError("Unknown usage field: {}".format(field))
+        rows = self._read(
+            "SELECT {field}, wildcards FROM usage "
+            "WHERE rule = ? AND succeeded AND {field} IS NOT NULL "
+            "ORDER BY recorded_at DESC{limit}".format(
+                field=field, limit="" if wildcards else " LIMIT ?"
+            ),
+            (rule,) if wildcards else (rule, limit),
+        )
+        if wildcards:
+            rows = [
+                row for row in rows if _matches(json.loads(row[1] or "{}"), wildcards)
+            ][:limit]
+        return [value for value, _ in rows]
+
+    def record_predictions(
+        self,
+        jobid: int,
+        mem_mb: Optional[float] = None,
+        run_limit: Optional[float] = None,
+    ):
+        """Records the memory (MB) and run limit (minutes) predicted for jobid."""
+        self._write(
+            "INSERT OR REPLACE INTO predictions (jobid, mem_mb, run_limit) "
+            "VALUES (?, ?, ?)",
+            (str(jobid), mem_mb, run_limit),
+        )
+
+    def runtime_history(self) -> List[JobRuntime]:
+        """Every job with recorded usage, ordered by rule and submission."""
+        rows = self._read(
+            "SELECT jobs.rule, jobs.resources, predictions.run_limit, "
+            "jobs.submit_time, jobs.started_at, jobs.finished_at, usage.run_time, "
+            "usage.succeeded "
+            "FROM jobs JOIN usage ON usage.jobid = jobs.jobid "
+            "LEFT JOIN predictions ON predictions.jobid = jobs.jobid "
+            "ORDER BY jobs.rule, jobs.submit_time"
+        )
+        return [
+            JobRuntime(*row)._replace(
+                resources=json.loads(row[1] or "{}"), succeeded=bool(row[7])
+            )
+            for row in rows
+        ]
+
+    def finished_without_usage(self) -> List[tuple]:
+        """(jobid, outlog, succeeded) of every finished job without recorded
+        usage."""
+        rows = self._read(
+            "SELECT jobid, outlog, state = ? FROM jobs "
+            "WHERE state IN (?, ?) "
+            "AND jobid NOT IN (SELECT jobid FROM usage) ORDER BY submit_time",
+            (SUCCESS, SUCCESS, FAILED),
+        )
+        return [(jobid, outlog, bool(succeeded)) for jobid, outlog, succeeded in rows]
@@ -0,0 +1,9 @@
+#!/bin/sh
+# Runs the jobscript of one element of a job array submitted by lsf_batch_submit.py.
+# $1 lists one jobscript per line; line N belongs to array index N.
+jobscript="$(sed -n "${LSB_JOBINDEX}p" "$1")"
+if [ -z "$jobscript" ]; then
+    echo "[lsf profile error] No jobscript for array index ${LSB_JOBINDEX} in $1" >&2
+    exit 1
+fi
+exec "$jobscript"
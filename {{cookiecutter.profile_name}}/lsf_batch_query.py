@@ -0,0 +1,223 @@
+import json
+import re
+import sys
+from collections import namedtuple
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer
+    from memory_units import Unit, Memory
+else:
+    from .OSLayer import OSLayer
+    from .memory_units import Unit, Memory
+
+
+class InvalidBjobsOutput(Exception):
+    pass
+
+
+# LSF states a job never leaves once it has reached them
+TERMINAL_STATS = frozenset(("DONE", "EXIT", "POST_DONE", "POST_ERR"))
+
+HISTORY_COMMANDS = ("bhist", "bacct")
+DONE_EVENT = re.compile(r"Done successfully|Completed <done>")
+EXIT_EVENT = re.compile(r"Exited with exit code|Exited by signal|Completed <exit>")
+# any other sign that a job ended, in wordings DONE_EVENT and EXIT_EVENT miss
+END_EVENT = re.compile(r"Completed <|Done|Exited|exit code|TERM_\w+|[Kk]illed")
+# events of jobs that are still pending or running
+ACTIVE_EVENT = re.compile(
+    r"Submitted from host|Dispatched|Starting|Running|Pending|Suspended|Resumed"
+)
+
+BJOBS_FIELDS = (
+    "jobid",
+    "jobindex",
+    "stat",
+    "exit_code",
+    "pend_reason",
+    "max_mem",
+    "run_time",
+)
+
+JobRecord = namedtuple(
+    "JobRecord",
+    ["jobid", "stat", "exit_code", "pend_reason", "max_mem_mb", "run_time"],
+)
+JobRecord.__doc__ = """One job as reported by bjobs. The jobid of an array element is
+"jobid[index]". exit_code, max_mem_mb and run_time (in seconds) are None when LSF does
+not report them (yet)."""
+
+
+def bjobs_query_cmd(jobids: Iterable[str]) -> List[str]:
+    return ["bjobs", "-json", "-o", " ".join(BJOBS_FIELDS)] + [
+        str(jobid) for jobid in jobids
+    ]
+
+
+def bjobs_group_query_cmd(group: str) -> List[str]:
+    # -a includes the jobs of the group that finished recently
+    return ["bjobs", "-json", "-o", " ".join(BJOBS_FIELDS), "-a", "-g", group]
+
+
+def _parse_int(value: str) -> Optional[int]:
+    match = re.match(r"\s*(-?\d+)", value)
+    return int(match.group(1)) if match else None
+
+
+def _parse_mem_mb(value: str) -> Optional[float]:
+    """Converts LSF memory strings such as "2 Mbytes" or "1.5 Gbytes" to MB."""
+    match = re.match(r"\s*([0-9]*\.?[0-9]+)\s*([KMGTPE]?)bytes", value, re.IGNORECASE)
+    if not match:
+        return None
+    size, prefix = match.groups()
+    memory = Memory.from_str("{}{}".format(size, prefix or "B"))
+    return memory.to(Unit.MEGA).value
+
+
+def parse_job_record(fields: Dict[str, str]) -> JobRecord:
+    """Builds a JobRecord from one element of the RECORDS list of bjobs -json."""
+    jobid = fields["JOBID"]
+    jobindex = fields.get("JOBINDEX", "").strip()
+    if jobindex not in ("", "0", "-"):
+        jobid = "{}[{}]".format(jobid, jobindex)
+    return JobRecord(
+        jobid=jobid,
+        stat=fields.get("STAT", ""),
+        exit_code=_parse_int(fields.get("EXIT_CODE", "")),
+        pend_reason=fields.get("PEND_REASON", "").strip(),
+        max_mem_mb=_parse_mem_mb(fields.get("MAX_MEM", "")),
+        run_time=_parse_int(fields.get("RUN_TIME", "")),
+    )
+
+
+def parse_bjobs_output(output_stream: str) -> Dict[str, JobRecord]:
+    """Parses the output of bjobs_query_cmd into a jobid -> JobRecord mapping. Jobs
+    bjobs reports an error for (e.g. "Job <123> is not found") are left out.
+    """
+    try:
+        records = json.loads(output_stream).get("RECORDS", [])
+    except (ValueError, AttributeError) as error:
+        raise InvalidBjobsOutput("{}\n{}".format(error, output_stream))
+
+    job_records = dict()
+    for fields in records:
+        if "ERROR" in fields or "JOBID" not in fields:
+            continue
+        record = parse_job_record(fields)
+        job_records[record.jobid] = record
+    return job_records
+
+
+def query_bjobs_batch(
+    jobids: Iterable[str], group: Optional[str] = None
+) -> Dict[str, JobRecord]:
+    """Queries all jobids with a single bjobs call. With a job group, the whole group
+    is queried instead of listing the jobids, and the records of the jobids are
+    returned.
+    """
+    jobids = list(jobids)
+    if not jobids:
+        return dict()
+    cmd = bjobs_query_cmd(jobids) if group is None else bjobs_group_query_cmd(group)
+    # bjobs exits non-zero as soon as one of the jobs is not found
+    output_stream, error_stream = OSLayer.run_process(cmd, check=False)
+    if not output_stream.strip():
+        return dict()
+    try:
+        records = parse_bjobs_output(output_stream)
+    except InvalidBjobsOutput as error:
+        OSLayer.eprint("Invalid bjobs output: {}\n{}".format(error, error_stream))
+        return dict()
+    if group is not None:
+        requested = set(str(jobid) for jobid in jobids)
+        records = {
+            jobid: record for jobid, record in records.items() if jobid in requested
+        }
+    return records
+
+
+def query_output_files(jobids: Iterable[str]) -> Dict[str, str]:
+    """Returns an output file -> jobid mapping for jobids, from one bjobs call."""
+    output_stream, _ = OSLayer.run_process(
+        ["bjobs", "-json", "-o", "jobid output_file"]
+        + [str(jobid) for jobid in jobids],
+        check=False,
+    )
+    try:
+        records = json.loads(output_stream).get("RECORDS", [])
+    except (ValueError, AttributeError):
+        return dict()
+    return {
+        fields["OUTPUT_FILE"]: fields["JOBID"]
+        for fields in records
+        if fields.get("OUTPUT_FILE") and "JOBID" in fields
+    }
+
+
+def history_query_cmd(command: str, jobids: Iterable[str]) -> List[str]:
+    return [command, "-l"] + [str(jobid) for jobid in jobids]
+
+
+def parse_history_output(output_stream: str, command: str = "bhist") -> Dict[str, str]:
+    """Parses the long format of bhist or bacct into a jobid -> stat mapping. bhist
+    jobs that are pending or running, with no sign of an end, are reported as RUN.
+    Jobs that ended in a way the parser does not recognise are left out, so the
+    caller falls back to the next source; bacct only lists jobs that ended.
+    """
+    # long lines are wrapped at 80 characters and continued after 21 spaces
+    unwrapped = re.sub(r"\n {21}", "", output_stream)
+    statuses = dict()
+    for block in re.split(r"^-{10,}\s*$", unwrapped, flags=re.MULTILINE):
+        match = re.search(r"Job <(\d+(?:\[\d+\])?)>", block)
+        if not match:
+            continue
+        done = [m.end() for m in DONE_EVENT.finditer(block)]
+        exited = [m.end() for m in EXIT_EVENT.finditer(block)]
+        # the events follow the line naming the job and its command
+        events = block.split(match.group(0), 1)[1].partition("\n")[2]
+        if done or exited:
+            stat = "DONE" if max(done, default=-1) > max(exited, default=-1) else "EXIT"
+        elif (
+            command == "bhist"
+            and ACTIVE_EVENT.search(events)
+            and not END_EVENT.search(events)
+        ):
+            stat = "RUN"
+        else:
+            continue
+        statuses[match.group(1)] = stat
+    return statuses
+
+
+def query_history_batch(jobids: Iterable[str]) -> Dict[str, str]:
+    """Looks jobids up in the LSF event history, which still knows jobs that have
+    been cleaned from mbatchd memory. bhist is asked first and bacct only for the
+    jobs bhist does not know; each command runs once for all jobs.
+    """
+    unresolved = [str(jobid) for jobid in jobids]
+    statuses = dict()
+    for command in HISTORY_COMMANDS:
+        if not unresolved:
+            break
+        output_stream, _ = OSLayer.run_process(
+            history_query_cmd(command, unresolved), check=False
+        )
+        statuses.update(parse_history_output(output_stream, command))
+        unresolved = [jobid for jobid in unresolved if jobid not in statuses]
+    return statuses
+
+
+def query_records_batch(
+    jobids: Iterable[str], group: Optional[str] = None
+) -> Dict[str, JobRecord]:
+    """Queries jobids with one bjobs call, of the job group if one is given, and
+    resolves the jobs bjobs no longer knows with one history lookup.
+    """
+    jobids = [str(jobid) for jobid in jobids]
+    records = query_bjobs_batch(jobids, group)
+    missing = [jobid for jobid in jobids if jobid not in records]
+    for jobid, stat in query_history_batch(missing).items():
+        records[jobid] = JobRecord(jobid, stat, None, "", None, None)
+    return records
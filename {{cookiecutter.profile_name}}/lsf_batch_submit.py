@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import os
+import re
+import shlex
+import sys
+import time
+import uuid
+from pathlib import Path
+from subprocess import CalledProcessError
+from typing import List, Optional, Tuple
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer
+    from CookieCutter import CookieCutter
+    from socket_service import spawn_detached
+    from lsf_status_cache import StatusCache
+    from job_registry import JobRegistry
+    from lsf_batch_query import query_output_files
+else:
+    from .OSLayer import OSLayer
+    from .CookieCutter import CookieCutter
+    from .socket_service import spawn_detached
+    from .lsf_status_cache import StatusCache
+    from .job_registry import JobRegistry
+    from .lsf_batch_query import query_output_files
+
+ARRAY = "array"
+PACK = "pack"
+MODES = (ARRAY, PACK)
+# pack mode puts every job into the same batch, whatever its bsub parameters
+PACK_KEY = "pack"
+
+DIRECTORY_NAME = "batches"
+LOG_NAME = "batch_submit.log"
+DISPATCHER = Path(__file__).parent.absolute() / "lsf_array_dispatch.sh"
+SUBMITTED = re.compile(r"Job <(\d+)> is submitted")
+BATCH_ELEMENT = re.compile(r"(batch-[0-9a-f]+)\[(\d+)\]")
+# how long the flusher of a batch may take before the batch is considered lost
+FLUSH_TIMEOUT = 300.0
+# seconds after which the files of a batch are deleted
+RETENTION = 7 * 24 * 60 * 60
+POLL_INTERVAL = 0.05
+
+
+class BatchSubmissionError(Exception):
+    pass
+
+
+def batch_key(rule_name: str, submit_params: List[str]) -> str:
+    """Jobs with the same key can be submitted together."""
+    key = json.dumps([rule_name] + submit_params)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def element_id(batch_id: str, index: int) -> str:
+    return "{}[{}]".format(batch_id, index)
+
+
+def parse_element_id(external_id: str) -> Optional[Tuple[str, int]]:
+    """Returns (batch_id, index) if external_id names a job of a batch."""
+    match = BATCH_ELEMENT.fullmatch(external_id)
+    if not match:
+        return None
+    return match.group(1), int(match.group(2))
+
+
+class SubmissionSpool:
+    """
+    Collects jobs that can be submitted together into batches. The first job added
+    for a key opens a batch, later jobs with the same key join it until it is closed
+    or holds max_size jobs. Each job gets its 1-based index in the batch straight
+    away, so the submit script can return without waiting for the batch to be
+    submitted; the outcome is published in a result file once it is.
+
+    All files live in one directory: <key>.open names the open batch of a key,
+    <batch_id>.spool holds one JSON entry per job, <batch_id>.result the outcome.
+    """
+
+    def __init__(self, directory: Optional[Path] = None):
+        if directory is None:
+            directory = OSLayer.state_dir() / DIRECTORY_NAME
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _lock_path(self, key: str) -> Path:
+        return self.directory / "{}.lock".format(key)
+
+    def _open_path(self, key: str) -> Path:
+        return self.directory / "{}.open".format(key)
+
+    def spool_path(self, batch_id: str) -> Path:
+        return self.directory / "{}.spool".format(batch_id)
+
+    def result_path(self, batch_id: str) -> Path:
+        return self.directory / "{}.result".format(batch_id)
+
+    def jobscripts_path(self, batch_id: str) -> Path:
+        return self.directory / "{}.jobscripts".format(batch_id)
+
+    def pack_path(self, batch_id: str) -> Path:
+        return self.directory / "{}.pack".format(batch_id)
+
+    def _open_batch(self, key: str) -> Optional[str]:
+        try:
+            return self._open_path(key).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _count(self, batch_id: str) -> int:
+        with self.spool_path(batch_id).open() as stream:
+            return sum(1 for line in stream if line.strip())
+
+    def entries(self, batch_id: str) -> List[dict]:
+        try:
+            with self.spool_path(batch_id).open() as stream:
+                return [json.loads(line) for line in stream if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def add(self, key: str, entry: dict, max_size: int) -> Tuple[str, int, bool]:
+        """Adds entry to the open batch of key, opening a new batch if there is none.
+        Returns the batch id, the index of the entry and whether a batch was opened.
+        """
+        with OSLayer.file_lock(self._lock_path(key)):
+            batch_id = self._open_batch(key)
+            opened = batch_id is None
+            if opened:
+                self.prune()
+                batch_id = "batch-{}".format(uuid.uuid4().hex)
+                self._open_path(key).write_text(batch_id)
+            with self.spool_path(batch_id).open("a") as stream:
+                stream.write(json.dumps(entry) + "\n")
+            index = self._count(batch_id)
+            if index >= max_size:
+                self._open_path(key).unlink()
+        return batch_id, index, opened
+
+    def is_open(self, key: str, batch_id: str) -> bool:
+        return self._open_batch(key) == batch_id
+
+    def close(self, key: str, batch_id: str) -> List[dict]:
+        """Stops batch_id from taking new jobs and returns its entries."""
+        with OSLayer.file_lock(self._lock_path(key)):
+            if self.is_open(key, batch_id):
+                self._open_path(key).unlink()
+            return self.entries(batch_id)
+
+    def publish(self, batch_id: str, result: dict):
+        path = self.result_path(batch_id)
+        tmp_path = path.with_name("{}.{}.tmp".format(path.name, os.getpid()))
+        tmp_path.write_text(json.dumps(result))
+        os.replace(str(tmp_path), str(path))
+
+    def result(self, batch_id: str) -> Optional[dict]:
+        try:
+            return json.loads(self.result_path(batch_id).read_text())
+        except FileNotFoundError:
+            return None
+
+    def resolve(self, batch_id: str, index: int) -> Optional[str]:
+        """Returns the LSF jobid of the index-th job of batch_id, or None if the batch
+        has not been submitted yet. Raises BatchSubmissionError if the submission
+        failed or its flusher died.
+        """
+        result = self.result(batch_id)
+        if result is None:
+            try:
+                age = time.time() - self.spool_path(batch_id).stat().st_mtime
+            except FileNotFoundError:
+                raise BatchSubmissionError("Unknown batch {}".format(batch_id))
+            if age > FLUSH_TIMEOUT:
+                raise BatchSubmissionError(
+                    "{} was not submitted within {} seconds".format(
+                        batch_id, FLUSH_TIMEOUT
+                    )
+                )
+            return None
+        if "error" in result:
+            raise BatchSubmissionError(result["error"])
+        jobid = result["jobids"][index - 1]
+        if jobid is None:
+            raise BatchSubmissionError(
+                "{} was not submitted: {}".format(
+                    element_id(batch_id, index), result.get("bsub_errors", "")
+                )
+            )
+        return jobid
+
+    def wait_for_jobid(self, batch_id: str, index: int, timeout: float) -> str:
+        deadline = time.time() + timeout
+        while True:
+            jobid = self.resolve(batch_id, index)
+            if jobid is not None:
+                return jobid
+            if time.time() > deadline:
+                raise BatchSubmissionError(
+                    "Timed out waiting for {} to be submitted".format(batch_id)
+                )
+            time.sleep(POLL_INTERVAL)
+
+    def prune(self):
+        """Deletes the files of batches older than RETENTION."""
+        now = time.time()
+        for path in self.directory.iterdir():
+            if path.suffix not in (".spool", ".result", ".jobscripts", ".pack"):
+                continue
+            try:
+                if now - path.stat().st_mtime > RETENTION:
+                    path.unlink()
+            except FileNotFoundError:  # pruned by a concurrent process
+                pass
+
+    def start_flusher(self, key: str, batch_id: str, window: float, mode: str):
+        argv = [
+            sys.executable,
+            str(Path(__file__).absolute()),
+            str(self.directory),
+            key,
+            batch_id,
+            str(window),
+            mode,
+        ]
+        spawn_detached(argv, log=self.directory / LOG_NAME)
+
+
+def _submit(cmd: List[str]) -> str:
+    output_stream, _ = OSLayer.run_process(cmd)
+    match = SUBMITTED.search(output_stream)
+    if not match:
+        raise BatchSubmissionError("No jobid in bsub output: {}".format(output_stream))
+    return match.group(1)
+
+
+def _link_log(log: str, target: Path):
+    log = Path(log)
+    if os.path.lexists(str(log)):
+        log.unlink()
+    log.symlink_to(target)
+
+
+def submit_array(spool: SubmissionSpool, batch_id: str, entries: List[dict]) -> str:
+    """Submits entries as one job array whose elements run the jobscripts through
+    the dispatcher. The log of each element is linked from the log file path of its
+    job. Returns the jobid of the array.
+    """
+    jobscripts_path = spool.jobscripts_path(batch_id).absolute()
+    jobscripts_path.write_text(
+        "".join("{}\n".format(Path(entry["jobscript"]).absolute()) for entry in entries)
+    )
+    array_logdir = Path(entries[0]["array_logdir"]) / batch_id
+    OSLayer.mkdir(array_logdir)
+    cmd = (
+        ["bsub"]
+        + entries[0]["params"]
+        + ["-o", str(array_logdir / "%I.out"), "-e", str(array_logdir / "%I.err")]
+        + ["-J", "{}[1-{}]".format(entries[0]["array_name"], len(entries))]
+        + [str(DISPATCHER), str(jobscripts_path)]
+    )
+    jobid = _submit(cmd)
+    for index, entry in enumerate(entries, start=1):
+        _link_log(entry["outlog"], (array_logdir / "{}.out".format(index)).absolute())
+        _link_log(entry["errlog"], (array_logdir / "{}.err".format(index)).absolute())
+    return jobid
+
+
+def submit_pack(
+    spool: SubmissionSpool, batch_id: str, entries: List[dict]
+) -> Tuple[List[Optional[str]], str]:
+    """Submits the bsub command of every entry with a single bsub -pack call, so the
+    jobs look exactly as if they had been submitted one by one. Returns the jobid of
+    every entry, None for the ones LSF rejected, and the errors bsub reported.
+    """
+    pack_path = spool.pack_path(batch_id)
+    # a pack file holds the arguments of one bsub call per line, quoted like on a
+    # command line
+    pack_path.write_text(
+        "".join(
+            "{}\n".format(" ".join(shlex.quote(arg) for arg in entry["submit_cmd"][1:]))
+            for entry in entries
+        )
+    )
+    output_stream, error_stream = OSLayer.run_process(
+        ["bsub", "-pack", str(pack_path)], check=False
+    )
+    jobids = SUBMITTED.findall(output_stream)
+    if len(jobids) == len(entries):
+        return jobids, error_stream
+    if not jobids:
+        raise BatchSubmissionError(
+            "bsub -pack submitted no jobs: {}".format(error_stream or output_stream)
+        )
+
+    # some lines were rejected, so the order of the jobids no longer tells which
+    # job is which; every job has its own log file though
+    jobid_by_outlog = {
+        os.path.abspath(output_file): jobid
+        for output_file, jobid in query_output_files(jobids).items()
+    }
+    return (
+        [jobid_by_outlog.get(os.path.abspath(entry["outlog"])) for entry in entries],
+        error_stream,
+    )
+
+
+def flush(
+    spool: SubmissionSpool, key: str, batch_id: str, window: float, mode: str = ARRAY
+) -> Optional[List[Optional[str]]]:
+    """Waits up to window seconds for batch_id to fill up, then submits it as a job
+    array or a job pack and publishes the LSF jobid of every job. A batch with a
+    single job is submitted as a normal job. Returns the jobids, None for jobs LSF
+    rejected, or None if the submission failed altogether.
+    """
+    deadline = time.time() + window
+    while time.time() < deadline and spool.is_open(key, batch_id):
+        time.sleep(POLL_INTERVAL)
+    entries = spool.close(key, batch_id)
+
+    bsub_errors = ""
+    try:
+        if len(entries) == 1:
+            jobids = [_submit(entries[0]["submit_cmd"])]
+        elif mode == PACK:
+            jobids, bsub_errors = submit_pack(spool, batch_id, entries)
+        else:
+            jobid = submit_array(spool, batch_id, entries)
+            jobids = ["{}[{}]".format(jobid, i) for i in range(1, len(entries) + 1)]
+    except (CalledProcessError, BatchSubmissionError, OSError) as error:
+        OSLayer.eprint("[batch submit] {} failed: {}".format(batch_id, error))
+        spool.publish(batch_id, {"error": str(error)})
+        return None
+
+    spool.publish(batch_id, {"jobids": jobids, "bsub_errors": bsub_errors})
+    return jobids
+
+
+if __name__ == "__main__":
+    spool = SubmissionSpool(Path(sys.argv[1]))
+    key, batch_id, window, mode = sys.argv[2:6]
+    jobids = flush(spool, key, batch_id, float(window), mode)
+    if jobids is not None:
+        submitted = [
+            (jobid, entry)
+            for jobid, entry in zip(jobids, spool.entries(batch_id))
+            if jobid is not None
+        ]
+        status_cache_ttl = CookieCutter.get_status_cache_ttl()
+        if status_cache_ttl > 0:
+            status_cache = StatusCache(status_cache_ttl)
+            for jobid, entry in submitted:
+                status_cache.register_job(jobid, entry["jobscript"])
+        if CookieCutter.use_job_registry():
+            job_registry = JobRegistry()
+            for jobid, entry in submitted:
+                job_registry.record_submission(
+                    jobid,
+                    rule=entry["rule"],
+                    wildcards=entry["wildcards"],
+                    resources=entry["resources"],
+                    outlog=entry["outlog"],
+                    errlog=entry["errlog"],
+                )
+                if entry.get("predictions"):
+                    job_registry.record_predictions(jobid, **entry["predictions"])
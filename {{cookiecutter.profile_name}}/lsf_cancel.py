@@ -2,23 +2,191 @@
 import re
 import shlex
 import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import List
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional
 
 if not __name__.startswith("tests.src."):
     sys.path.append(str(Path(__file__).parent.absolute()))
     from OSLayer import OSLayer
+    from CookieCutter import CookieCutter
+    from retry_policy import RetryPolicy
+    from lsf_job_groups import group_kill_cmd, current_job_group
+    from lsf_batch_query import (
+        TERMINAL_STATS,
+        InvalidBjobsOutput,
+        bjobs_group_query_cmd,
+        parse_bjobs_output,
+    )
 else:
     from .OSLayer import OSLayer
+    from .CookieCutter import CookieCutter
+    from .retry_policy import RetryPolicy
+    from .lsf_job_groups import group_kill_cmd, current_job_group
+    from .lsf_batch_query import (
+        TERMINAL_STATS,
+        InvalidBjobsOutput,
+        bjobs_group_query_cmd,
+        parse_bjobs_output,
+    )
+
+if TYPE_CHECKING:
+    # the registry is only imported when it is enabled, to keep cancelling fast
+    from job_registry import JobRegistry
 
 KILL = "bkill"
+# how long to wait for a batch a job was added to to be submitted
+BATCH_TIMEOUT = 60.0
+JOBID = re.compile(r"\d+(\[\d+\])?|batch-[0-9a-f]+\[\d+\]")
+CHUNK_SIZE = 500
+WORKERS = 4
+
+# outcomes of bkill for one job
+KILLED = "killed"
+FINISHED = "finished"
+FAILED = "failed"
+# bkill reports on every job on a line of its own, on stdout or stderr, e.g.
+# "Job <123> is being terminated" or "Job <123[4]>: Job has already finished"
+BKILL_LINE = re.compile(r"^Job <([^>]+)>:? (.*)$", re.MULTILINE)
+KILLED_MESSAGES = ("is being terminated", "is being signaled", "in progress")
+FINISHED_MESSAGES = ("already finished", "No matching job found")
+
+CancelSummary = namedtuple("CancelSummary", ["killed", "finished", "failed"])
+CancelSummary.__doc__ = """The jobids bkill terminated, found already finished (or no
+longer knew) and could not kill."""
+
+
+def parse_bkill_output(output_stream: str) -> Dict[str, str]:
+    """Parses what bkill printed into a jobid -> outcome mapping. Jobs bkill does
+    not mention are left out."""
+    outcomes = dict()
+    for jobid, message in BKILL_LINE.findall(output_stream):
+        if any(killed in message for killed in KILLED_MESSAGES):
+            outcomes[jobid] = KILLED
+        elif any(finished in message for finished in FINISHED_MESSAGES):
+            outcomes[jobid] = FINISHED
+        else:
+            outcomes[jobid] = FAILED
+    return outcomes
+
+
+def chunked(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    iterator = iter(items)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
 
 
-def kill_jobs(ids_to_kill: List[str]):
+def group_holds_only(job_group: str, jobids: Iterable[str]) -> bool:
+    """Whether the job group holds every one of jobids and no other unfinished job,
+    so that killing the group kills nothing else. The current group belongs to the
+    run that submitted last, which need not be the run being cancelled."""
+    output_stream, _ = OSLayer.run_process(
+        bjobs_group_query_cmd(job_group), check=False
+    )
+    try:
+        records = parse_bjobs_output(output_stream)
+    except InvalidBjobsOutput:
+        return False
+    jobids = set(jobids)
+    unfinished = set(
+        jobid for jobid, record in records.items() if record.stat not in TERMINAL_STATS
+    )
+    return jobids <= set(records) and unfinished <= jobids
+
+
+def kill_chunk(jobids: List[str], retry_policy: RetryPolicy) -> Dict[str, str]:
+    """Runs bkill for jobids, and again for the jobs it failed to kill or did not
+    report on for as long as the retry policy allows."""
+    outcomes = dict()
+    remaining = jobids
+    for _ in retry_policy.attempts():
+        output_stream, error_stream = OSLayer.run_process(
+            [KILL] + remaining, check=False
+        )
+        reported = parse_bkill_output("{}\n{}".format(output_stream, error_stream))
+        for jobid in remaining:
+            outcomes[jobid] = reported.get(jobid, FAILED)
+        remaining = [jobid for jobid in remaining if outcomes[jobid] == FAILED]
+        if not remaining:
+            break
+    return outcomes
+
+
+def kill_jobs(
+    ids_to_kill: List[str],
+    job_registry: Optional["JobRegistry"] = None,
+    chunk_size: int = CHUNK_SIZE,
+    workers: int = WORKERS,
+    retry_policy: Optional[RetryPolicy] = None,
+    job_group: Optional[str] = None,
+) -> CancelSummary:
+    """Kills the jobs with one bkill per chunk_size jobs, running up to workers of
+    them at once, and prints a summary of the outcome. Without a retry policy each
+    bkill is tried once. With a job group that holds exactly the jobs to kill, they
+    are killed with a single bkill of the group first, and only the jobs that bkill
+    did not report on are killed by jobid.
+    """
+    if chunk_size < 1:
+        raise ValueError(
+            "cancel_chunk_size must be at least 1, not {}".format(chunk_size)
+        )
+    if retry_policy is None:
+        retry_policy = RetryPolicy()
     # we don't want to run bkill with no argument as this will kill the last job
-    if any(ids_to_kill):
-        cmd = "{} {}".format(KILL, " ".join(ids_to_kill))
-        _ = OSLayer.run_process(cmd, check=False)
+    ids_to_kill = [jobid for jobid in ids_to_kill if jobid]
+    if not ids_to_kill:
+        return CancelSummary([], [], [])
+
+    outcomes = dict()
+    if job_registry is not None:
+        # jobs the registry has seen finish need no bkill
+        unfinished = set(job_registry.without_finished(ids_to_kill))
+        for jobid in ids_to_kill:
+            if jobid not in unfinished:
+                outcomes[jobid] = FINISHED
+
+    remaining = [jobid for jobid in ids_to_kill if jobid not in outcomes]
+    if job_group is not None and remaining and group_holds_only(job_group, remaining):
+        output_stream, error_stream = OSLayer.run_process(
+            group_kill_cmd(job_group), check=False
+        )
+        reported = parse_bkill_output("{}\n{}".format(output_stream, error_stream))
+        for jobid in remaining:
+            if reported.get(jobid, FAILED) != FAILED:
+                outcomes[jobid] = reported[jobid]
+
+    chunks = list(
+        chunked((jobid for jobid in remaining if jobid not in outcomes), chunk_size)
+    )
+    if chunks:
+        with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            for chunk_outcomes in pool.map(
+                lambda chunk: kill_chunk(chunk, retry_policy), chunks
+            ):
+                outcomes.update(chunk_outcomes)
+
+    summary = CancelSummary(
+        *(
+            [jobid for jobid in ids_to_kill if outcomes[jobid] == outcome]
+            for outcome in (KILLED, FINISHED, FAILED)
+        )
+    )
+    if job_registry is not None and summary.killed:
+        job_registry.mark_cancelled(summary.killed)
+    OSLayer.eprint(
+        "[cluster-cancel] killed {}, already finished {}, failed {}{}".format(
+            len(summary.killed),
+            len(summary.finished),
+            len(summary.failed),
+            ": {}".format(" ".join(summary.failed)) if summary.failed else "",
+        )
+    )
+    return summary
 
 
 def parse_input() -> List[str]:
@@ -27,17 +195,76 @@ def parse_input() -> List[str]:
     split_args = shlex.split(" ".join(sys.argv[1:]))
     valid_ids = []
     for arg in map(str.strip, split_args):
-        if re.fullmatch(r"\d+", arg):
+        if JOBID.fullmatch(arg):
             valid_ids.append(arg)
 
     return valid_ids
 
 
+def resolve_batch_jobids(
+    jobids: List[str], timeout: float = BATCH_TIMEOUT
+) -> List[str]:
+    """Replaces the ids of jobs added to a batch by their LSF jobids, waiting up to
+    timeout seconds in all for batches that have not been submitted yet. Jobs whose
+    batch failed or was not submitted in time are dropped.
+    """
+    if not __name__.startswith("tests.src."):
+        from lsf_batch_submit import (
+            SubmissionSpool,
+            BatchSubmissionError,
+            parse_element_id,
+        )
+    else:
+        from .lsf_batch_submit import (
+            SubmissionSpool,
+            BatchSubmissionError,
+            parse_element_id,
+        )
+
+    deadline = time.time() + timeout
+    spool = None
+    resolved = []
+    for jobid in jobids:
+        batch_element = parse_element_id(jobid)
+        if batch_element is None:
+            resolved.append(jobid)
+            continue
+        if spool is None:
+            spool = SubmissionSpool()
+        try:
+            resolved.append(
+                spool.wait_for_jobid(
+                    *batch_element, timeout=max(0.0, deadline - time.time())
+                )
+            )
+        except BatchSubmissionError as error:
+            OSLayer.eprint("[cluster-cancel error] {}".format(error))
+    return resolved
+
+
 if __name__ == "__main__":
     jobids = parse_input()
+    if CookieCutter.get_batch_submission() != "none":
+        jobids = resolve_batch_jobids(jobids)
 
     if jobids:
-        kill_jobs(jobids)
+        job_registry = None
+        if CookieCutter.use_job_registry():
+            import job_registry as registry
+
+            job_registry = registry.JobRegistry()
+        kill_jobs(
+            jobids,
+            job_registry=job_registry,
+            chunk_size=CookieCutter.get_cancel_chunk_size(),
+            workers=CookieCutter.get_cancel_workers(),
+            retry_policy=RetryPolicy(
+                RetryPolicy.EXPONENTIAL,
+                base_wait=1.0,
+                max_attempts=1 + CookieCutter.get_cancel_retries(),
+            ),
+            job_group=current_job_group() if CookieCutter.use_job_groups() else None,
+        )
     else:
         OSLayer.eprint(
             "[cluster-cancel error] Did not get any valid jobids to cancel..."
@@ -1,17 +1,32 @@
+import io
+import os
 import shlex
 from collections import OrderedDict
 from itertools import chain
-from typing import TextIO, Union, List, Any, Dict
+from pathlib import Path
+from typing import TextIO, Union, List, Any, Dict, Optional
 
-import yaml
+DEFAULT_KEY = "__default__"
+# maps rules (or DEFAULT_KEY) to the queues the queue router may choose from
+QUEUES_KEY = "__queues__"
+# bump when the layout of the compiled cache changes
+CACHE_VERSION = 3
 
 
 class Config:
     def __init__(self, data: Union[dict, None] = None):
         self._data = dict()
+        self._params_for_rule = dict()
+        self._queues = dict()
         if data is not None:
             for key, value in data.items():
-                self._data[key] = self.concatenate_params(value)
+                if key == QUEUES_KEY:
+                    self._queues = {
+                        rulename: [queues] if isinstance(queues, str) else queues
+                        for rulename, queues in (value or dict()).items()
+                    }
+                else:
+                    self._data[key] = self.concatenate_params(value)
 
     def __bool__(self) -> bool:
         return bool(self._data)
@@ -39,20 +54,142 @@ class Config:
         return " ".join(filter(None, params))
 
     def default_params(self) -> str:
-        return self.get("__default__", "")
+        return self.get(DEFAULT_KEY, "")
 
-    def params_for_rule(self, rulename: str) -> str:
-        """Loads default + rule-specific arguments.
+    def params_for_rule(self, rulename: str) -> List[str]:
+        """Loads default + rule-specific arguments as a list of bsub arguments.
         Arguments specified for a rule override default-specified arguments.
-        Shlex-joining is required to properly pass quoted escapes in yaml
-        to the shell.
+        Quotes in the yaml only group words into arguments; nothing is passed
+        through a shell.
         """
-        default_params = self.args_to_dict(self.default_params())
-        rule_params = self.args_to_dict(self.get(rulename, ""))
-        default_params.update(rule_params)
-        return " ".join(map(shlex.quote, chain.from_iterable(default_params.items())))
+        if rulename not in self._data:
+            # all rules without their own entry get the default params
+            rulename = DEFAULT_KEY
+        if rulename not in self._params_for_rule:
+            default_params = self.args_to_dict(self.default_params())
+            rule_params = self.args_to_dict(self.get(rulename, ""))
+            default_params.update(rule_params)
+            self._params_for_rule[rulename] = list(
+                chain.from_iterable(default_params.items())
+            )
+        return self._params_for_rule[rulename]
+
+    def routes_queues(self) -> bool:
+        """Whether the config lists candidate queues for any rule."""
+        return bool(self._queues)
+
+    def queues_for_rule(self, rulename: str) -> List[str]:
+        """The candidate queues of the rule, or the default candidates."""
+        return self._queues.get(rulename, self._queues.get(DEFAULT_KEY, []))
 
     @staticmethod
     def from_stream(stream: TextIO) -> "Config":
+        # only imported when there is an lsf.yaml, to keep submissions fast
+        import yaml
+
         data = yaml.safe_load(stream)
         return Config(data)
+
+    def compile(self) -> dict:
+        """Assembles the params of every rule in the config, so they can be stored
+        and later looked up without parsing anything.
+        """
+        for rulename in chain([DEFAULT_KEY], self._data):
+            self.params_for_rule(rulename)
+        return {
+            "data": self._data,
+            "params_for_rule": self._params_for_rule,
+            "queues": self._queues,
+        }
+
+    @staticmethod
+    def from_compiled(compiled: dict) -> "Config":
+        config = Config()
+        config._data = compiled["data"]
+        config._params_for_rule = compiled["params_for_rule"]
+        config._queues = compiled["queues"]
+        return config
+
+    @staticmethod
+    def from_path(path: Path, cache_path: Optional[Path] = None) -> "Config":
+        """Loads the config file at path. If cache_path is given, the compiled config
+        is stored there and reused for as long as the config file does not change.
+        The cache is trusted when the size and modification time of the file match,
+        and otherwise only when the SHA-256 of its content does.
+        """
+        path = Path(path)
+        if cache_path is None:
+            with path.open() as stream:
+                return Config.from_stream(stream)
+
+        stat = path.stat()
+        cache = _read_cache(Path(cache_path))
+        source = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+        if cache is not None and cache["source"] == source:
+            return cache["config"]
+
+        import hashlib
+
+        content = path.read_bytes()
+        digest = hashlib.sha256(content).hexdigest()
+        if cache is not None and cache["sha256"] == digest:
+            config = cache["config"]
+        else:
+            config = Config.from_stream(io.StringIO(content.decode()))
+        _write_cache(
+            Path(cache_path),
+            {
+                "version": CACHE_VERSION,
+                "source": source,
+                "sha256": digest,
+                "compiled": config.compile(),
+            },
+        )
+        return config
+
+
+# pickle and hashlib are only imported when lsf.yaml is read, as every submission
+# imports this module
+
+
+def _read_cache(cache_path: Path) -> Optional[dict]:
+    """The source, sha256 and config of the cache at cache_path, or None if it is
+    missing, of another version or cannot be read in full, so that a damaged cache
+    is rebuilt like a missing one."""
+    import pickle
+
+    try:
+        with cache_path.open("rb") as stream:
+            cache = pickle.load(stream)
+        if cache["version"] != CACHE_VERSION:
+            return None
+        return {
+            "source": tuple(cache["source"]),
+            "sha256": str(cache["sha256"]),
+            "config": Config.from_compiled(cache["compiled"]),
+        }
+    except (
+        OSError,
+        pickle.UnpicklingError,
+        EOFError,
+        KeyError,
+        IndexError,
+        TypeError,
+        ValueError,
+        AttributeError,
+        ImportError,
+    ):
+        return None
+
+
+def _write_cache(cache_path: Path, cache: dict):
+    import pickle
+
+    tmp_path = cache_path.with_name("{}.{}.tmp".format(cache_path.name, os.getpid()))
+    try:
+        with tmp_path.open("wb") as stream:
+            pickle.dump(cache, stream, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(str(tmp_path), str(cache_path))
+    except OSError:
+        # the cache is an optimisation only; the next submission tries again
+        pass
@@ -0,0 +1,95 @@
+import os
+import sys
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer
+else:
+    from .OSLayer import OSLayer
+
+GROUP_ROOT = "/snakemake"
+DIRECTORY_NAME = "job_groups"
+# holds the group of the run that submitted last
+CURRENT_GROUP_NAME = "current"
+
+
+def run_id(jobscript: str) -> str:
+    """Identifies the snakemake run that wrote jobscript. snakemake writes the
+    jobscripts of every run into a temporary directory of its own, so all
+    submissions of a run derive the same id from it without coordinating.
+    """
+    run_directory = os.path.dirname(os.path.abspath(str(jobscript)))
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, run_directory))
+
+
+def run_group(jobscript: str) -> str:
+    """The job group of the snakemake run that wrote jobscript."""
+    return "{}/{}".format(GROUP_ROOT, run_id(jobscript))
+
+
+def group_add_cmd(group: str, limit: int) -> List[str]:
+    return ["bgadd", "-L", str(limit), group]
+
+
+def group_kill_cmd(group: str) -> List[str]:
+    # job id 0 means every job of the group
+    return ["bkill", "-g", group, "0"]
+
+
+def current_job_group(directory: Optional[Path] = None) -> Optional[str]:
+    """The group of the run that submitted last, or None before any submission."""
+    if directory is None:
+        directory = OSLayer.state_dir() / DIRECTORY_NAME
+    try:
+        return (Path(directory) / CURRENT_GROUP_NAME).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class JobGroups:
+    """
+    Puts every job of a snakemake run into the LSF job group /snakemake/<run-uuid>.
+    The first submission of a run creates the group, with bgadd -L if the number of
+    running jobs is limited (bsub -g creates groups without a limit by itself), and
+    records it as the current group for the cancel and status scripts. The other
+    submissions find its marker file, or, in the submit broker, remember the group.
+    """
+
+    def __init__(self, limit: int = 0, directory: Optional[Path] = None):
+        if directory is None:
+            directory = OSLayer.state_dir() / DIRECTORY_NAME
+        self.limit = limit
+        self.directory = Path(directory)
+        self.lock_path = self.directory / ".lock"
+        self._created = set()
+
+    def group_for(self, jobscript: str) -> str:
+        group = run_group(jobscript)
+        if group not in self._created:
+            self._create(group)
+            self._created.add(group)
+        return group
+
+    def _create(self, group: str):
+        marker = self.directory / group.rsplit("/", 1)[1]
+        if marker.exists():
+            return
+        OSLayer.mkdir(self.directory)
+        with OSLayer.file_lock(self.lock_path):
+            # another submission may have created the group while we waited
+            if marker.exists():
+                return
+            if self.limit > 0:
+                _, error_stream = OSLayer.run_process(
+                    group_add_cmd(group, self.limit), check=False
+                )
+                if error_stream:
+                    OSLayer.eprint("[job groups] bgadd failed: {}".format(error_stream))
+            current = self.directory / CURRENT_GROUP_NAME
+            tmp_path = current.with_name("{}.{}.tmp".format(current.name, os.getpid()))
+            tmp_path.write_text("{}\n".format(group))
+            os.replace(str(tmp_path), str(current))
+            marker.touch()
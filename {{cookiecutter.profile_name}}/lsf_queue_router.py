@@ -0,0 +1,221 @@
+import json
+import math
+import os
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+from subprocess import CalledProcessError
+from typing import Dict, Iterable, List, Optional
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer
+else:
+    from .OSLayer import OSLayer
+
+CACHE_NAME = "queue_loads.json"
+AUDIT_LOG_NAME = "queue_routing.log"
+BQUEUES_FIELDS = ("queue_name", "status", "max", "njobs", "pend", "run", "rsv")
+
+QueueLoad = namedtuple(
+    "QueueLoad", ["queue", "active", "max_slots", "pend", "run", "rsv"]
+)
+QueueLoad.__doc__ = """The slots of one queue as reported by bqueues. max_slots is None
+for queues without a slot limit."""
+
+
+class InvalidBqueuesOutput(Exception):
+    pass
+
+
+def bqueues_query_cmd(queues: Iterable[str]) -> List[str]:
+    return ["bqueues", "-json", "-o", " ".join(BQUEUES_FIELDS)] + list(queues)
+
+
+def _parse_count(value: str) -> Optional[int]:
+    value = value.strip()
+    return int(value) if value.isdigit() else None
+
+
+def parse_bqueues_output(output_stream: str) -> Dict[str, QueueLoad]:
+    """Parses the output of bqueues_query_cmd into a queue -> QueueLoad mapping."""
+    try:
+        records = json.loads(output_stream).get("RECORDS", [])
+    except (ValueError, AttributeError) as error:
+        raise InvalidBqueuesOutput("{}\n{}".format(error, output_stream))
+
+    loads = dict()
+    for fields in records:
+        if "ERROR" in fields or "QUEUE_NAME" not in fields:
+            continue
+        loads[fields["QUEUE_NAME"]] = QueueLoad(
+            queue=fields["QUEUE_NAME"],
+            active=fields.get("STATUS", "") == "Open:Active",
+            max_slots=_parse_count(fields.get("MAX", "")),
+            pend=_parse_count(fields.get("PEND", "")) or 0,
+            run=_parse_count(fields.get("RUN", "")) or 0,
+            rsv=_parse_count(fields.get("RSV", "")) or 0,
+        )
+    return loads
+
+
+def query_queue_loads(queues: Iterable[str]) -> Dict[str, QueueLoad]:
+    """Queries all queues with a single bqueues call."""
+    queues = list(queues)
+    if not queues:
+        return dict()
+    # bqueues exits non-zero as soon as one of the queues does not exist
+    output_stream, error_stream = OSLayer.run_process(
+        bqueues_query_cmd(queues), check=False
+    )
+    if not output_stream.strip():
+        OSLayer.eprint("[queue router] bqueues failed: {}".format(error_stream))
+        return dict()
+    return parse_bqueues_output(output_stream)
+
+
+def expected_wait(load: QueueLoad) -> float:
+    """A relative measure of how long a job submitted to the queue now waits to
+    start. A queue with free slots for all of its pending jobs, or without a slot
+    limit and without pending jobs, scores 0. Otherwise
+    the pending jobs the free slots cannot take are assumed to drain at a rate
+    proportional to the number of running slots. Inactive queues score infinity.
+    """
+    if not load.active:
+        return math.inf
+    if load.max_slots is None and load.pend == 0:
+        # nothing queued and no limit a job could hit
+        return 0.0
+    free_slots = 0
+    if load.max_slots is not None:
+        free_slots = max(0, load.max_slots - load.run - load.rsv)
+    backlog = load.pend - free_slots
+    if backlog < 0:
+        return 0.0
+    return (backlog + 1) / max(load.run, 1)
+
+
+class QueueLoadCache:
+    """
+    File-based table of bqueues snapshots shared by all submissions of a workflow.
+    The first process that finds a queue missing or the table older than ttl
+    seconds refreshes it with one bqueues call covering every queue in the table;
+    processes arriving during the refresh block on the lock and then read its result.
+    """
+
+    def __init__(self, ttl: float, directory: Optional[Path] = None):
+        if directory is None:
+            directory = OSLayer.state_dir()
+        self.ttl = ttl
+        self.path = Path(directory) / CACHE_NAME
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+
+    def _read(self) -> dict:
+        try:
+            with self.path.open() as stream:
+                return json.load(stream)
+        except (FileNotFoundError, ValueError):
+            return {"refreshed_at": 0.0, "loads": dict()}
+
+    def _write(self, data: dict):
+        tmp_path = self.path.with_name("{}.{}.tmp".format(self.path.name, os.getpid()))
+        with tmp_path.open("w") as stream:
+            json.dump(data, stream)
+        os.replace(str(tmp_path), str(self.path))
+
+    def _is_fresh(self, data: dict, queues: List[str]) -> bool:
+        if any(queue not in data["loads"] for queue in queues):
+            return False
+        return time.time() - data["refreshed_at"] < self.ttl
+
+    def _refresh(self, data: dict, queues: List[str]) -> dict:
+        # queues bqueues does not know are cached as None until the next refresh
+        all_queues = sorted(set(data["loads"]) | set(queues))
+        refreshed_at = time.time()
+        loads = query_queue_loads(all_queues)
+        data["loads"] = {
+            queue: list(loads[queue]) if queue in loads else None
+            for queue in all_queues
+        }
+        data["refreshed_at"] = refreshed_at
+        self._write(data)
+        return data
+
+    def get_loads(self, queues: List[str]) -> Dict[str, QueueLoad]:
+        """Returns the load of each of queues that bqueues knows."""
+        with OSLayer.file_lock(self.lock_path, shared=True):
+            data = self._read()
+        if not self._is_fresh(data, queues):
+            with OSLayer.file_lock(self.lock_path):
+                # another process may have refreshed while we waited for the lock
+                data = self._read()
+                if not self._is_fresh(data, queues):
+                    try:
+                        data = self._refresh(data, queues)
+                    except (CalledProcessError, OSError, InvalidBqueuesOutput) as error:
+                        OSLayer.eprint("[queue router] {}".format(error))
+                        return dict()
+        return {
+            queue: QueueLoad(*data["loads"][queue])
+            for queue in queues
+            if data["loads"].get(queue) is not None
+        }
+
+
+class QueueRouter:
+    """
+    Chooses, among the candidate queues of a rule, the one in which a new job is
+    expected to start first. Ties and queues bqueues cannot report on go to the
+    queue listed first. Every decision is appended to the audit log as one JSON
+    line.
+    """
+
+    def __init__(self, load_cache: QueueLoadCache, audit_log: Optional[Path] = None):
+        if audit_log is None:
+            audit_log = load_cache.path.with_name(AUDIT_LOG_NAME)
+        self.load_cache = load_cache
+        self.audit_log = Path(audit_log)
+
+    def choose(self, rule: str, candidates: List[str]) -> str:
+        if len(candidates) == 1:
+            return candidates[0]
+        loads = self.load_cache.get_loads(candidates)
+        scores = {
+            queue: expected_wait(loads[queue]) if queue in loads else math.inf
+            for queue in candidates
+        }
+        # min keeps the first of equally good queues
+        queue = min(candidates, key=lambda candidate: scores[candidate])
+        self._audit(rule, queue, candidates, loads, scores)
+        return queue
+
+    def _audit(
+        self,
+        rule: str,
+        queue: str,
+        candidates: List[str],
+        loads: Dict[str, QueueLoad],
+        scores: Dict[str, float],
+    ):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "rule": rule,
+            "queue": queue,
+            "candidates": [
+                {
+                    "queue": candidate,
+                    "expected_wait": (
+                        None if math.isinf(scores[candidate]) else scores[candidate]
+                    ),
+                    "load": loads[candidate]._asdict() if candidate in loads else None,
+                }
+                for candidate in candidates
+            ],
+        }
+        try:
+            # a single short O_APPEND write is atomic, so no lock is needed
+            with open(str(self.audit_log), "a") as stream:
+                stream.write(json.dumps(entry) + "\n")
+        except OSError as error:
+            OSLayer.eprint("[queue router] cannot write audit log: {}".format(error))
@@ -5,15 +5,40 @@ import sys
 import time
 from pathlib import Path
 from subprocess import CalledProcessError
-from typing import List
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
 
 if not __name__.startswith("tests.src."):
     sys.path.append(str(Path(__file__).parent.absolute()))
     from OSLayer import OSLayer, TailError
     from CookieCutter import CookieCutter
+    from lsf_batch_query import (
+        JobRecord,
+        InvalidBjobsOutput,
+        bjobs_query_cmd,
+        parse_bjobs_output,
+        query_history_batch,
+    )
+    from retry_policy import RetryPolicy
 else:
     from .OSLayer import OSLayer, TailError
     from .CookieCutter import CookieCutter
+    from .lsf_batch_query import (
+        JobRecord,
+        InvalidBjobsOutput,
+        bjobs_query_cmd,
+        parse_bjobs_output,
+        query_history_batch,
+    )
+    from .retry_policy import RetryPolicy
+
+if TYPE_CHECKING:
+    # the optional features are only imported when they are enabled, as snakemake
+    # runs this script for every job every time it polls
+    from lsf_status_daemon import StatusDaemonClient
+    from lsf_status_cache import StatusCache
+    from lsf_terminal_states import TerminalStateStore
+    from job_registry import JobRegistry
 
 
 class BjobsError(Exception):
@@ -28,7 +53,15 @@ UNKNOWN = "UNKWN"
 ZOMBIE = "ZOMBI"
 
 
-class StatusChecker:
+class StatusParsingMixin:
+    """
+    What StatusChecker and AsyncStatusChecker share: reading the status of a job
+    from bjobs output, the job history or the tail of its log, and reporting how it
+    was resolved. It runs no commands itself; classes using it set _jobid, _outlog,
+    kill_unknown, kill_zombie, usage (which it sets from the log tail),
+    retries_used and tier_latencies, and provide _kill_job.
+    """
+
     SUCCESS = "success"
     RUNNING = "running"
     FAILED = "failed"
@@ -45,22 +78,6 @@ class StatusChecker:
         "POST_ERR": FAILED,
     }
 
-    def __init__(
-        self,
-        jobid: int,
-        outlog: str,
-        wait_between_tries: float = 0.001,
-        max_status_checks: int = 1,
-        kill_unknown: bool = False,
-        kill_zombie: bool = False,
-    ):
-        self._jobid = jobid
-        self._outlog = outlog
-        self.wait_between_tries = wait_between_tries
-        self.max_status_checks = max_status_checks
-        self.kill_unknown = kill_unknown
-        self.kill_zombie = kill_zombie
-
     @property
     def jobid(self) -> int:
         return self._jobid
@@ -70,34 +87,63 @@ class StatusChecker:
         return self._outlog
 
     @property
-    def bjobs_query_cmd(self) -> str:
-        return "bjobs -o 'stat' -noheader {jobid}".format(jobid=self.jobid)
+    def bjobs_query_cmd(self) -> List[str]:
+        return bjobs_query_cmd([self.jobid])
 
-    def _handle_unknown_job(self) -> str:
+    def _handle_unknown_job(self, record: JobRecord) -> str:
         if self.kill_unknown:
             print(
-                "[lsf profile warning] {unknown} job status detected for {jobid}. "
-                "Killing job...".format(unknown=UNKNOWN, jobid=self.jobid),
+                "[lsf profile warning] {unknown} job status detected for {jobid} "
+                "(run time: {run_time} s). Killing job...".format(
+                    unknown=UNKNOWN, jobid=self.jobid, run_time=record.run_time
+                ),
                 file=sys.stderr,
             )
             self._kill_job()
         # we return running regardless so that the zombie job gets cleaned up
         return self.RUNNING
 
-    def _handle_zombie_job(self) -> str:
+    def _handle_zombie_job(self, record: JobRecord) -> str:
         if self.kill_zombie:
             print(
-                "[lsf profile warning] {zombie} job status detected for {jobid}. "
-                "Killing job...".format(zombie=ZOMBIE, jobid=self.jobid),
+                "[lsf profile warning] {zombie} job status detected for {jobid} "
+                "(exit code: {exit_code}). Killing job...".format(
+                    zombie=ZOMBIE, jobid=self.jobid, exit_code=record.exit_code
+                ),
                 file=sys.stderr,
             )
             self._kill_job()
         # zombie jobs are always considered failed as they don't recover
         return self.FAILED
 
-    def _query_status_using_bjobs(self) -> str:
-        output_stream, error_stream = OSLayer.run_process(self.bjobs_query_cmd)
+    def _report_failure(self, record: JobRecord):
+        print(
+            "[lsf profile] job {jobid} finished with status {stat} (exit code: "
+            "{exit_code}, max memory: {max_mem} MB, run time: {run_time} s)".format(
+                jobid=self.jobid,
+                stat=record.stat,
+                exit_code=record.exit_code,
+                max_mem=record.max_mem_mb,
+                run_time=record.run_time,
+            ),
+            file=sys.stderr,
+        )
+
+    def _status_from_record(self, record: JobRecord) -> str:
+        if record.stat == UNKNOWN:
+            return self._handle_unknown_job(record)
+
+        if record.stat == ZOMBIE:
+            return self._handle_zombie_job(record)
+
+        status = self.STATUS_TABLE[record.stat]
+        if status == self.FAILED:
+            self._report_failure(record)
+        return status
 
+    def _record_from_bjobs_output(
+        self, output_stream: str, error_stream: str
+    ) -> JobRecord:
         stdout_is_empty = not output_stream.strip()
         if stdout_is_empty:
             raise BjobsError(
@@ -106,33 +152,22 @@ class StatusChecker:
                 )
             )
 
-        if output_stream == UNKNOWN:
-            return self._handle_unknown_job()
-
-        if output_stream == ZOMBIE:
-            return self._handle_zombie_job()
-
-        return self.STATUS_TABLE[output_stream]
-
-    def _get_tail_of_log_file(self) -> List[str]:
-        # 30 lines gives us the whole LSF completion summary
-        tail = OSLayer.tail(self.outlog, num_lines=30)
-        return [line.decode().strip() for line in tail]
-
-    def _kill_job(self):
-        kill_cmd = "bkill -r {}".format(self.jobid)
-        _ = OSLayer.run_process(kill_cmd)
+        try:
+            records = parse_bjobs_output(output_stream)
+        except InvalidBjobsOutput as error:
+            raise BjobsError("bjobs error.\n{error}".format(error=error))
 
-    def _query_status_using_log(self) -> str:
         try:
-            log_tail = self._get_tail_of_log_file()
-        except FileNotFoundError:
-            print("Log file {} not found".format(self.outlog), file=sys.stderr)
-            return self.FAILED
-        except TailError as error:
-            print("TailError: {}".format(error), file=sys.stderr)
-            return self.FAILED
+            return records[str(self.jobid)]
+        except KeyError:
+            raise BjobsError(
+                "bjobs error.\nno record for job {jobid}.\nstdout = {stdout}\n"
+                "stderr = {stderr}".format(
+                    jobid=self.jobid, stdout=output_stream, stderr=error_stream
+                )
+            )
 
+    def _status_from_log_tail(self, log_tail: List[str]) -> str:
         try:
             resource_summary_usage_line_index = log_tail.index(
                 "Resource usage summary:"
@@ -140,6 +175,12 @@ class StatusChecker:
         except ValueError:  # resource usage line not in tail
             return self.RUNNING
 
+        if not __name__.startswith("tests.src."):
+            from usage_history import parse_usage_summary
+        else:
+            from .usage_history import parse_usage_summary
+
+        self.usage = parse_usage_summary(log_tail)
         status_line = log_tail[resource_summary_usage_line_index - 2]
 
         if status_line == "Successfully completed.":
@@ -149,52 +190,224 @@ class StatusChecker:
         else:
             raise UnknownStatusLine(status_line)
 
-    def get_status(self) -> str:
-        status = None
-        for _ in range(self.max_status_checks):
-            try:
-                status = self._query_status_using_bjobs()
-                break  # succeeded in getting the status
-            except BjobsError as error:
-                print(
-                    "[Predicted exception] BjobsError: {error}".format(error=error),
-                    file=sys.stderr,
-                )
-                print("Resuming...", file=sys.stderr)
-                time.sleep(self.wait_between_tries)
-            except KeyError as error:
-                print(
-                    "[Predicted exception] Unknown job status: {error}".format(
-                        error=error
-                    ),
-                    file=sys.stderr,
-                )
-                print("Resuming...", file=sys.stderr)
-                time.sleep(self.wait_between_tries)
-            except CalledProcessError as error:
-                print(
-                    "[Predicted exception] Error calling bjobs: {error}".format(
-                        error=error
-                    ),
-                    file=sys.stderr,
-                )
-                print("Resuming...", file=sys.stderr)
-                time.sleep(self.wait_between_tries)
+    @staticmethod
+    def _report_bjobs_error(error: Exception):
+        if isinstance(error, BjobsError):
+            description = "BjobsError"
+        elif isinstance(error, KeyError):
+            description = "Unknown job status"
+        else:
+            description = "Error calling bjobs"
+        print(
+            "[Predicted exception] {description}: {error}".format(
+                description=description, error=error
+            ),
+            file=sys.stderr,
+        )
+        print("Resuming...", file=sys.stderr)
+
+    @staticmethod
+    def _report_history_error(error: Exception):
+        print(
+            "[Predicted exception] Error querying job history: {error}".format(
+                error=error
+            ),
+            file=sys.stderr,
+        )
 
-        bjobs_failed = status is None
-        if bjobs_failed:
+    def _status_from_history(self, statuses: Dict[str, str]) -> Optional[str]:
+        stat = statuses.get(str(self.jobid))
+        if stat is None:
+            return None
+        return self.STATUS_TABLE[stat]
+
+    def _report_bjobs_failed(self):
+        print(
+            "bjobs failed {try_times} times. Checking job history...".format(
+                try_times=self.retries_used + 1
+            ),
+            file=sys.stderr,
+        )
+
+    def _report_no_history(self):
+        print(
+            "No job history for {jobid}. Checking log...".format(jobid=self.jobid),
+            file=sys.stderr,
+        )
+
+    def _report_tier_latencies(self):
+        if len(self.tier_latencies) > 1:
             print(
-                "bjobs failed {try_times} times. Checking log...".format(
-                    try_times=self.max_status_checks
+                "Status of {jobid} resolved by {tier} ({latencies})".format(
+                    jobid=self.jobid,
+                    tier=next(reversed(self.tier_latencies)),
+                    latencies=", ".join(
+                        "{}: {:.3f}s".format(tier, latency)
+                        for tier, latency in self.tier_latencies.items()
+                    ),
                 ),
                 file=sys.stderr,
             )
+
+
+class StatusChecker(StatusParsingMixin):
+    def __init__(
+        self,
+        jobid: int,
+        outlog: str,
+        wait_between_tries: float = 0.001,
+        max_status_checks: int = 1,
+        kill_unknown: bool = False,
+        kill_zombie: bool = False,
+        status_daemon: Optional["StatusDaemonClient"] = None,
+        status_cache: Optional["StatusCache"] = None,
+        terminal_states: Optional["TerminalStateStore"] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        job_registry: Optional["JobRegistry"] = None,
+    ):
+        if retry_policy is None:
+            retry_policy = RetryPolicy(
+                RetryPolicy.FIXED,
+                base_wait=wait_between_tries,
+                max_attempts=max_status_checks,
+            )
+        self._jobid = jobid
+        self._outlog = outlog
+        self.wait_between_tries = wait_between_tries
+        self.max_status_checks = max_status_checks
+        self.kill_unknown = kill_unknown
+        self.kill_zombie = kill_zombie
+        self.status_daemon = status_daemon
+        self.status_cache = status_cache
+        self.terminal_states = terminal_states
+        self.retry_policy = retry_policy
+        self.job_registry = job_registry
+        self.retries_used = 0
+        self.record = None
+        self.usage = None
+        self.tier_latencies = OrderedDict()
+
+    def _query_record_using_bjobs(self) -> JobRecord:
+        output_stream, error_stream = OSLayer.run_process(self.bjobs_query_cmd)
+        return self._record_from_bjobs_output(output_stream, error_stream)
+
+    def _query_record(self) -> JobRecord:
+        if self.status_daemon is not None:
+            record = self.status_daemon.get_record(self.jobid)
+            if record is not None:
+                return record
+        if self.status_cache is not None:
+            record = self.status_cache.get_record(self.jobid)
+            if record is not None:
+                return record
+        return self._query_record_using_bjobs()
+
+    def _query_status_using_bjobs(self) -> str:
+        self.record = self._query_record()
+        return self._status_from_record(self.record)
+
+    def _get_tail_of_log_file(self) -> List[str]:
+        # 30 lines gives us the whole LSF completion summary
+        tail = OSLayer.tail(self.outlog, num_lines=30)
+        return [line.decode().strip() for line in tail]
+
+    def _kill_job(self):
+        kill_cmd = ["bkill", "-r", str(self.jobid)]
+        _ = OSLayer.run_process(kill_cmd)
+
+    def _query_status_using_log(self) -> str:
+        try:
+            log_tail = self._get_tail_of_log_file()
+        except FileNotFoundError:
+            print("Log file {} not found".format(self.outlog), file=sys.stderr)
+            return self.FAILED
+        except TailError as error:
+            print("TailError: {}".format(error), file=sys.stderr)
+            return self.FAILED
+        return self._status_from_log_tail(log_tail)
+
+    def get_status(self) -> str:
+        if self.terminal_states is not None:
+            status = self.terminal_states.get(self.jobid, self.outlog)
+            if status is not None:
+                return status
+
+        status = self._resolve_status()
+
+        if self.terminal_states is not None and status in (self.SUCCESS, self.FAILED):
+            self.terminal_states.record(self.jobid, self.outlog, status)
+        if self.job_registry is not None:
+            lsf_stat = self.record.stat if self.record is not None else None
+            self.job_registry.update_state(self.jobid, status, lsf_stat)
+            if status in (self.SUCCESS, self.FAILED):
+                self._record_usage(status == self.SUCCESS)
+        return status
+
+    def _record_usage(self, succeeded: bool):
+        """Adds what the finished job used to the usage history. bjobs reports peak
+        memory and run time; otherwise the summary in the log file is read."""
+        if not __name__.startswith("tests.src."):
+            from usage_history import ResourceUsage, read_usage_summary
+        else:
+            from .usage_history import ResourceUsage, read_usage_summary
+
+        usage = self.usage
+        record = self.record
+        if usage is None and record is not None and record.max_mem_mb is not None:
+            usage = ResourceUsage(record.max_mem_mb, record.run_time, cpu_time=None)
+        if usage is None:
+            usage = read_usage_summary(self.outlog)
+        if usage is not None:
+            self.job_registry.record_usage(self.jobid, succeeded, *usage)
+
+    def _query_status_using_bjobs_with_retries(self) -> Optional[str]:
+        self.retries_used = 0
+        for attempt in self.retry_policy.attempts():
+            self.retries_used = attempt
             try:
-                status = self._query_status_using_log()
-            except UnknownStatusLine as error:
-                print("UnknownStatusLine: {}".format(error), file=sys.stderr)
-                status = self.FAILED
+                return self._query_status_using_bjobs()
+            except (BjobsError, KeyError, CalledProcessError) as error:
+                self._report_bjobs_error(error)
+        return None
+
+    def _query_status_using_history(self) -> Optional[str]:
+        try:
+            statuses = query_history_batch([self.jobid])
+        except (CalledProcessError, OSError) as error:
+            self._report_history_error(error)
+            return None
+        return self._status_from_history(statuses)
+
+    def _query_status_using_log_or_fail(self) -> str:
+        try:
+            return self._query_status_using_log()
+        except UnknownStatusLine as error:
+            print("UnknownStatusLine: {}".format(error), file=sys.stderr)
+            return self.FAILED
 
+    def _timed(self, tier: str, query: Callable[[], Optional[str]]) -> Optional[str]:
+        start = time.perf_counter()
+        try:
+            return query()
+        finally:
+            self.tier_latencies[tier] = time.perf_counter() - start
+
+    def _resolve_status(self) -> str:
+        """Asks bjobs first, then the job history (bhist/bacct) and only then reads
+        the log file, which may live on a slow shared filesystem.
+        """
+        self.tier_latencies = OrderedDict()
+        status = self._timed("bjobs", self._query_status_using_bjobs_with_retries)
+
+        if status is None:
+            self._report_bjobs_failed()
+            status = self._timed("history", self._query_status_using_history)
+
+        if status is None:
+            self._report_no_history()
+            status = self._timed("log", self._query_status_using_log_or_fail)
+
+        self._report_tier_latencies()
         return status
 
 
@@ -202,9 +415,27 @@ if __name__ == "__main__":
     # need to support quoted and unquoted jobid
     # see https://github.com/Snakemake-Profiles/lsf/issues/45
     split_args = shlex.split(" ".join(sys.argv[1:]))
-    jobid = int(split_args[0])
+    external_jobid = split_args[0]
     outlog = split_args[1]
 
+    batch_element = None
+    if CookieCutter.get_batch_submission() != "none":
+        import lsf_batch_submit
+
+        batch_element = lsf_batch_submit.parse_element_id(external_jobid)
+    if batch_element is not None:
+        # the job was added to a batch; its LSF jobid is known once that is submitted
+        try:
+            external_jobid = lsf_batch_submit.SubmissionSpool().resolve(*batch_element)
+        except lsf_batch_submit.BatchSubmissionError as error:
+            OSLayer.eprint("[batch submit] {}".format(error))
+            print(StatusChecker.FAILED)
+            sys.exit(0)
+        if external_jobid is None:
+            print(StatusChecker.RUNNING)
+            sys.exit(0)
+    jobid = int(external_jobid) if external_jobid.isdigit() else external_jobid
+
     if CookieCutter.get_unknwn_behaviour().lower() == "wait":
         kill_unknown = False
     elif CookieCutter.get_unknwn_behaviour().lower() == "kill":
@@ -226,12 +457,48 @@ if __name__ == "__main__":
             )
         )
 
+    status_daemon = None
+    if CookieCutter.use_status_daemon():
+        import lsf_status_daemon
+
+        status_daemon = lsf_status_daemon.StatusDaemonClient()
+    status_cache = None
+    status_cache_ttl = CookieCutter.get_status_cache_ttl()
+    if status_cache_ttl > 0:
+        import lsf_status_cache
+
+        status_cache = lsf_status_cache.StatusCache(
+            status_cache_ttl, use_job_groups=CookieCutter.use_job_groups()
+        )
+    terminal_states = None
+    terminal_state_max_age = CookieCutter.get_terminal_state_max_age()
+    if terminal_state_max_age > 0:
+        import lsf_terminal_states
+
+        terminal_states = lsf_terminal_states.TerminalStateStore(terminal_state_max_age)
+    job_registry = None
+    if CookieCutter.use_job_registry():
+        import job_registry as registry
+
+        job_registry = registry.JobRegistry()
+
+    retry_policy = RetryPolicy(
+        CookieCutter.get_status_retry_strategy(),
+        base_wait=CookieCutter.get_wait_between_tries(),
+        max_attempts=CookieCutter.get_max_status_checks(),
+        max_wait=CookieCutter.get_status_retry_max_wait(),
+        time_budget=CookieCutter.get_status_retry_budget(),
+    )
+
     lsf_status_checker = StatusChecker(
         jobid,
         outlog,
         kill_unknown=kill_unknown,
         kill_zombie=kill_zombie,
-        wait_between_tries=CookieCutter.get_wait_between_tries(),
-        max_status_checks=CookieCutter.get_max_status_checks(),
+        retry_policy=retry_policy,
+        status_daemon=status_daemon,
+        status_cache=status_cache,
+        terminal_states=terminal_states,
+        job_registry=job_registry,
     )
     print(lsf_status_checker.get_status())
@@ -0,0 +1,252 @@
+import asyncio
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+from subprocess import CalledProcessError
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer, TailError, resolve_executable
+    from lsf_batch_query import (
+        HISTORY_COMMANDS,
+        history_query_cmd,
+        parse_history_output,
+    )
+    from lsf_status import StatusParsingMixin, BjobsError, UnknownStatusLine
+    from retry_policy import RetryPolicy
+else:
+    from .OSLayer import OSLayer, TailError, resolve_executable
+    from .lsf_batch_query import (
+        HISTORY_COMMANDS,
+        history_query_cmd,
+        parse_history_output,
+    )
+    from .lsf_status import StatusParsingMixin, BjobsError, UnknownStatusLine
+    from .retry_policy import RetryPolicy
+
+stdout = str
+stderr = str
+
+# how many LSF commands (and log reads) may run at the same time by default
+CONCURRENCY = 32
+
+
+class AsyncOSLayer:
+    """
+    asyncio counterparts of the OSLayer operations a status check makes. Like
+    OSLayer, it exists so they can be mocked.
+    """
+
+    @staticmethod
+    async def run_process(cmd: List[str], check: bool = True) -> Tuple[stdout, stderr]:
+        """Runs cmd, a list of arguments, without a shell and without blocking the
+        event loop. Errors are reported as OSLayer.run_process reports them.
+        """
+        executable = resolve_executable(cmd[0])
+        if executable is None:
+            error = "{}: command not found".format(cmd[0])
+            if check:
+                raise CalledProcessError(127, cmd, b"", error.encode())
+            return "", error
+        process = await asyncio.create_subprocess_exec(
+            executable,
+            *cmd[1:],
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        output, error = await process.communicate()
+        if check and process.returncode != 0:
+            raise CalledProcessError(process.returncode, cmd, output, error)
+        return output.decode().strip(), error.decode().strip()
+
+    @staticmethod
+    async def tail(path: str, num_lines: int = 10) -> List[bytes]:
+        # file reads cannot be awaited; a worker thread keeps slow shared
+        # filesystems from stalling the other checks
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, OSLayer.tail, path, num_lines)
+
+
+async def async_attempts(retry_policy: RetryPolicy) -> AsyncIterator[int]:
+    """RetryPolicy.attempts, but waiting with asyncio.sleep so other tasks run
+    meanwhile. Kept here so that the synchronous scripts do not load asyncio."""
+    for attempt, wait in retry_policy.schedule():
+        if wait:
+            await asyncio.sleep(wait)
+        yield attempt
+
+
+async def query_history(jobids: Iterable[str]) -> Dict[str, str]:
+    """query_history_batch without blocking the event loop."""
+    unresolved = [str(jobid) for jobid in jobids]
+    statuses = dict()
+    for command in HISTORY_COMMANDS:
+        if not unresolved:
+            break
+        output_stream, _ = await AsyncOSLayer.run_process(
+            history_query_cmd(command, unresolved), check=False
+        )
+        statuses.update(parse_history_output(output_stream, command))
+        unresolved = [jobid for jobid in unresolved if jobid not in statuses]
+    return statuses
+
+
+class AsyncStatusChecker(StatusParsingMixin):
+    """
+    Resolves the status of a job like StatusChecker, bjobs first, then the job
+    history and then the log file, but as a coroutine, so that an event loop can
+    check thousands of jobs at once. What the commands return is parsed by the
+    StatusParsingMixin StatusChecker uses as well. Checkers sharing a semaphore run
+    at most as many LSF commands and log reads at a time as it allows; waits
+    between retries do not hold it.
+
+    The status daemon, status cache, terminal state store and job registry block
+    on files and sockets and are not supported; a process embedding this keeps its
+    own table of statuses.
+    """
+
+    def __init__(
+        self,
+        jobid: int,
+        outlog: str,
+        wait_between_tries: float = 0.001,
+        max_status_checks: int = 1,
+        kill_unknown: bool = False,
+        kill_zombie: bool = False,
+        retry_policy: Optional[RetryPolicy] = None,
+        semaphore: Optional[asyncio.Semaphore] = None,
+    ):
+        if retry_policy is None:
+            retry_policy = RetryPolicy(
+                RetryPolicy.FIXED,
+                base_wait=wait_between_tries,
+                max_attempts=max_status_checks,
+            )
+        self._jobid = jobid
+        self._outlog = outlog
+        self.kill_unknown = kill_unknown
+        self.kill_zombie = kill_zombie
+        self.retry_policy = retry_policy
+        self.retries_used = 0
+        self.record = None
+        self.usage = None
+        self.tier_latencies = OrderedDict()
+        self.semaphore = semaphore
+        self._kill_requested = False
+
+    async def _limited(self, operation: Callable[..., Awaitable], *args):
+        if self.semaphore is None:
+            return await operation(*args)
+        async with self.semaphore:
+            return await operation(*args)
+
+    def _kill_job(self):
+        # called from the synchronous _status_from_record; the kill is run by
+        # _query_status_using_bjobs once that returns
+        self._kill_requested = True
+
+    async def _query_status_using_bjobs(self) -> str:
+        output_stream, error_stream = await self._limited(
+            AsyncOSLayer.run_process, self.bjobs_query_cmd
+        )
+        self.record = self._record_from_bjobs_output(output_stream, error_stream)
+        status = self._status_from_record(self.record)
+        if self._kill_requested:
+            self._kill_requested = False
+            await self._limited(
+                AsyncOSLayer.run_process, ["bkill", "-r", str(self.jobid)]
+            )
+        return status
+
+    async def _query_status_using_bjobs_with_retries(self) -> Optional[str]:
+        self.retries_used = 0
+        async for attempt in async_attempts(self.retry_policy):
+            self.retries_used = attempt
+            try:
+                return await self._query_status_using_bjobs()
+            except (BjobsError, KeyError, CalledProcessError) as error:
+                self._report_bjobs_error(error)
+        return None
+
+    async def _query_status_using_history(self) -> Optional[str]:
+        try:
+            statuses = await self._limited(query_history, [self.jobid])
+        except (CalledProcessError, OSError) as error:
+            self._report_history_error(error)
+            return None
+        return self._status_from_history(statuses)
+
+    async def _query_status_using_log_or_fail(self) -> str:
+        try:
+            # 30 lines gives us the whole LSF completion summary
+            tail = await self._limited(AsyncOSLayer.tail, self.outlog, 30)
+        except FileNotFoundError:
+            print("Log file {} not found".format(self.outlog), file=sys.stderr)
+            return self.FAILED
+        except TailError as error:
+            print("TailError: {}".format(error), file=sys.stderr)
+            return self.FAILED
+        try:
+            return self._status_from_log_tail([line.decode().strip() for line in tail])
+        except UnknownStatusLine as error:
+            print("UnknownStatusLine: {}".format(error), file=sys.stderr)
+            return self.FAILED
+
+    async def _timed(
+        self, tier: str, query: Callable[[], Awaitable[Optional[str]]]
+    ) -> Optional[str]:
+        start = time.perf_counter()
+        try:
+            return await query()
+        finally:
+            self.tier_latencies[tier] = time.perf_counter() - start
+
+    async def get_status(self) -> str:
+        self.tier_latencies = OrderedDict()
+        status = await self._timed("bjobs", self._query_status_using_bjobs_with_retries)
+
+        if status is None:
+            self._report_bjobs_failed()
+            status = await self._timed("history", self._query_status_using_history)
+
+        if status is None:
+            self._report_no_history()
+            status = await self._timed("log", self._query_status_using_log_or_fail)
+
+        self._report_tier_latencies()
+        return status
+
+
+async def gather_statuses(
+    jobs: Iterable[Tuple[int, str]], concurrency: int = CONCURRENCY, **checker_kwargs
+) -> Dict[str, str]:
+    """Resolves the status of every (jobid, outlog) in jobs concurrently, running at
+    most concurrency LSF commands at a time. Takes the keyword arguments of
+    AsyncStatusChecker and returns a jobid -> status mapping.
+    """
+    # created here rather than at import, so it belongs to the running loop
+    semaphore = asyncio.Semaphore(concurrency)
+    checkers = [
+        AsyncStatusChecker(jobid, outlog, semaphore=semaphore, **checker_kwargs)
+        for jobid, outlog in jobs
+    ]
+    statuses = await asyncio.gather(*(checker.get_status() for checker in checkers))
+    return {str(checker.jobid): status for checker, status in zip(checkers, statuses)}
+
+
+def get_statuses(
+    jobs: Iterable[Tuple[int, str]], concurrency: int = CONCURRENCY, **checker_kwargs
+) -> Dict[str, str]:
+    """gather_statuses for callers without an event loop of their own."""
+    return asyncio.run(gather_statuses(jobs, concurrency, **checker_kwargs))
@@ -0,0 +1,175 @@
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from subprocess import CalledProcessError
+from typing import Dict, Optional
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer
+    from lsf_batch_query import query_records_batch, JobRecord, TERMINAL_STATS
+    from lsf_job_groups import current_job_group, run_id
+else:
+    from .OSLayer import OSLayer
+    from .lsf_batch_query import query_records_batch, JobRecord, TERMINAL_STATS
+    from .lsf_job_groups import current_job_group, run_id
+
+CACHE_NAME = "status_cache.json"
+KNOWN_JOBS_NAME = "status_cache.jobs"
+# seconds after which a cached record is dropped from the cache file
+RETENTION = 24 * 60 * 60
+
+
+def _known_job_line(jobid: int, run: str) -> str:
+    return "{} {}\n".format(jobid, run) if run else "{}\n".format(jobid)
+
+
+class StatusCache:
+    """
+    File-based table of bjobs records shared by all lsf_status.py processes of a
+    workflow. The first process that finds the table older than ttl seconds
+    refreshes it with one bjobs call covering every job the workflow knows about;
+    processes arriving during the refresh block on the lock and then read its result.
+
+    The cache file maps jobid -> [record, time the record was obtained], where
+    record is None for jobs bjobs does not know. Jobs are made known by register_job
+    (called on submission) or by asking for them. With use_job_groups, the refresh
+    queries the job group of the current run rather than listing every job.
+
+    Only jobs of the run that submitted last stay known, and only until a refresh
+    finds them finished or unknown to both bjobs and the history, so the refresh
+    never keeps querying jobs that will not change any more.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        directory: Optional[Path] = None,
+        use_job_groups: bool = False,
+    ):
+        if directory is None:
+            directory = OSLayer.state_dir()
+        self.ttl = ttl
+        self.use_job_groups = use_job_groups
+        self.path = Path(directory) / CACHE_NAME
+        self.known_jobs_path = Path(directory) / KNOWN_JOBS_NAME
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+
+    def register_job(self, jobid: int, jobscript: Optional[str] = None):
+        run = run_id(jobscript) if jobscript is not None else ""
+        # a single short O_APPEND write is atomic, so no lock is needed
+        with open(str(self.known_jobs_path), "a") as stream:
+            stream.write(_known_job_line(jobid, run))
+
+    def _read(self) -> dict:
+        try:
+            with self.path.open() as stream:
+                return json.load(stream)
+        except (FileNotFoundError, ValueError):
+            return {"refreshed_at": 0.0, "records": dict()}
+
+    def _write(self, data: dict):
+        tmp_path = self.path.with_name("{}.{}.tmp".format(self.path.name, os.getpid()))
+        with tmp_path.open("w") as stream:
+            json.dump(data, stream)
+        os.replace(str(tmp_path), str(self.path))
+
+    def _known_jobs(self) -> Dict[str, str]:
+        """Maps every registered job to the run that submitted it."""
+        known_jobs = dict()
+        try:
+            with self.known_jobs_path.open() as stream:
+                for line in stream:
+                    fields = line.split()
+                    if fields:
+                        known_jobs[fields[0]] = fields[1] if len(fields) > 1 else ""
+        except FileNotFoundError:
+            pass
+        return known_jobs
+
+    @staticmethod
+    def _jobs_of_current_run(known_jobs: Dict[str, str]) -> Dict[str, str]:
+        # the run that registered a job last; snakemake locks the working directory,
+        # so the jobs of any other run are left over from earlier runs
+        if not known_jobs:
+            return known_jobs
+        current_run = list(known_jobs.values())[-1]
+        return {jobid: run for jobid, run in known_jobs.items() if run == current_run}
+
+    def _write_known_jobs(self, known_jobs: Dict[str, str]):
+        # submissions append without the lock, so a job registered right now may be
+        # lost; it is then queried when its own status is asked for
+        tmp_path = self.known_jobs_path.with_name(
+            "{}.{}.tmp".format(self.known_jobs_path.name, os.getpid())
+        )
+        with tmp_path.open("w") as stream:
+            for jobid, run in known_jobs.items():
+                stream.write(_known_job_line(jobid, run))
+        os.replace(str(tmp_path), str(self.known_jobs_path))
+
+    @staticmethod
+    def _cached_record(data: dict, jobid: str) -> Optional[JobRecord]:
+        record, _ = data["records"].get(jobid, (None, None))
+        return JobRecord(*record) if record is not None else None
+
+    def _is_fresh(self, data: dict, jobid: str) -> bool:
+        if jobid not in data["records"]:
+            return False
+        record = self._cached_record(data, jobid)
+        if record is not None and record.stat in TERMINAL_STATS:
+            return True
+        return time.time() - data["refreshed_at"] < self.ttl
+
+    def _refresh(self, data: dict, jobid: str) -> dict:
+        known_jobs = self._known_jobs()
+        current_jobs = self._jobs_of_current_run(known_jobs)
+        jobids = {jobid} | set(current_jobs)
+        refreshed_at = time.time()
+        group = current_job_group() if self.use_job_groups else None
+        records = query_records_batch(sorted(jobids), group)
+        for queried_jobid in jobids:
+            # jobs unknown to bjobs are cached as None until the next refresh
+            data["records"][queried_jobid] = [
+                records.get(queried_jobid),
+                refreshed_at,
+            ]
+        # forget old entries so a reused jobid never hits a stale terminal stat
+        data["records"] = {
+            cached_jobid: entry
+            for cached_jobid, entry in data["records"].items()
+            if refreshed_at - entry[1] < RETENTION
+        }
+        data["refreshed_at"] = refreshed_at
+        self._write(data)
+
+        # jobs that are finished or that neither bjobs nor the history know will not
+        # change any more, so later refreshes leave them out
+        active_jobs = {
+            known_jobid: run
+            for known_jobid, run in current_jobs.items()
+            if known_jobid in records
+            and records[known_jobid].stat not in TERMINAL_STATS
+        }
+        if active_jobs != known_jobs:
+            self._write_known_jobs(active_jobs)
+        return data
+
+    def get_record(self, jobid: int) -> Optional[JobRecord]:
+        """Returns the bjobs record of jobid, or None if bjobs does not know it."""
+        jobid = str(jobid)
+        with OSLayer.file_lock(self.lock_path, shared=True):
+            data = self._read()
+        if not self._is_fresh(data, jobid):
+            with OSLayer.file_lock(self.lock_path):
+                # another process may have refreshed while we waited for the lock
+                data = self._read()
+                if not self._is_fresh(data, jobid):
+                    try:
+                        data = self._refresh(data, jobid)
+                    except (CalledProcessError, OSError) as error:
+                        OSLayer.eprint("[status cache] bjobs failed: {}".format(error))
+                        return None
+
+        return self._cached_record(data, jobid)
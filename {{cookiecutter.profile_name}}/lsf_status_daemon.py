@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+import sys
+import threading
+import time
+from pathlib import Path
+from subprocess import CalledProcessError
+from typing import Optional
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer
+    from CookieCutter import CookieCutter
+    from lsf_batch_query import query_records_batch, JobRecord, TERMINAL_STATS
+    from lsf_job_groups import current_job_group
+    from socket_service import (
+        SocketService,
+        ServiceUnavailable,
+        ServiceAlreadyRunning,
+        request,
+        spawn_detached,
+    )
+else:
+    from .OSLayer import OSLayer
+    from .CookieCutter import CookieCutter
+    from .lsf_batch_query import query_records_batch, JobRecord, TERMINAL_STATS
+    from .lsf_job_groups import current_job_group
+    from .socket_service import (
+        SocketService,
+        ServiceUnavailable,
+        ServiceAlreadyRunning,
+        request,
+        spawn_detached,
+    )
+
+SOCKET_NAME = "status_daemon.sock"
+LOG_NAME = "status_daemon.log"
+IDLE_TIMEOUT = 600.0
+# how long to wait for more newly tracked jobs before querying bjobs
+COALESCE_DELAY = 0.2
+
+
+class StatusDaemon(SocketService):
+    """
+    Keeps an in-memory table of the bjobs record of every job it has been asked
+    about and refreshes it with one bjobs call per poll interval. Jobs that reached
+    a terminal state are not queried again. With use_job_groups, the refresh queries
+    the job group of the current run rather than listing every job.
+    """
+
+    def __init__(
+        self,
+        socket_path: Path,
+        poll_interval: float = 10.0,
+        idle_timeout: float = IDLE_TIMEOUT,
+        request_timeout: float = 30.0,
+        use_job_groups: bool = False,
+    ):
+        super().__init__(socket_path, idle_timeout)
+        self.poll_interval = poll_interval
+        self.use_job_groups = use_job_groups
+        self.request_timeout = request_timeout
+        self._table = dict()
+        self._tracked = set()
+        self._not_found = set()
+        self._condition = threading.Condition()
+        self._refresh_requested = threading.Event()
+
+    def get_record(self, jobid: str) -> Optional[JobRecord]:
+        with self._condition:
+            return self._table.get(jobid)
+
+    def handle_request(self, request: dict) -> dict:
+        jobid = str(request["jobid"])
+        with self._condition:
+            if jobid not in self._table:
+                self._tracked.add(jobid)
+                self._not_found.discard(jobid)
+                self._refresh_requested.set()
+                self._condition.wait_for(
+                    lambda: jobid in self._table or jobid in self._not_found,
+                    timeout=self.request_timeout,
+                )
+            record = self._table.get(jobid)
+            return {"record": record._asdict() if record is not None else None}
+
+    def refresh(self):
+        with self._condition:
+            jobids = sorted(self._tracked)
+        if not jobids:
+            return
+
+        try:
+            group = current_job_group() if self.use_job_groups else None
+            records = query_records_batch(jobids, group)
+        except (CalledProcessError, OSError) as error:
+            OSLayer.eprint("[status daemon] bjobs failed: {}".format(error))
+            return
+
+        with self._condition:
+            self._table.update(records)
+            for jobid in jobids:
+                if jobid not in records:
+                    # aged out of mbatchd or bjobs hiccup: let the client fall back
+                    self._not_found.add(jobid)
+                    self._tracked.discard(jobid)
+                    self._table.pop(jobid, None)
+                elif records[jobid].stat in TERMINAL_STATS:
+                    self._tracked.discard(jobid)
+            self._condition.notify_all()
+
+    def _poll_forever(self):
+        while not self._stopped.is_set():
+            if self._refresh_requested.wait(self.poll_interval):
+                time.sleep(COALESCE_DELAY)
+            self._refresh_requested.clear()
+            self.refresh()
+
+    def start_background_work(self):
+        threading.Thread(target=self._poll_forever, daemon=True).start()
+
+
+class StatusDaemonClient:
+    """
+    Asks the status daemon for the bjobs record of a job. Returns None whenever the
+    daemon cannot answer so the caller can fall back to querying bjobs itself.
+    """
+
+    def __init__(
+        self,
+        socket_path: Optional[Path] = None,
+        timeout: float = 60.0,
+        autostart: bool = True,
+    ):
+        if socket_path is None:
+            socket_path = OSLayer.state_dir() / SOCKET_NAME
+        self.socket_path = Path(socket_path)
+        self.timeout = timeout
+        self.autostart = autostart
+
+    def get_record(self, jobid: int) -> Optional[JobRecord]:
+        try:
+            response = request(self.socket_path, {"jobid": str(jobid)}, self.timeout)
+        except ServiceUnavailable:
+            if self.autostart:
+                self.start_daemon()
+            return None
+        record = response.get("record")
+        return JobRecord(**record) if record is not None else None
+
+    def start_daemon(self):
+        argv = [sys.executable, str(Path(__file__).absolute()), str(self.socket_path)]
+        spawn_detached(argv, log=self.socket_path.with_name(LOG_NAME))
+
+
+if __name__ == "__main__":
+    daemon = StatusDaemon(
+        Path(sys.argv[1]),
+        poll_interval=CookieCutter.get_status_daemon_poll_interval(),
+        use_job_groups=CookieCutter.use_job_groups(),
+    )
+    try:
+        daemon.serve_forever()
+    except ServiceAlreadyRunning:
+        pass
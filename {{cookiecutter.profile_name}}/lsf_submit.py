@@ -1,14 +1,12 @@
 #!/usr/bin/env python3
+import json
 import math
-import os
 import re
+import shlex
 import subprocess
 import sys
-import time
 from pathlib import Path
-from typing import List, Union, Optional
-
-from snakemake.utils import read_job_properties
+from typing import TYPE_CHECKING, List, Union, Optional
 
 if not __name__.startswith("tests.src."):
     sys.path.append(str(Path(__file__).parent.absolute()))
@@ -22,8 +20,40 @@ else:
     from .lsf_config import Config
     from .memory_units import Unit, Memory
 
+if TYPE_CHECKING:
+    # the optional features are only imported when they are enabled, to keep
+    # submissions fast
+    from lsf_status_cache import StatusCache
+    from job_registry import JobRegistry
+    from usage_history import MemoryPredictor, RuntimePredictor
+    from lsf_queue_router import QueueRouter
+    from directory_cache import DirectoryCache
+    from lsf_job_groups import JobGroups
+    from lsf_batch_submit import SubmissionSpool
+
+try:
+    from functools import cached_property
+except ImportError:  # python < 3.8
+
+    class cached_property:
+        def __init__(self, func):
+            self.func = func
+            self.__doc__ = func.__doc__
+
+        def __get__(self, instance, owner=None):
+            if instance is None:
+                return self
+            value = instance.__dict__[self.func.__name__] = self.func(instance)
+            return value
+
+
 PathLike = Union[str, Path]
 
+CONFIG_CACHE_NAME = "lsf_config.pickle"
+PROPERTIES_HEADER = re.compile(r"# properties = (.*)")
+# resources that set the run limit (bsub -W) of a job
+RUNTIME_RESOURCES = ("time", "runtime", "walltime", "time_min")
+
 
 class BsubInvocationError(Exception):
     pass
@@ -33,13 +63,47 @@ class JobidNotFoundError(Exception):
     pass
 
 
+def read_job_properties(jobscript: PathLike) -> dict:
+    """Reads the job properties snakemake writes into the header of the jobscript.
+    snakemake itself is only imported for jobscripts without that header, as
+    importing it takes longer than the rest of a submission.
+    """
+    with open(str(jobscript)) as stream:
+        for line in stream:
+            match = PROPERTIES_HEADER.match(line)
+            if match:
+                return json.loads(match.group(1))
+
+    from snakemake.utils import read_job_properties as snakemake_read_job_properties
+
+    return snakemake_read_job_properties(jobscript)
+
+
 class Submitter:
+    """
+    Builds and runs the bsub command for one jobscript. Everything derived from the
+    job properties is computed on first use and then cached, as the job properties,
+    cookiecutter settings and lsf.yaml do not change during a submission.
+    """
+
     def __init__(
         self,
         jobscript: PathLike,
         cluster_cmds: List[str] = None,
         memory_units: Unit = Unit.MEGA,
         lsf_config: Optional[Config] = None,
+        status_cache: Optional["StatusCache"] = None,
+        job_registry: Optional["JobRegistry"] = None,
+        batch_spool: Optional["SubmissionSpool"] = None,
+        batch_mode: str = "array",
+        batch_window: float = 1.0,
+        batch_max_size: int = 1000,
+        memory_predictor: Optional["MemoryPredictor"] = None,
+        runtime_predictor: Optional["RuntimePredictor"] = None,
+        queue_router: Optional["QueueRouter"] = None,
+        logdir_cache: Optional["DirectoryCache"] = None,
+        remove_stale_logs: bool = True,
+        job_groups: Optional["JobGroups"] = None,
     ):
         if cluster_cmds is None:
             cluster_cmds = []
@@ -47,11 +111,24 @@ class Submitter:
             lsf_config = Config()
 
         self._jobscript = jobscript
-        self._cluster_cmd = " ".join(cluster_cmds)
+        # re-split like the shell that used to run the joined bsub command did
+        self._cluster_cmd = shlex.split(" ".join(cluster_cmds))
         self._job_properties = read_job_properties(self._jobscript)
         self.random_string = OSLayer.get_uuid4_string()
         self._memory_units = memory_units
         self.lsf_config = lsf_config
+        self.status_cache = status_cache
+        self.job_registry = job_registry
+        self.batch_spool = batch_spool
+        self.batch_mode = batch_mode
+        self.batch_window = batch_window
+        self.batch_max_size = batch_max_size
+        self.memory_predictor = memory_predictor
+        self.runtime_predictor = runtime_predictor
+        self.queue_router = queue_router
+        self.logdir_cache = logdir_cache
+        self.remove_stale_logs = remove_stale_logs
+        self.job_groups = job_groups
 
     @property
     def jobscript(self) -> str:
@@ -61,71 +138,113 @@ class Submitter:
     def job_properties(self) -> dict:
         return self._job_properties
 
-    @property
+    @cached_property
     def cluster(self) -> dict:
         return self.job_properties.get("cluster", dict())
 
-    @property
+    @cached_property
     def threads(self) -> int:
         return self.job_properties.get("threads", 1)
 
-    @property
+    @cached_property
     def resources(self) -> dict:
         return self.job_properties.get("resources", dict())
 
-    @property
+    @cached_property
     def mem_mb(self) -> Memory:
-        mem_value = self.resources.get(
-            "mem_mb", self.cluster.get("mem_mb", CookieCutter.get_default_mem_mb())
-        )
-        return Memory(mem_value, unit=Unit.MEGA)
+        if "mem_mb" in self.resources:
+            return Memory(self.resources["mem_mb"], unit=Unit.MEGA)
+        if "mem_mb" in self.cluster:
+            return Memory(self.cluster["mem_mb"], unit=Unit.MEGA)
+        if self.predicted_mem_mb is not None:
+            return self.predicted_mem_mb
+        return Memory(CookieCutter.get_default_mem_mb(), unit=Unit.MEGA)
+
+    @cached_property
+    def predicted_mem_mb(self) -> Optional[Memory]:
+        """Memory predicted from past jobs, for rules that do not set mem_mb or
+        -M."""
+        if self.memory_predictor is None:
+            return None
+        if "mem_mb" in self.resources or "mem_mb" in self.cluster:
+            return None
+        if "-M" in self.rule_specific_params:
+            return None
+        return self.memory_predictor.predict(self.rule_name, self.wildcards)
+
+    @cached_property
+    def predicted_run_limit(self) -> Optional[int]:
+        """Run limit in minutes predicted from past jobs, for rules that do not set
+        one."""
+        if self.runtime_predictor is None:
+            return None
+        if any(self.resources.get(name, False) for name in RUNTIME_RESOURCES):
+            return None
+        if "-W" in self.rule_specific_params:
+            return None
+        return self.runtime_predictor.predict(self.rule_name, self.wildcards)
+
+    @cached_property
+    def predictions(self) -> dict:
+        predictions = dict()
+        if self.predicted_mem_mb is not None:
+            predictions["mem_mb"] = self.predicted_mem_mb.value
+        if self.predicted_run_limit is not None:
+            predictions["run_limit"] = self.predicted_run_limit
+        return predictions
 
     @property
     def memory_units(self) -> Unit:
         return self._memory_units
 
-    @property
-    def resources_cmd(self) -> str:
+    @cached_property
+    def resources_cmd(self) -> List[str]:
         mem_in_clusters_units = self.mem_mb.to(self.memory_units)
         mem_value_to_submit = math.ceil(mem_in_clusters_units.value)
-        resources_str = (
-            "-M {mem} -n {threads} -R 'select[mem>{mem}] "
-            "rusage[mem={mem}] span[hosts=1]'".format(
-                mem=mem_value_to_submit, threads=self.threads
-            )
-        )
+        resources_args = [
+            "-M",
+            str(mem_value_to_submit),
+            "-n",
+            str(self.threads),
+            "-R",
+            "select[mem>{mem}] rusage[mem={mem}] span[hosts=1]".format(
+                mem=mem_value_to_submit
+            ),
+        ]
 
-        for time_str in ("time", "runtime", "walltime", "time_min"):
+        for time_str in RUNTIME_RESOURCES:
             if self.resources.get(time_str, False):
-                resources_str += " -W {}".format(self.resources[time_str])
-        return resources_str
+                resources_args += ["-W", str(self.resources[time_str])]
+        if self.predicted_run_limit is not None:
+            resources_args += ["-W", str(self.predicted_run_limit)]
+        return resources_args
 
-    @property
+    @cached_property
     def wildcards(self) -> dict:
         return self.job_properties.get("wildcards", dict())
 
-    @property
+    @cached_property
     def wildcards_str(self) -> str:
         return (
             ".".join("{}={}".format(k, v) for k, v in self.wildcards.items())
             or "unique"
         )
 
-    @property
+    @cached_property
     def rule_name(self) -> str:
         if not self.is_group_jobtype:
             return self.job_properties.get("rule", "rule_name")
         return self.groupid
 
-    @property
+    @cached_property
     def groupid(self) -> str:
         return self.job_properties.get("groupid", "group")
 
-    @property
+    @cached_property
     def is_group_jobtype(self) -> bool:
         return self.job_properties.get("type", "") == "group"
 
-    @property
+    @cached_property
     def jobname(self) -> str:
         if self.is_group_jobtype:
             return "{groupid}_{jobid}".format(groupid=self.groupid, jobid=self.jobid)
@@ -136,136 +255,321 @@ class Submitter:
             ),
         )
 
-    @property
+    @cached_property
     def jobid(self) -> str:
         if self.is_group_jobtype:
             return self.job_properties.get("jobid", "").split("-")[0]
         return str(self.job_properties.get("jobid"))
 
-    @property
+    @cached_property
     def logdir(self) -> Path:
         project_logdir = Path(self.cluster.get("logdir", CookieCutter.get_log_dir()))
         return project_logdir / self.rule_name / self.wildcards_str
 
-    @property
+    @cached_property
     def outlog(self) -> Path:
         return self.logdir / "jobid{jobid}_{random_string}.out".format(
             jobid=self.jobid, random_string=self.random_string
         )
 
-    @property
+    @cached_property
     def errlog(self) -> Path:
         return self.logdir / "jobid{jobid}_{random_string}.err".format(
             jobid=self.jobid, random_string=self.random_string
         )
 
-    @property
-    def jobinfo_cmd(self) -> str:
-        return '-o "{out_log}" -e "{err_log}" -J "{jobname}"'.format(
-            out_log=self.outlog, err_log=self.errlog, jobname=self.jobname
-        )
+    @cached_property
+    def jobinfo_cmd(self) -> List[str]:
+        return ["-o", str(self.outlog), "-e", str(self.errlog), "-J", self.jobname]
 
-    @property
+    @cached_property
     def queue(self) -> str:
-        if re.search(r"-q ", self.rule_specific_params):
+        if "-q" in self.rule_specific_params:
             return ""
-        return self.cluster.get("queue", CookieCutter.get_default_queue())
-
-    @property
-    def queue_cmd(self) -> str:
-        return "-q {}".format(self.queue) if self.queue else ""
-
-    @property
-    def rule_specific_params(self) -> str:
+        if "queue" in self.cluster:
+            return self.cluster["queue"]
+        if self.queue_router is not None:
+            candidates = self.lsf_config.queues_for_rule(self.rule_name)
+            if candidates:
+                return self.queue_router.choose(self.rule_name, candidates)
+        return CookieCutter.get_default_queue()
+
+    @cached_property
+    def queue_cmd(self) -> List[str]:
+        return ["-q", self.queue] if self.queue else []
+
+    @cached_property
+    def rule_specific_params(self) -> List[str]:
         return self.lsf_config.params_for_rule(self.rule_name)
 
-    @property
+    @cached_property
     def proj(self) -> str:
-        if re.search(r"-P ", self.rule_specific_params):
+        if "-P" in self.rule_specific_params:
             return ""
         return self.cluster.get("project", CookieCutter.get_default_project())
 
-    @property
-    def proj_cmd(self) -> str:
-        return "-P {}".format(self.proj) if self.proj else ""
+    @cached_property
+    def proj_cmd(self) -> List[str]:
+        return ["-P", self.proj] if self.proj else []
+
+    @cached_property
+    def job_group(self) -> Optional[str]:
+        if self.job_groups is None or "-g" in self.rule_specific_params:
+            return None
+        return self.job_groups.group_for(self.jobscript)
+
+    @cached_property
+    def group_cmd(self) -> List[str]:
+        return ["-g", self.job_group] if self.job_group else []
 
     @property
-    def cluster_cmd(self) -> str:
+    def cluster_cmd(self) -> List[str]:
         return self._cluster_cmd
 
-    @property
-    def submit_cmd(self) -> str:
-        params = [
-            "bsub",
-            self.resources_cmd,
-            self.jobinfo_cmd,
-            self.queue_cmd,
-            self.proj_cmd,
-            self.cluster_cmd,
-            self.rule_specific_params,
-            self.jobscript,
-        ]
-        return " ".join(p for p in params if p)
+    @cached_property
+    def submit_cmd(self) -> List[str]:
+        return (
+            ["bsub"]
+            + self.resources_cmd
+            + self.jobinfo_cmd
+            + self.queue_cmd
+            + self.proj_cmd
+            + self.group_cmd
+            + self.cluster_cmd
+            + self.rule_specific_params
+            + [str(self.jobscript)]
+        )
+
+    @cached_property
+    def batch_params(self) -> List[str]:
+        """The bsub parameters all jobs of a batch share."""
+        return (
+            self.resources_cmd
+            + self.queue_cmd
+            + self.proj_cmd
+            + self.group_cmd
+            + self.cluster_cmd
+            + self.rule_specific_params
+        )
 
     def _create_logdir(self):
-        OSLayer.mkdir(self.logdir)
+        if self.logdir_cache is not None:
+            self.logdir_cache.mkdir(self.logdir)
+        else:
+            OSLayer.mkdir(self.logdir)
 
     def _remove_previous_logs(self):
         OSLayer.remove_file(self.outlog)
         OSLayer.remove_file(self.errlog)
 
-    def _submit_cmd_and_get_external_job_id(self) -> int:
-        start_time = time.time()
-        # Wait for the jobscript to be created
-        while not os.path.exists(self.jobscript):
-            if time.time() - start_time >= CookieCutter.jobscript_timeout():
-                # The file was not created within the specified timeout period
-                raise TimeoutError("Timed out waiting for jobscript to be created")
-
-            # Sleep for a short amount of time before checking again
-            time.sleep(0.1)
+    def _wait_for_jobscript(self):
+        # snakemake has almost always written the jobscript already
+        if Path(self.jobscript).exists():
+            return
+        if not OSLayer.wait_for_file(self.jobscript, CookieCutter.jobscript_timeout()):
+            # The file was not created within the specified timeout period
+            raise TimeoutError("Timed out waiting for jobscript to be created")
 
+    def _submit_cmd_and_get_external_job_id(self) -> int:
+        self._wait_for_jobscript()
         output_stream, error_stream = OSLayer.run_process(self.submit_cmd)
         match = re.search(r"Job <(\d+)> is submitted", output_stream)
         jobid = match.group(1)
         return int(jobid)
 
+    def _add_to_batch(self) -> str:
+        """Adds the job to a batch, starting the process that submits the batch if
+        this job opened it. A job array only takes jobs with the same rule and bsub
+        parameters, a job pack takes any job. Returns the id of the job within its
+        batch.
+        """
+        if not __name__.startswith("tests.src."):
+            from lsf_batch_submit import batch_key, element_id, PACK, PACK_KEY
+        else:
+            from .lsf_batch_submit import batch_key, element_id, PACK, PACK_KEY
+
+        self._wait_for_jobscript()
+        entry = {
+            "jobscript": str(self.jobscript),
+            "outlog": str(self.outlog),
+            "errlog": str(self.errlog),
+            "submit_cmd": self.submit_cmd,
+            "params": self.batch_params,
+            "array_name": self.rule_name,
+            "array_logdir": str(self.logdir.parent),
+            "rule": self.rule_name,
+            "wildcards": self.wildcards,
+            "resources": self.resources,
+            "predictions": self.predictions,
+        }
+        if self.batch_mode == PACK:
+            key = PACK_KEY
+        else:
+            key = batch_key(self.rule_name, self.batch_params)
+        batch_id, index, opened = self.batch_spool.add(key, entry, self.batch_max_size)
+        if opened:
+            self.batch_spool.start_flusher(
+                key, batch_id, self.batch_window, self.batch_mode
+            )
+        return element_id(batch_id, index)
+
     def _get_parameters_to_status_script(self, external_job_id: int) -> str:
         return "{external_job_id} {outlog}".format(
             external_job_id=external_job_id, outlog=self.outlog
         )
 
     def submit(self):
+        OSLayer.print(self.submit_job())
+
+    def submit_job(self) -> str:
+        """Submits the job and returns the parameters for the status script."""
         self._create_logdir()
-        self._remove_previous_logs()
+        # the log names contain a fresh uuid, so there is only ever something to
+        # remove if the same name was generated before
+        if self.remove_stale_logs:
+            self._remove_previous_logs()
+        if self.batch_spool is not None:
+            return self._get_parameters_to_status_script(self._add_to_batch())
         try:
             external_job_id = self._submit_cmd_and_get_external_job_id()
-            parameters_to_status_script = self._get_parameters_to_status_script(
-                external_job_id
-            )
-            OSLayer.print(parameters_to_status_script)
+            if self.status_cache is not None:
+                self.status_cache.register_job(external_job_id, self.jobscript)
+            if self.job_registry is not None:
+                self.job_registry.record_submission(
+                    external_job_id,
+                    rule=self.rule_name,
+                    wildcards=self.wildcards,
+                    resources=self.resources,
+                    outlog=self.outlog,
+                    errlog=self.errlog,
+                )
+                if self.predictions:
+                    self.job_registry.record_predictions(
+                        external_job_id, **self.predictions
+                    )
+            return self._get_parameters_to_status_script(external_job_id)
         except subprocess.CalledProcessError as error:
             raise BsubInvocationError(error)
         except AttributeError as error:
             raise JobidNotFoundError(error)
 
 
+def memory_predictor_from_settings(
+    job_registry: Optional["JobRegistry"],
+) -> Optional["MemoryPredictor"]:
+    percentile = CookieCutter.get_memory_prediction_percentile()
+    if percentile <= 0:
+        return None
+    if job_registry is None:
+        raise ValueError("memory_prediction_percentile requires use_job_registry")
+    if not __name__.startswith("tests.src."):
+        from usage_history import MemoryPredictor
+    else:
+        from .usage_history import MemoryPredictor
+
+    return MemoryPredictor(
+        job_registry,
+        percent=percentile,
+        headroom=CookieCutter.get_memory_prediction_headroom(),
+    )
+
+
+def runtime_predictor_from_settings(
+    job_registry: Optional["JobRegistry"],
+) -> Optional["RuntimePredictor"]:
+    percentile = CookieCutter.get_runtime_prediction_percentile()
+    if percentile <= 0:
+        return None
+    if job_registry is None:
+        raise ValueError("runtime_prediction_percentile requires use_job_registry")
+    if not __name__.startswith("tests.src."):
+        from usage_history import RuntimePredictor
+    else:
+        from .usage_history import RuntimePredictor
+
+    wildcards = CookieCutter.get_runtime_prediction_wildcards()
+    return RuntimePredictor(
+        job_registry,
+        percent=percentile,
+        headroom=CookieCutter.get_runtime_prediction_headroom(),
+        wildcards=[name.strip() for name in wildcards.split(",") if name.strip()],
+    )
+
+
+def queue_router_from_settings(lsf_config: Config) -> Optional["QueueRouter"]:
+    if not lsf_config.routes_queues():
+        return None
+    if not __name__.startswith("tests.src."):
+        from lsf_queue_router import QueueRouter, QueueLoadCache
+    else:
+        from .lsf_queue_router import QueueRouter, QueueLoadCache
+
+    return QueueRouter(QueueLoadCache(CookieCutter.get_queue_load_ttl()))
+
+
+def job_groups_from_settings() -> Optional["JobGroups"]:
+    if not CookieCutter.use_job_groups():
+        return None
+    if not __name__.startswith("tests.src."):
+        from lsf_job_groups import JobGroups
+    else:
+        from .lsf_job_groups import JobGroups
+
+    return JobGroups(limit=CookieCutter.get_job_group_limit())
+
+
 if __name__ == "__main__":
     workdir = Path().resolve()
     config_file = workdir / "lsf.yaml"
     if config_file.exists():
-        with config_file.open() as stream:
-            lsf_config = Config.from_stream(stream)
+        lsf_config = Config.from_path(
+            config_file, cache_path=OSLayer.state_dir() / CONFIG_CACHE_NAME
+        )
     else:
         lsf_config = Config()
 
     jobscript = sys.argv[-1]
     cluster_cmds = sys.argv[1:-1]
     memory_units = Unit.from_suffix(CookieCutter.get_lsf_unit_for_limits())
+    status_cache_ttl = CookieCutter.get_status_cache_ttl()
+    if status_cache_ttl > 0:
+        import lsf_status_cache
+
+        status_cache = lsf_status_cache.StatusCache(status_cache_ttl)
+    else:
+        status_cache = None
+    batch_submission = CookieCutter.get_batch_submission()
+    if batch_submission == "none":
+        batch_spool = None
+    else:
+        import lsf_batch_submit
+
+        if batch_submission not in (lsf_batch_submit.ARRAY, lsf_batch_submit.PACK):
+            raise ValueError(
+                "Unknown value for batch_submission: {}".format(batch_submission)
+            )
+        batch_spool = lsf_batch_submit.SubmissionSpool()
+    if CookieCutter.use_job_registry():
+        import job_registry as registry
+
+        job_registry = registry.JobRegistry()
+    else:
+        job_registry = None
     lsf_submit = Submitter(
         jobscript=jobscript,
         memory_units=memory_units,
         lsf_config=lsf_config,
         cluster_cmds=cluster_cmds,
+        status_cache=status_cache,
+        job_registry=job_registry,
+        batch_spool=batch_spool,
+        batch_mode=batch_submission,
+        batch_window=CookieCutter.get_batch_submission_window(),
+        batch_max_size=CookieCutter.get_batch_submission_max_size(),
+        memory_predictor=memory_predictor_from_settings(job_registry),
+        runtime_predictor=runtime_predictor_from_settings(job_registry),
+        queue_router=queue_router_from_settings(lsf_config),
+        remove_stale_logs=CookieCutter.remove_stale_logs(),
+        job_groups=job_groups_from_settings(),
     )
     lsf_submit.submit()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+import sys
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer
+    from CookieCutter import CookieCutter
+    from lsf_config import Config
+    from memory_units import Unit
+    from lsf_status_cache import StatusCache
+    from job_registry import JobRegistry
+    from usage_history import MemoryPredictor, RuntimePredictor
+    from lsf_queue_router import QueueRouter
+    from lsf_batch_submit import SubmissionSpool, ARRAY, PACK
+    from directory_cache import DirectoryCache
+    from lsf_job_groups import JobGroups
+    from lsf_submit import (
+        Submitter,
+        CONFIG_CACHE_NAME,
+        memory_predictor_from_settings,
+        runtime_predictor_from_settings,
+        job_groups_from_settings,
+        queue_router_from_settings,
+    )
+    from socket_service import SocketService, ServiceAlreadyRunning
+else:
+    from .OSLayer import OSLayer
+    from .CookieCutter import CookieCutter
+    from .lsf_config import Config
+    from .memory_units import Unit
+    from .lsf_status_cache import StatusCache
+    from .job_registry import JobRegistry
+    from .usage_history import MemoryPredictor, RuntimePredictor
+    from .lsf_queue_router import QueueRouter
+    from .lsf_batch_submit import SubmissionSpool, ARRAY, PACK
+    from .directory_cache import DirectoryCache
+    from .lsf_job_groups import JobGroups
+    from .lsf_submit import (
+        Submitter,
+        CONFIG_CACHE_NAME,
+        memory_predictor_from_settings,
+        runtime_predictor_from_settings,
+        job_groups_from_settings,
+        queue_router_from_settings,
+    )
+    from .socket_service import SocketService, ServiceAlreadyRunning
+
+IDLE_TIMEOUT = 600.0
+
+
+class SubmitBroker(SocketService):
+    """
+    Submits jobs on behalf of lsf_submit_client.py. The parsed lsf.yaml and the
+    profile settings are loaded once and kept for the lifetime of the broker. Each
+    request is served on its own thread; at most workers of them run bsub at the
+    same time.
+    """
+
+    def __init__(
+        self,
+        socket_path: Path,
+        config_path: Path,
+        memory_units: Unit = Unit.MEGA,
+        status_cache: Optional[StatusCache] = None,
+        job_registry: Optional[JobRegistry] = None,
+        batch_spool: Optional[SubmissionSpool] = None,
+        batch_mode: str = ARRAY,
+        batch_window: float = 1.0,
+        batch_max_size: int = 1000,
+        memory_predictor: Optional[MemoryPredictor] = None,
+        runtime_predictor: Optional[RuntimePredictor] = None,
+        queue_router: Optional[QueueRouter] = None,
+        workers: int = 8,
+        idle_timeout: float = IDLE_TIMEOUT,
+        remove_stale_logs: bool = True,
+        job_groups: Optional[JobGroups] = None,
+    ):
+        super().__init__(socket_path, idle_timeout)
+        self.config_path = Path(config_path)
+        self.memory_units = memory_units
+        self.status_cache = status_cache
+        self.job_registry = job_registry
+        self.batch_spool = batch_spool
+        self.batch_mode = batch_mode
+        self.batch_window = batch_window
+        self.batch_max_size = batch_max_size
+        self.memory_predictor = memory_predictor
+        self.runtime_predictor = runtime_predictor
+        self.queue_router = queue_router
+        self.remove_stale_logs = remove_stale_logs
+        self.job_groups = job_groups
+        self.logdir_cache = DirectoryCache()
+        self._workers = threading.BoundedSemaphore(workers)
+        self._config_lock = threading.Lock()
+        self._config = Config()
+        self._config_source = None
+
+    @property
+    def lsf_config(self) -> Config:
+        """The parsed config file, reloaded whenever the file changes."""
+        try:
+            stat = self.config_path.stat()
+            source = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            source = None
+        with self._config_lock:
+            if source != self._config_source:
+                if source is None:
+                    self._config = Config()
+                else:
+                    self._config = Config.from_path(
+                        self.config_path,
+                        cache_path=OSLayer.state_dir() / CONFIG_CACHE_NAME,
+                    )
+                self._config_source = source
+            return self._config
+
+    def _queue_router_for(self, lsf_config: Config) -> Optional[QueueRouter]:
+        # built once the config lists candidate queues, as most configs do not
+        if self.queue_router is None:
+            self.queue_router = queue_router_from_settings(lsf_config)
+        return self.queue_router
+
+    def submitter(self, jobscript: str, cluster_cmds: List[str]) -> Submitter:
+        lsf_config = self.lsf_config
+        return Submitter(
+            jobscript=jobscript,
+            memory_units=self.memory_units,
+            lsf_config=lsf_config,
+            cluster_cmds=cluster_cmds,
+            status_cache=self.status_cache,
+            job_registry=self.job_registry,
+            batch_spool=self.batch_spool,
+            batch_mode=self.batch_mode,
+            batch_window=self.batch_window,
+            batch_max_size=self.batch_max_size,
+            memory_predictor=self.memory_predictor,
+            runtime_predictor=self.runtime_predictor,
+            queue_router=self._queue_router_for(lsf_config),
+            logdir_cache=self.logdir_cache,
+            remove_stale_logs=self.remove_stale_logs,
+            job_groups=self.job_groups,
+        )
+
+    def handle_request(self, request: dict) -> dict:
+        submitter = self.submitter(request["jobscript"], request["cluster_cmds"])
+        with self._workers:
+            return {"output": submitter.submit_job()}
+
+
+if __name__ == "__main__":
+    status_cache_ttl = CookieCutter.get_status_cache_ttl()
+    batch_submission = CookieCutter.get_batch_submission()
+    if batch_submission not in (ARRAY, PACK, "none"):
+        raise ValueError(
+            "Unknown value for batch_submission: {}".format(batch_submission)
+        )
+    job_registry = JobRegistry() if CookieCutter.use_job_registry() else None
+    broker = SubmitBroker(
+        Path(sys.argv[1]),
+        config_path=Path().resolve() / "lsf.yaml",
+        memory_units=Unit.from_suffix(CookieCutter.get_lsf_unit_for_limits()),
+        status_cache=StatusCache(status_cache_ttl) if status_cache_ttl > 0 else None,
+        job_registry=job_registry,
+        batch_spool=SubmissionSpool() if batch_submission != "none" else None,
+        batch_mode=batch_submission,
+        batch_window=CookieCutter.get_batch_submission_window(),
+        batch_max_size=CookieCutter.get_batch_submission_max_size(),
+        memory_predictor=memory_predictor_from_settings(job_registry),
+        runtime_predictor=runtime_predictor_from_settings(job_registry),
+        workers=CookieCutter.get_submit_broker_workers(),
+        remove_stale_logs=CookieCutter.remove_stale_logs(),
+        job_groups=job_groups_from_settings(),
+    )
+    try:
+        broker.serve_forever()
+    except ServiceAlreadyRunning:
+        pass
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+import runpy
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer
+    from socket_service import (
+        ServiceUnavailable,
+        RequestFailed,
+        request,
+        spawn_detached,
+    )
+else:
+    from .OSLayer import OSLayer
+    from .socket_service import (
+        ServiceUnavailable,
+        RequestFailed,
+        request,
+        spawn_detached,
+    )
+
+SOCKET_NAME = "submit_broker.sock"
+LOG_NAME = "submit_broker.log"
+BROKER = Path(__file__).absolute().with_name("lsf_submit_broker.py")
+SUBMIT_SCRIPT = Path(__file__).absolute().with_name("lsf_submit.py")
+
+
+class SubmissionFailed(Exception):
+    pass
+
+
+class SubmitBrokerClient:
+    """
+    Hands a submission to the submit broker. Returns None when the broker is not
+    running, after starting it, so the caller can submit the job itself.
+
+    Once a request has reached the broker the job may have been submitted, so a
+    missing answer raises SubmissionFailed instead of falling back, which could
+    submit the job twice.
+    """
+
+    def __init__(
+        self,
+        socket_path: Optional[Path] = None,
+        timeout: float = 300.0,
+        autostart: bool = True,
+    ):
+        if socket_path is None:
+            socket_path = OSLayer.state_dir() / SOCKET_NAME
+        self.socket_path = Path(socket_path)
+        self.timeout = timeout
+        self.autostart = autostart
+
+    def submit(self, jobscript: str, cluster_cmds: List[str]) -> Optional[str]:
+        payload = {
+            "jobscript": str(Path(jobscript).absolute()),
+            "cluster_cmds": cluster_cmds,
+        }
+        try:
+            response = request(self.socket_path, payload, self.timeout)
+        except RequestFailed as error:
+            raise SubmissionFailed(error)
+        except ServiceUnavailable:
+            if self.autostart:
+                self.start_broker()
+            return None
+        if "error" in response:
+            raise SubmissionFailed(response["error"])
+        return response["output"]
+
+    def start_broker(self):
+        argv = [sys.executable, str(BROKER), str(self.socket_path)]
+        spawn_detached(argv, log=self.socket_path.with_name(LOG_NAME))
+
+
+if __name__ == "__main__":
+    client = SubmitBrokerClient()
+    try:
+        output = client.submit(jobscript=sys.argv[-1], cluster_cmds=sys.argv[1:-1])
+    except SubmissionFailed as error:
+        OSLayer.eprint("[submit broker] {}".format(error))
+        sys.exit(1)
+
+    if output is None:
+        runpy.run_path(str(SUBMIT_SCRIPT), run_name="__main__")
+    else:
+        OSLayer.print(output)
@@ -0,0 +1,77 @@
+import hashlib
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer
+else:
+    from .OSLayer import OSLayer
+
+DIRECTORY_NAME = "terminal_states"
+PRUNE_MARKER = ".last_prune"
+
+
+class TerminalStateStore:
+    """
+    Remembers the final status (success/failed) of jobs so later status checks of
+    the same job are answered without running anything. Each job is one small file
+    named after its LSF jobid and a digest of its outlog, so a reused jobid never
+    matches an older job. Entries older than max_age seconds are ignored and
+    eventually deleted.
+    """
+
+    def __init__(self, max_age: float, directory: Optional[Path] = None):
+        if directory is None:
+            directory = OSLayer.state_dir() / DIRECTORY_NAME
+        self.max_age = max_age
+        self.directory = Path(directory)
+
+    def _path(self, jobid: int, outlog: str) -> Path:
+        digest = hashlib.sha1(str(outlog).encode()).hexdigest()[:16]
+        return self.directory / "{}_{}".format(jobid, digest)
+
+    def _is_expired(self, path: Path) -> bool:
+        return time.time() - path.stat().st_mtime > self.max_age
+
+    def get(self, jobid: int, outlog: str) -> Optional[str]:
+        path = self._path(jobid, outlog)
+        try:
+            if self._is_expired(path):
+                path.unlink()
+                return None
+            return path.read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def record(self, jobid: int, outlog: str, status: str):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(jobid, outlog)
+        tmp_path = path.with_name("{}.{}.tmp".format(path.name, os.getpid()))
+        tmp_path.write_text(status)
+        os.replace(str(tmp_path), str(path))
+        self._prune_if_due()
+
+    def _prune_if_due(self):
+        marker = self.directory / PRUNE_MARKER
+        try:
+            if not self._is_expired(marker):
+                return
+        except FileNotFoundError:
+            pass
+        marker.touch()
+        self.prune()
+
+    def prune(self):
+        """Deletes all expired entries."""
+        for path in self.directory.iterdir():
+            if path.name == PRUNE_MARKER:
+                continue
+            try:
+                if self._is_expired(path):
+                    path.unlink()
+            except FileNotFoundError:  # pruned by a concurrent process
+                pass
@@ -18,7 +18,6 @@ class InvalidMemoryString(Exception):
 
 Scale = namedtuple("Scale", ["power", "metric_suffix"])
 
-
 SCALE_MAP = {
     "B": Scale(0, "B"),
     "K": Scale(1, "KB"),
@@ -0,0 +1,83 @@
+import random
+import time
+from typing import Iterator, Optional, Tuple
+
+
+class InvalidRetryStrategy(Exception):
+    pass
+
+
+class RetryPolicy:
+    """
+    Decides how long to wait between attempts of a flaky operation.
+
+    fixed waits base_wait every time. exponential doubles the wait after every
+    attempt. decorrelated_jitter picks a random wait between base_wait and three
+    times the previous wait, which spreads the retries of many processes that
+    failed at the same moment. Waits never exceed max_wait, and no attempt is
+    started if it would begin after time_budget seconds (0 means no budget).
+    """
+
+    FIXED = "fixed"
+    EXPONENTIAL = "exponential"
+    DECORRELATED_JITTER = "decorrelated_jitter"
+    STRATEGIES = (FIXED, EXPONENTIAL, DECORRELATED_JITTER)
+
+    def __init__(
+        self,
+        strategy: str = FIXED,
+        base_wait: float = 0.001,
+        max_attempts: int = 1,
+        max_wait: float = 60.0,
+        time_budget: float = 0.0,
+        rng: Optional[random.Random] = None,
+    ):
+        if strategy not in self.STRATEGIES:
+            raise InvalidRetryStrategy(
+                "{strategy}. Valid strategies are: {valid}".format(
+                    strategy=strategy, valid=",".join(self.STRATEGIES)
+                )
+            )
+        self.strategy = strategy
+        self.base_wait = base_wait
+        self.max_attempts = max_attempts
+        self.max_wait = max_wait
+        self.time_budget = time_budget
+        self._rng = rng if rng is not None else random.Random()
+
+    def waits(self) -> Iterator[float]:
+        """Yields the wait before the second, third, ... attempt."""
+        wait = self.base_wait
+        while True:
+            if self.strategy == self.EXPONENTIAL:
+                yield min(wait, self.max_wait)
+                wait *= 2
+            elif self.strategy == self.DECORRELATED_JITTER:
+                wait = min(self.max_wait, self._rng.uniform(self.base_wait, wait * 3))
+                yield wait
+            else:
+                yield min(wait, self.max_wait)
+
+    def schedule(self) -> Iterator[Tuple[int, float]]:
+        """Yields the number of each attempt, starting at 0, with the wait before it.
+        Stops after max_attempts or when the time budget would be exceeded.
+        """
+        start = time.monotonic()
+        waits = self.waits()
+        for attempt in range(self.max_attempts):
+            wait = 0.0
+            if attempt > 0:
+                wait = next(waits)
+                elapsed = time.monotonic() - start
+                if self.time_budget and elapsed + wait > self.time_budget:
+                    return
+            yield attempt, wait
+
+    def attempts(self) -> Iterator[int]:
+        """Yields the number of each attempt, starting at 0, and sleeps in between.
+        Stops after max_attempts or when the time budget would be exceeded.
+        """
+        for attempt, wait in self.schedule():
+            if wait:
+                time.sleep(wait)
+            yield attempt
@@ -0,0 +1,141 @@
+import json
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer
+else:
+    from .OSLayer import OSLayer
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+
+class RequestFailed(ServiceUnavailable):
+    """The request reached the service but no response came back, so it may or may
+    not have been carried out."""
+
+
+class ServiceAlreadyRunning(Exception):
+    pass
+
+
+def request(socket_path: Path, payload: dict, timeout: float) -> dict:
+    """Sends one JSON request to the service listening on socket_path and returns
+    its JSON response. Raises ServiceUnavailable if the service cannot be reached,
+    and RequestFailed if it was reached but did not answer.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(str(socket_path))
+        except OSError as error:
+            raise ServiceUnavailable("{}: {}".format(socket_path, error))
+        try:
+            sock.sendall(json.dumps(payload).encode() + b"\n")
+            with sock.makefile("rb") as stream:
+                line = stream.readline()
+        except OSError as error:
+            raise RequestFailed("{}: {}".format(socket_path, error))
+
+    if not line:
+        raise RequestFailed("{}: connection closed".format(socket_path))
+    return json.loads(line.decode())
+
+
+def spawn_detached(argv: List[str], log: Path):
+    """Starts argv in its own session so it outlives the calling process."""
+    with open(str(log), "ab") as log_stream:
+        subprocess.Popen(
+            argv,
+            stdin=subprocess.DEVNULL,
+            stdout=log_stream,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+            close_fds=True,
+        )
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        service = self.server.service
+        service.touch()
+        try:
+            response = service.handle_request(json.loads(line.decode()))
+        except Exception as error:
+            response = {"error": "{}: {}".format(type(error).__name__, error)}
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class SocketService:
+    """
+    Base class for the profile's optional long-lived helper processes. The service
+    answers newline-delimited JSON requests on a Unix socket and shuts itself down
+    after idle_timeout seconds without a request. Only one instance per socket path
+    can run at a time.
+    """
+
+    def __init__(self, socket_path: Path, idle_timeout: float):
+        self.socket_path = Path(socket_path)
+        self.idle_timeout = idle_timeout
+        self._last_request = time.time()
+        self._server = None
+        self._stopped = threading.Event()
+
+    @property
+    def lock_path(self) -> Path:
+        return self.socket_path.with_name(self.socket_path.name + ".lock")
+
+    def touch(self):
+        self._last_request = time.time()
+
+    def handle_request(self, request: dict) -> dict:
+        raise NotImplementedError
+
+    def start_background_work(self):
+        """Hook for subclasses that need their own threads next to the server."""
+
+    def _watch_idleness(self):
+        while not self._stopped.wait(min(1.0, self.idle_timeout)):
+            if time.time() - self._last_request > self.idle_timeout:
+                self.shutdown()
+
+    def shutdown(self):
+        self._stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
+
+    def serve_forever(self):
+        try:
+            with OSLayer.file_lock(self.lock_path, blocking=False):
+                # holding the lock means any existing socket file is stale
+                if self.socket_path.exists():
+                    self.socket_path.unlink()
+                self._server = _UnixServer(str(self.socket_path), _RequestHandler)
+                self._server.service = self
+                try:
+                    self.start_background_work()
+                    threading.Thread(target=self._watch_idleness, daemon=True).start()
+                    self._server.serve_forever(poll_interval=0.5)
+                finally:
+                    self._stopped.set()
+                    self._server.server_close()
+                    if self.socket_path.exists():
+                        self.socket_path.unlink()
+        except BlockingIOError:
+            raise ServiceAlreadyRunning(str(self.socket_path))
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+import argparse
+import math
+import statistics
+import re
+import sys
+from collections import namedtuple
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer, TailError
+    from memory_units import Unit, Memory, InvalidMemoryString
+    from job_registry import JobRegistry, JobRuntime
+else:
+    from .OSLayer import OSLayer, TailError
+    from .memory_units import Unit, Memory, InvalidMemoryString
+    from .job_registry import JobRegistry, JobRuntime
+
+SUMMARY_HEADER = "Resource usage summary:"
+SUMMARY_FIELD = re.compile(r"^(CPU time|Max Memory|Run time)\s*:\s*(.*)$")
+SECONDS = re.compile(r"^([0-9]*\.?[0-9]+)\s*sec")
+
+ResourceUsage = namedtuple("ResourceUsage", ["max_mem_mb", "run_time", "cpu_time"])
+ResourceUsage.__doc__ = """What a finished job used: peak memory in MB, and run and CPU
+time in seconds. Fields LSF did not report are None."""
+
+RuntimeReport = namedtuple(
+    "RuntimeReport",
+    [
+        "rule",
+        "jobs",
+        "predicted_jobs",
+        "run_limit",
+        "run_time",
+        "max_run_time",
+        "over_limit",
+        "wait_with_limit",
+        "wait_without_limit",
+    ],
+)
+RuntimeReport.__doc__ = """Predicted versus actual run time of the jobs of one rule.
+run_limit is the median predicted run limit, run_time the median and max_run_time the
+longest run time, all in minutes. over_limit counts the jobs that ran into their
+predicted limit. wait_with_limit and wait_without_limit are the median minutes from
+submission to start of jobs with a predicted limit and of jobs without any run limit.
+Values that cannot be computed are None."""
+
+
+def _parse_seconds(value: str) -> Optional[float]:
+    match = SECONDS.match(value)
+    return float(match.group(1)) if match else None
+
+
+def _parse_mem_mb(value: str) -> Optional[float]:
+    try:
+        return Memory.from_str(value).to(Unit.MEGA).value
+    except InvalidMemoryString:
+        return None
+
+
+def parse_usage_summary(lines: List[str]) -> Optional[ResourceUsage]:
+    """Reads the "Resource usage summary" LSF appends to the output log of a
+    finished job, e.g.
+
+        Resource usage summary:
+
+            CPU time :                                   0.32 sec.
+            Max Memory :                                 7 MB
+            ...
+            Run time :                                   2 sec.
+
+    Returns None if lines do not contain the summary.
+    """
+    lines = [line.strip() for line in lines]
+    try:
+        start = lines.index(SUMMARY_HEADER)
+    except ValueError:
+        return None
+
+    del lines[:start]
+    fields = dict()
+    for line in lines:
+        match = SUMMARY_FIELD.match(line)
+        if match:
+            fields.setdefault(match.group(1), match.group(2))
+    return ResourceUsage(
+        max_mem_mb=_parse_mem_mb(fields.get("Max Memory", "-")),
+        run_time=_parse_seconds(fields.get("Run time", "-")),
+        cpu_time=_parse_seconds(fields.get("CPU time", "-")),
+    )
+
+
+def read_usage_summary(outlog: str) -> Optional[ResourceUsage]:
+    try:
+        # 30 lines gives us the whole LSF completion summary
+        tail = OSLayer.tail(outlog, num_lines=30)
+    except (OSError, TailError):
+        return None
+    return parse_usage_summary([line.decode(errors="replace") for line in tail])
+
+
+def percentile(values: Sequence[float], percent: float) -> float:
+    """Nearest-rank percentile: the smallest value that is at least as large as
+    percent % of values."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class UsagePredictor:
+    """
+    Predicts what a job of a rule will use from the given usage field of the last
+    window successful jobs of that rule in the job registry: the given percentile
+    of those values plus headroom percent. Nothing is predicted for rules with fewer
+    than min_samples successful jobs.
+
+    If wildcards names some of the rule's wildcards, only jobs that had the same
+    values for them are taken into account, as long as there are min_samples of
+    them; otherwise all jobs of the rule are.
+    """
+
+    field = None
+
+    def __init__(
+        self,
+        job_registry: JobRegistry,
+        percent: float = 95.0,
+        headroom: float = 20.0,
+        min_samples: int = 5,
+        window: int = 100,
+        wildcards: Sequence[str] = (),
+    ):
+        self.job_registry = job_registry
+        self.percent = percent
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.window = window
+        self.wildcards = tuple(wildcards)
+
+    def _history(self, rule: str, wildcards: Optional[dict]) -> List[float]:
+        if self.wildcards and wildcards:
+            pattern = {
+                name: wildcards[name] for name in self.wildcards if name in wildcards
+            }
+            if pattern:
+                values = self.job_registry.usage_history(
+                    rule, self.field, self.window, wildcards=pattern
+                )
+                if len(values) >= self.min_samples:
+                    return values
+        return self.job_registry.usage_history(rule, self.field, self.window)
+
+    def predict_value(self, rule: str, wildcards: Optional[dict] = None):
+        values = self._history(rule, wildcards)
+        if len(values) < self.min_samples:
+            return None
+        return percentile(values, self.percent) * (1 + self.headroom / 100)
+
+
+class MemoryPredictor(UsagePredictor):
+    """Predicts the memory a rule needs from the peak memory of its past jobs."""
+
+    field = "max_mem_mb"
+
+    def predict(self, rule: str, wildcards: Optional[dict] = None) -> Optional[Memory]:
+        mem_mb = self.predict_value(rule, wildcards)
+        if mem_mb is None:
+            return None
+        return Memory(math.ceil(mem_mb), unit=Unit.MEGA)
+
+
+class RuntimePredictor(UsagePredictor):
+    """Predicts the run limit (bsub -W) of a rule, in minutes, from the run time
+    of its past jobs."""
+
+    field = "run_time"
+
+    def predict(self, rule: str, wildcards: Optional[dict] = None) -> Optional[int]:
+        run_time = self.predict_value(rule, wildcards)
+        if run_time is None:
+            return None
+        return max(1, math.ceil(run_time / 60))
+
+
+def import_usage_from_logs(job_registry: JobRegistry) -> int:
+    """Records the resource usage summary in the output log of every finished job
+    of the registry that has no usage recorded yet. Returns the number of jobs
+    imported."""
+    imported = 0
+    for jobid, outlog, succeeded in job_registry.finished_without_usage():
+        usage = read_usage_summary(outlog)
+        if usage is not None:
+            job_registry.record_usage(jobid, succeeded, *usage)
+            imported += 1
+    return imported
+
+
+def _wait_time(job: JobRuntime) -> Optional[float]:
+    """Seconds from submission to start. Jobs whose start was not observed by a
+    status check started their run time before they finished."""
+    if job.submit_time is None:
+        return None
+    if job.started_at is not None:
+        return max(0.0, job.started_at - job.submit_time)
+    if job.finished_at is not None and job.run_time is not None:
+        return max(0.0, job.finished_at - job.run_time - job.submit_time)
+    return None
+
+
+def _median_minutes(seconds: List[float]) -> Optional[float]:
+    return statistics.median(seconds) / 60 if seconds else None
+
+
+def runtime_report(jobs: List[JobRuntime]) -> List[RuntimeReport]:
+    # the submit script sets run limits from these resources
+    if not __name__.startswith("tests.src."):
+        from lsf_submit import RUNTIME_RESOURCES
+    else:
+        from .lsf_submit import RUNTIME_RESOURCES
+
+    by_rule = dict()
+    for job in jobs:
+        by_rule.setdefault(job.rule, []).append(job)
+
+    reports = []
+    for rule, rule_jobs in sorted(by_rule.items()):
+        predicted = [job for job in rule_jobs if job.run_limit is not None]
+        unlimited = [
+            job
+            for job in rule_jobs
+            if job.run_limit is None
+            and not any(job.resources.get(name) for name in RUNTIME_RESOURCES)
+        ]
+        run_times = [job.run_time for job in rule_jobs if job.run_time is not None]
+        reports.append(
+            RuntimeReport(
+                rule=rule,
+                jobs=len(rule_jobs),
+                predicted_jobs=len(predicted),
+                run_limit=(
+                    statistics.median(job.run_limit for job in predicted)
+                    if predicted
+                    else None
+                ),
+                run_time=_median_minutes(run_times),
+                max_run_time=max(run_times) / 60 if run_times else None,
+                over_limit=sum(
+                    1
+                    for job in predicted
+                    if job.run_time is not None and job.run_time >= job.run_limit * 60
+                ),
+                wait_with_limit=_median_minutes(
+                    [w for w in map(_wait_time, predicted) if w is not None]
+                ),
+                wait_without_limit=_median_minutes(
+                    [w for w in map(_wait_time, unlimited) if w is not None]
+                ),
+            )
+        )
+    return reports
+
+
+def format_runtime_report(reports: List[RuntimeReport]) -> str:
+    header = (
+        "rule",
+        "jobs",
+        "with -W",
+        "-W (min)",
+        "run (min)",
+        "max run",
+        "over -W",
+        "wait -W",
+        "wait no -W",
+    )
+    rows = [header]
+    for report in reports:
+        rows.append(
+            tuple(
+                (
+                    "-"
+                    if value is None
+                    else (
+                        "{:.1f}".format(value)
+                        if isinstance(value, float)
+                        else str(value)
+                    )
+                )
+                for value in report
+            )
+        )
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    return "\n".join(
+        "  ".join(
+            cell.ljust(width) if i == 0 else cell.rjust(width)
+            for i, (cell, width) in enumerate(zip(row, widths))
+        )
+        for row in rows
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Resource usage history of the jobs in the job registry."
+    )
+    subcommands = parser.add_subparsers(dest="command")
+    subcommands.add_parser(
+        "import-logs", help="import the usage of finished jobs from their logs"
+    )
+    subcommands.add_parser(
+        "report", help="compare predicted and actual run times per rule"
+    )
+    args = parser.parse_args()
+
+    registry = JobRegistry()
+    if args.command == "import-logs":
+        num_imported = import_usage_from_logs(registry)
+        OSLayer.print("Imported the resource usage of {} jobs".format(num_imported))
+    elif args.command == "report":
+        OSLayer.print(format_runtime_report(runtime_report(registry.runtime_history())))
+    else:
+        parser.print_help()